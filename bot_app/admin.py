@@ -1,11 +1,46 @@
-from django.contrib import admin
+import html
+
+from django.contrib import admin, messages
+from django.db import transaction
 
 try:
     from unfold.admin import ModelAdmin as UnfoldModelAdmin  # type: ignore
 except ModuleNotFoundError:  # pragma: no cover - optional dependency
     UnfoldModelAdmin = admin.ModelAdmin
 
-from .models import Category, City, Guide, GuideCategory, Place, Review, User
+from .models import (
+    Broadcast,
+    BroadcastDelivery,
+    Category,
+    City,
+    Guide,
+    GuideCategory,
+    Job,
+    Place,
+    Review,
+    User,
+)
+from .services.broadcasts import (
+    cancel_broadcast,
+    create_broadcast,
+    pause_broadcast,
+    start_broadcast,
+)
+from .services.reviews import (
+    change_review_status,
+    change_reviews_status,
+    delete_reviews,
+    save_review,
+)
+
+
+def _announce(model_admin, request, items) -> None:
+    """Запустить по рассылке на город для каждого (город, текст)."""
+    with transaction.atomic():
+        for city_id, text in items:
+            start_broadcast(create_broadcast(city_id, text).pk)
+    model_admin.message_user(
+        request, f"Запущено рассылок: {len(items)}.", messages.SUCCESS)
 
 
 @admin.register(City)
@@ -65,6 +100,15 @@ class PlaceAdmin(UnfoldModelAdmin):
                     "avg_rating", "review_count")
     search_fields = ("name",)
     list_filter = ("category", "city", "is_pinned")
+    actions = ("announce_selected",)
+
+    @admin.action(description="Разослать выбранные места пользователям их городов")
+    def announce_selected(self, request, queryset):
+        _announce(self, request, [
+            (place.city_id,
+             f"📍 Рекомендуем: <b>{html.escape(place.name)}</b>\n{html.escape(place.address)}")
+            for place in queryset.only("name", "address", "city_id")
+        ])
 
 
 @admin.register(Review)
@@ -72,6 +116,42 @@ class ReviewAdmin(UnfoldModelAdmin):
     list_display = ("user", "place", "rating", "status")
     list_filter = ("status",)
     list_editable = ("status",)
+    actions = ("publish_selected", "reject_selected")
+
+    def save_model(self, request, obj, form, change):
+        # Смена статуса идёт через сервис: агрегаты места, награда, уведомление;
+        # правка оценки, цены или места опубликованного отзыва — через save_review
+        new_status = obj.status
+        if change and "status" in form.changed_data:
+            obj.status = form.initial["status"]
+        elif not change:
+            obj.status = Review.Status.PENDING
+        if change:
+            save_review(obj)
+        else:
+            super().save_model(request, obj, form, change)
+        if obj.status != new_status:
+            change_review_status(obj.pk, new_status)
+            obj.status = new_status
+
+    def delete_model(self, request, obj):
+        delete_reviews([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        delete_reviews(queryset.values_list("id", flat=True))
+
+    def _change_selected(self, request, queryset, new_status, label):
+        changed = change_reviews_status(queryset.values_list("id", flat=True), new_status)
+        self.message_user(
+            request, f"{label}: {len(changed)} отзывов.", messages.SUCCESS)
+
+    @admin.action(description="Опубликовать выбранные отзывы")
+    def publish_selected(self, request, queryset):
+        self._change_selected(request, queryset, Review.Status.PUBLISHED, "Опубликовано")
+
+    @admin.action(description="Отклонить выбранные отзывы")
+    def reject_selected(self, request, queryset):
+        self._change_selected(request, queryset, Review.Status.REJECTED, "Отклонено")
 
 
 @admin.register(Guide)
@@ -79,3 +159,60 @@ class GuideAdmin(UnfoldModelAdmin):
     list_display = ("topic", "category", "city")
     list_filter = ("category", "city")
     search_fields = ("topic", "city__name", "category__name")
+    actions = ("announce_selected",)
+
+    @admin.action(description="Разослать выбранные гайды пользователям их городов")
+    def announce_selected(self, request, queryset):
+        _announce(self, request, [
+            (guide.city_id, f"📖 Новый гайд: <b>{html.escape(guide.topic)}</b>")
+            for guide in queryset.only("topic", "city_id")
+        ])
+
+
+@admin.register(Job)
+class JobAdmin(UnfoldModelAdmin):
+    list_display = ("id", "kind", "status", "attempts",
+                    "run_after", "updated_at")
+    list_filter = ("status", "kind")
+    search_fields = ("idempotency_key",)
+    readonly_fields = ("created_at", "updated_at", "locked_at", "last_error")
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(UnfoldModelAdmin):
+    list_display = ("id", "city", "status", "sent_count", "blocked_count",
+                    "failed_count", "total_count", "created_at", "finished_at")
+    list_filter = ("status", "city")
+    readonly_fields = ("status", "last_user_id", "total_count", "sent_count",
+                       "blocked_count", "failed_count", "started_at", "finished_at")
+    actions = ("start_selected", "pause_selected", "cancel_selected")
+
+    def save_model(self, request, obj, form, change):
+        # Новая рассылка — черновик; запускается действием «Запустить»
+        if not change:
+            obj.status = Broadcast.Status.DRAFT
+        super().save_model(request, obj, form, change)
+
+    def _change_selected(self, request, queryset, change, label):
+        changed = sum(change(pk) for pk in queryset.values_list("pk", flat=True))
+        self.message_user(request, f"{label}: {changed} рассылок.", messages.SUCCESS)
+
+    @admin.action(description="Запустить / продолжить выбранные рассылки")
+    def start_selected(self, request, queryset):
+        self._change_selected(request, queryset, start_broadcast, "Запущено")
+
+    @admin.action(description="Остановить выбранные рассылки")
+    def pause_selected(self, request, queryset):
+        self._change_selected(request, queryset, pause_broadcast, "Остановлено")
+
+    @admin.action(description="Отменить выбранные рассылки")
+    def cancel_selected(self, request, queryset):
+        self._change_selected(request, queryset, cancel_broadcast, "Отменено")
+
+
+@admin.register(BroadcastDelivery)
+class BroadcastDeliveryAdmin(UnfoldModelAdmin):
+    list_display = ("broadcast", "user_id", "status", "error", "created_at")
+    list_filter = ("status",)
+    search_fields = ("user_id",)
+    raw_id_fields = ("broadcast",)
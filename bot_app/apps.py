@@ -5,3 +5,12 @@ class BotAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "bot_app"
     verbose_name = "Bot App"
+
+    def ready(self) -> None:
+        from django.db.backends.signals import connection_created
+
+        from bot_app import signals  # noqa: F401
+        from bot_app.services.db import configure_sqlite_connection
+
+        connection_created.connect(
+            configure_sqlite_connection, dispatch_uid="bot_app.sqlite_pragmas")
@@ -4,13 +4,13 @@ from aiogram import F, Router
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from asgiref.sync import sync_to_async
-from django.db.models import F as DjangoF
 
 from bot_app.keyboards.main import main_menu_keyboard
 from bot_app.keyboards.navigation import NAV_BACK_BUTTON
 from bot_app.models import User
-from bot_app.services.ai_service import _build_city_context, generate_recommendation
+from bot_app.services import balances
+from bot_app.services.ai_service import generate_recommendation_async
+from bot_app.services.city_context import get_city_context
 from bot_app.states.assistant import AssistantState
 
 router = Router()
@@ -18,44 +18,27 @@ router = Router()
 ASSISTANT_BUTTON = "🤖 AI-Помощник"
 
 
-@sync_to_async
-def get_user_with_city(telegram_id: int) -> Optional[User]:
-    return (
-        User.objects.select_related("city")
-        .filter(telegram_id=telegram_id)
-        .first()
-    )
-
-
-@sync_to_async
-def check_and_decrement_ai_balance(telegram_id: int) -> tuple[bool, int]:
+async def check_and_decrement_ai_balance(telegram_id: int) -> tuple[bool, int]:
     """
     Проверяет баланс AI-запросов и уменьшает его на 1.
     Возвращает (успех, текущий_баланс)
     """
-    user = User.objects.filter(telegram_id=telegram_id).first()
-    if not user:
+    remaining = await balances.spend(telegram_id, balances.AI_BALANCE)
+    if remaining is None:
         return False, 0
-
-    if user.ai_requests_balance <= 0:
-        return False, 0
-
-    User.objects.filter(telegram_id=telegram_id).update(
-        ai_requests_balance=DjangoF("ai_requests_balance") - 1
-    )
-    # Обновляем объект для получения нового значения
-    user.refresh_from_db()
-    return True, user.ai_requests_balance
+    return True, remaining
 
 
 @router.message(F.text == ASSISTANT_BUTTON)
-async def start_assistant(message: Message, state: FSMContext) -> None:
+async def start_assistant(
+    message: Message, state: FSMContext, db_user: Optional[User] = None
+) -> None:
     from_user = message.from_user
     if not from_user:
         await message.answer("Не удалось определить ваш Telegram ID.")
         return
 
-    user = await get_user_with_city(from_user.id)
+    user = db_user
     if not user:
         await message.answer("Вы ещё не зарегистрированы. Нажмите /start.")
         return
@@ -78,7 +61,7 @@ async def start_assistant(message: Message, state: FSMContext) -> None:
         "• Где поесть недорого?\n"
         "• Что делать с бюджетом X на Y дней?\n"
         "• Достопримечательности, рестораны, развлечения\n\n"
-        f"💡 Доступно запросов: {user.ai_requests_balance}\n\n"
+        f"💡 Доступно запросов: {balances.displayed_balance(user, balances.AI_BALANCE)}\n\n"
         "Просто напиши свой вопрос о туризме или местах в городе!",
         reply_markup=main_menu_keyboard(),
     )
@@ -128,11 +111,11 @@ async def process_assistant_query(message: Message, state: FSMContext) -> None:
     # Показываем, что бот думает
     thinking_msg = await message.answer("🤔 Думаю...")
 
-    # Собираем контекст из базы данных
-    city_context = await sync_to_async(_build_city_context)(city_id)
+    # Собираем из базы места и гайды, подходящие под вопрос
+    city_context = await get_city_context(city_id, user_query)
 
     # Генерируем ответ
-    response = await sync_to_async(generate_recommendation)(
+    response = await generate_recommendation_async(
         user_query, city_context, city_name
     )
 
@@ -4,12 +4,14 @@ from aiogram import F, Router
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from asgiref.sync import sync_to_async
 
 from bot_app.keyboards.main import main_menu_keyboard
 from bot_app.keyboards.navigation import NAV_BACK_BUTTON, get_navigation_keyboard
 from bot_app.keyboards.search import category_keyboard
 from bot_app.models import Guide, GuideCategory, User
+from bot_app.services import result_sets
+from bot_app.services.catalog import get_catalog
+from bot_app.services.db import db_task
 from bot_app.states.guides import GuidesState
 
 router = Router()
@@ -18,43 +20,16 @@ GUIDES_BUTTON = "📚 Гайды"
 GUIDE_LIMIT = 10
 
 
-@sync_to_async
-def get_user_with_city(telegram_id: int):
-    return (
-        User.objects.select_related("city")
-        .filter(telegram_id=telegram_id)
-        .first()
-    )
-
-
-@sync_to_async
-def categories_for_guides(city_id: Optional[int]) -> List[str]:
-    """Получить категории гайдов, для которых есть гайды в городе"""
-    if city_id:
-        qs = (
-            GuideCategory.objects.filter(guides__city_id=city_id)
-            .distinct()
-            .order_by("name")
-        )
-        categories = list(qs.values_list("name", flat=True))
-        if categories:
-            return categories
-
-    # Если нет гайдов для города, показываем все категории с гайдами
-    qs = (
-        GuideCategory.objects.filter(guides__isnull=False)
-        .distinct()
-        .order_by("name")
-    )
-    return list(qs.values_list("name", flat=True))
+async def categories_for_guides(city_id: Optional[int]) -> List[str]:
+    """Категории гайдов города, а если их нет — все категории с гайдами"""
+    return (await get_catalog()).guide_categories_for_city(city_id)
 
 
-@sync_to_async
-def find_guide_category_by_name(name: str) -> Optional[GuideCategory]:
-    return GuideCategory.objects.filter(name__iexact=name.strip()).first()
+async def find_guide_category_by_name(name: str) -> Optional[GuideCategory]:
+    return (await get_catalog()).find_guide_category(name)
 
 
-@sync_to_async
+@db_task
 def fetch_guide_topics_by_category(city_id: Optional[int], category_id: int) -> List[dict]:
     """Получить список топиков гайдов по категории для города"""
     query = Guide.objects.filter(category_id=category_id)
@@ -76,7 +51,7 @@ def fetch_guide_topics_by_category(city_id: Optional[int], category_id: int) ->
     )
 
 
-@sync_to_async
+@db_task
 def get_guide_by_id(guide_id: int) -> Optional[dict]:
     """Получить конкретный гайд по ID"""
     guide = Guide.objects.filter(id=guide_id).select_related(
@@ -92,6 +67,22 @@ def get_guide_by_id(guide_id: int) -> Optional[dict]:
     }
 
 
+async def topics_handle(state: FSMContext, topics: List[dict]) -> int:
+    """
+    Id списка топиков в ResultSet; если показан тот же список, что и в
+    прошлый раз, используется прежний.
+    """
+    items = [{"id": t["id"], "topic": t["topic"]} for t in topics]
+    current = (await state.get_data()).get("guide_topics")
+    if await result_sets.get_result_set(current) == items:
+        return current
+    return await result_sets.create_result_set("guide_topics", items)
+
+
+async def stored_topics(data: dict) -> List[dict]:
+    return await result_sets.get_result_set(data.get("guide_topics")) or []
+
+
 def format_guide_topics(topics: List[dict], category_name: str, city_name: Optional[str] = None) -> str:
     """Форматировать список топиков гайдов для отображения"""
     if city_name:
@@ -126,13 +117,15 @@ def format_guide_content(guide: dict) -> str:
 
 
 @router.message(StateFilter("*"), F.text == GUIDES_BUTTON)
-async def start_guides(message: Message, state: FSMContext) -> None:
+async def start_guides(
+    message: Message, state: FSMContext, db_user: Optional[User] = None
+) -> None:
     from_user = message.from_user
     if not from_user:
         await message.answer("Не удалось определить ваш Telegram ID.")
         return
 
-    user = await get_user_with_city(from_user.id)
+    user = db_user
     if not user:
         await message.answer("Вы ещё не зарегистрированы. Нажмите /start.")
         return
@@ -182,7 +175,7 @@ async def process_guide_category(message: Message, state: FSMContext) -> None:
     await state.update_data(
         category_id=category.id,
         category_name=category.name,
-        guide_topics=[{"id": t["id"], "topic": t["topic"]} for t in topics],
+        guide_topics=await topics_handle(state, topics),
     )
 
     text = format_guide_topics(topics, category.name, city_name)
@@ -227,7 +220,7 @@ async def process_topic_selection(message: Message, state: FSMContext) -> None:
         return
 
     data = await state.get_data()
-    topics = data.get("guide_topics", [])
+    topics = await stored_topics(data)
 
     # Сначала проверяем, не ввел ли пользователь номер (1, 2, 3 и т.д.)
     selected_topic = None
@@ -273,8 +266,7 @@ async def process_topic_selection(message: Message, state: FSMContext) -> None:
     topics_list = await fetch_guide_topics_by_category(city_id, category_id)
     if topics_list:
         await state.update_data(
-            guide_topics=[{"id": t["id"], "topic": t["topic"]}
-                          for t in topics_list],
+            guide_topics=await topics_handle(state, topics_list),
             current_guide_id=None,
         )
 
@@ -308,7 +300,7 @@ async def back_to_topics(message: Message, state: FSMContext) -> None:
 
     await state.set_state(GuidesState.topic_selection)
     await state.update_data(
-        guide_topics=[{"id": t["id"], "topic": t["topic"]} for t in topics],
+        guide_topics=await topics_handle(state, topics),
         current_guide_id=None,
     )
 
@@ -328,7 +320,7 @@ async def guide_content_input(message: Message, state: FSMContext) -> None:
 
     # Если пользователь ввел название топика или номер, пытаемся найти его
     data = await state.get_data()
-    topics = data.get("guide_topics", [])
+    topics = await stored_topics(data)
 
     selected_topic = None
     # Сначала проверяем, не ввел ли пользователь номер (1, 2, 3 и т.д.)
@@ -362,8 +354,7 @@ async def guide_content_input(message: Message, state: FSMContext) -> None:
             if topics_list:
                 await state.set_state(GuidesState.topic_selection)
                 await state.update_data(
-                    guide_topics=[{"id": t["id"], "topic": t["topic"]}
-                                  for t in topics_list],
+                    guide_topics=await topics_handle(state, topics_list),
                     current_guide_id=None,
                 )
 
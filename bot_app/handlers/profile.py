@@ -2,7 +2,6 @@ from aiogram import F, Router
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
-from asgiref.sync import sync_to_async
 
 from bot_app.keyboards.main import main_menu_keyboard
 from bot_app.keyboards.profile_kbs import (
@@ -10,6 +9,10 @@ from bot_app.keyboards.profile_kbs import (
     profile_inline_keyboard,
 )
 from bot_app.models import City, Review, User
+from bot_app.services import balances
+from bot_app.services.catalog import get_catalog
+from bot_app.services.db import db_task
+from bot_app.services.users import get_user, invalidate_user
 from bot_app.states.profile import ProfileState
 
 router = Router()
@@ -23,31 +26,34 @@ STATUS_LABELS = {
 }
 
 
-@sync_to_async
-def get_user_with_stats(telegram_id: int):
-    user = (
-        User.objects.select_related("city")
-        .filter(telegram_id=telegram_id)
-        .first()
-    )
+@db_task
+def count_user_reviews(telegram_id: int) -> int:
+    return Review.objects.filter(user_id=telegram_id).count()
+
+
+async def get_user_with_stats(telegram_id: int):
+    user = await get_user(telegram_id)
     if not user:
         return None, 0
-    review_count = Review.objects.filter(user=user).count()
-    return user, review_count
+    return user, await count_user_reviews(telegram_id)
 
 
-@sync_to_async
-def get_active_cities():
-    return list(City.objects.filter(is_active=True).order_by("name").values("id", "name"))
+async def get_active_cities():
+    catalog = await get_catalog()
+    return [{"id": city.id, "name": city.name} for city in catalog.cities]
 
 
-@sync_to_async
-def update_user_city(user_id: int, city_id: int) -> City | None:
-    try:
-        city = City.objects.get(id=city_id, is_active=True)
-    except City.DoesNotExist:
+@db_task
+def _set_user_city(user_id: int, city_id: int) -> None:
+    User.objects.filter(telegram_id=user_id).update(city_id=city_id)
+    invalidate_user(user_id)
+
+
+async def update_user_city(user_id: int, city_id: int) -> City | None:
+    city = (await get_catalog()).get_city(city_id)
+    if city is None:
         return None
-    User.objects.filter(telegram_id=user_id).update(city=city)
+    await _set_user_city(user_id, city.id)
     return city
 
 
@@ -60,7 +66,7 @@ def _format_profile_text(user: User, review_count: int) -> str:
         f"🏙 Город: <b>{city_name}</b>\n"
         f"🧭 Роль: <b>{role}</b>\n"
         f"🏅 Статус: <b>{status}</b>\n"
-        f"🔋 Баланс запросов: <b>{user.balance_requests}</b>\n"
+        f"🔋 Баланс запросов: <b>{balances.displayed_balance(user, balances.SEARCH_BALANCE)}</b>\n"
         f"✨ Репутация: <b>{user.reputation_points}</b>\n"
         f"📝 Отзывов: <b>{review_count}</b>"
     )
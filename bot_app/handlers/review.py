@@ -4,9 +4,7 @@ from aiogram import F, Router
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message, User as TelegramUser
-from asgiref.sync import sync_to_async
 from django.db import transaction
-from django.db.models import F as DjangoF
 
 from bot_app.keyboards.main import main_menu_keyboard
 from bot_app.keyboards.navigation import NAV_BACK_BUTTON
@@ -24,49 +22,43 @@ from bot_app.keyboards.review import (
     text_keyboard,
 )
 from bot_app.models import Category, Place, Review, User
-from bot_app.services.ai_service import analyze_review, update_place_summary
+from bot_app.services import place_search
+from bot_app.services.catalog import get_catalog
+from bot_app.services.db import db_task
+from bot_app.services.jobs import enqueue_job, wake_workers
+from bot_app.services.users import get_user
 from bot_app.states.review import AddReviewState
 
 router = Router()
 
 PLACE_RESULTS_LIMIT = 6
+# Столько фото Telegram принимает в одной медиагруппе
+MAX_REVIEW_PHOTOS = 10
 LEAVE_REVIEW_PREFIX = "leave_review"
 
 
-@sync_to_async
-def get_user_with_city(telegram_id: int) -> Optional[User]:
-    return (
-        User.objects.select_related("city")
-        .filter(telegram_id=telegram_id)
-        .first()
-    )
-
+async def search_places(city_id: int, name_query: str) -> List[Dict[str, str]]:
+    hits = await place_search.search_places(
+        city_id, name_query, limit=PLACE_RESULTS_LIMIT)
+    return [{"id": hit.id, "name": hit.name, "address": hit.address} for hit in hits]
 
-@sync_to_async
-def search_places(city_id: int, name_query: str) -> List[Dict[str, str]]:
-    qs = (
-        Place.objects.filter(city_id=city_id, name__icontains=name_query)
-        .order_by("name")[:PLACE_RESULTS_LIMIT]
-    )
-    return list(qs.values("id", "name", "address"))
 
+async def list_categories() -> List[Dict[str, str]]:
+    catalog = await get_catalog()
+    return [{"id": category.id, "name": category.name} for category in catalog.categories]
 
-@sync_to_async
-def list_categories() -> List[Dict[str, str]]:
-    return list(Category.objects.order_by("name").values("id", "name"))
 
-
-@sync_to_async
+@db_task
 def get_place(place_id: int) -> Optional[Place]:
     return Place.objects.filter(id=place_id).first()
 
 
-@sync_to_async
+@db_task
 def user_has_review(user_id: int, place_id: int) -> bool:
     return Review.objects.filter(user_id=user_id, place_id=place_id).exists()
 
 
-@sync_to_async
+@db_task
 def create_place_record(
     *,
     city_id: int,
@@ -85,7 +77,8 @@ def create_place_record(
     )
 
 
-@sync_to_async
+@db_task
+@transaction.atomic
 def create_pending_review(
     *,
     user_id: int,
@@ -95,7 +88,7 @@ def create_pending_review(
     photos: List[str],
     price: Optional[int] = None,
 ) -> Review:
-    return Review.objects.create(
+    review = Review.objects.create(
         user_id=user_id,
         place_id=place_id,
         rating=rating,
@@ -105,57 +98,13 @@ def create_pending_review(
         is_verified_by_ai=False,
         photo_ids=photos,
     )
-
-
-@sync_to_async
-def mark_review_rejected(review_id: int) -> None:
-    Review.objects.filter(id=review_id).update(status=Review.Status.REJECTED)
-
-
-@sync_to_async
-@transaction.atomic
-def publish_review(review_id: int, summary: str) -> None:
-    review = (
-        Review.objects.select_for_update()
-        .select_related("place")
-        .get(id=review_id)
-    )
-    place = review.place
-
-    total_score = place.avg_rating * place.review_count
-    place.review_count += 1
-    place.avg_rating = (total_score + review.rating) / place.review_count
-
-    # Пересчитываем средний чек на основе всех опубликованных отзывов с указанной ценой
-    if review.price is not None and review.price > 0:
-        reviews_with_price = Review.objects.filter(
-            place=place,
-            status=Review.Status.PUBLISHED,
-            price__isnull=False,
-            price__gt=0,
-        ).exclude(id=review_id)  # Исключаем текущий отзыв, так как он еще не опубликован
-
-        total_price = sum(r.price for r in reviews_with_price) + review.price
-        count_with_price = reviews_with_price.count() + 1
-        place.average_price = int(total_price / count_with_price)
-
-    if summary:
-        place.ai_summary = summary
-
-    update_fields = ["avg_rating", "review_count", "ai_summary"]
-    if review.price is not None and review.price > 0:
-        update_fields.append("average_price")
-
-    place.save(update_fields=update_fields)
-
-    review.status = Review.Status.PUBLISHED
-    review.save(update_fields=["status"])
-
-    User.objects.filter(telegram_id=review.user_id).update(
-        balance_requests=DjangoF("balance_requests") + 10,
-        reputation_points=DjangoF("reputation_points") + 10,
-        ai_requests_balance=DjangoF("ai_requests_balance") + 10,
+    # Модерация и публикация выполняются фоновой задачей
+    enqueue_job(
+        "moderate_review",
+        {"review_id": review.id},
+        key=f"moderate_review:{review.id}",
     )
+    return review
 
 
 def sanitize_text(value: Optional[str]) -> Optional[str]:
@@ -175,7 +124,8 @@ async def ensure_user_registered(
         await message.answer("Не удалось определить ваш Telegram ID.")
         return None
 
-    user = await get_user_with_city(from_user.id)
+    # Уже загружен UserContextMiddleware — берётся из кэша
+    user = await get_user(from_user.id)
     if not user:
         await state.clear()
         await message.answer("Вы ещё не зарегистрированы. Нажмите /start.")
@@ -350,7 +300,7 @@ async def process_address(message: Message, state: FSMContext) -> None:
         await state.clear()
         return
 
-    await state.update_data(address=address, category_options=categories)
+    await state.update_data(address=address)
     await state.set_state(AddReviewState.category)
     await message.answer(
         "Выберите категорию для этого места:",
@@ -365,17 +315,14 @@ async def process_category_selection(message: Message, state: FSMContext) -> Non
         await message.answer("Пожалуйста, выберите категорию из списка.")
         return
 
-    data = await state.get_data()
-    options: List[Dict[str, str]] = data.get("category_options", [])
-    matched = next(
-        (opt for opt in options if opt["name"].lower(
-        ) == category_name.lower()),
-        None,
-    )
+    # Список категорий не хранится в FSM — ищем в справочнике
+    matched = (await get_catalog()).find_category(category_name)
     if not matched:
         await message.answer("Категория не найдена. Выберите вариант с клавиатуры.")
         return
 
+    data = await state.get_data()
+
     city_id = data.get("city_id")
     place_name = data.get("place_name")
     address = data.get("address")
@@ -386,7 +333,7 @@ async def process_category_selection(message: Message, state: FSMContext) -> Non
 
     place = await create_place_record(
         city_id=city_id,
-        category_id=matched["id"],
+        category_id=matched.id,
         name=place_name,
         address=address,
     )
@@ -395,7 +342,7 @@ async def process_category_selection(message: Message, state: FSMContext) -> Non
         await state.clear()
         return
 
-    await state.update_data(place_id=place.id, category_options=None)
+    await state.update_data(place_id=place.id)
     await ask_for_rating(message, state)
 
 
@@ -472,6 +419,10 @@ async def collect_photos(message: Message, state: FSMContext) -> None:
     file_id = photo.file_id
     data = await state.get_data()
     photos = data.get("photos", [])
+    if len(photos) >= MAX_REVIEW_PHOTOS:
+        await message.answer(
+            f"Можно приложить до {MAX_REVIEW_PHOTOS} фото. Нажмите 'Готово'.")
+        return
     photos.append(file_id)
     await state.update_data(photos=photos)
     await message.answer("Фото сохранено. Добавьте ещё или нажмите 'Готово'.")
@@ -495,7 +446,7 @@ async def finalize_review(message: Message, state: FSMContext) -> None:
         )
         return
 
-    review = await create_pending_review(
+    await create_pending_review(
         user_id=user_id,
         place_id=place_id,
         rating=rating,
@@ -503,27 +454,12 @@ async def finalize_review(message: Message, state: FSMContext) -> None:
         photos=photos,
         price=price,
     )
+    wake_workers()
 
-    print(f"AI moderation: analyzing review_id={review.id}")
-    analysis = await sync_to_async(analyze_review)(review_text)
-    print(f"AI moderation: result={analysis}")
-    is_spam = bool(analysis.get("is_spam"))
-    summary = analysis.get("summary", "")
-
-    if is_spam:
-        await mark_review_rejected(review.id)
-        await state.clear()
-        await message.answer(
-            "Отзыв выглядит как спам, поэтому он не был опубликован.",
-            reply_markup=main_menu_keyboard(),
-        )
-        return
-
-    await publish_review(review.id, summary)
-    await update_place_summary(place_id)
     await state.clear()
     await message.answer(
-        "Спасибо! Отзыв опубликован. Вам начислено 10 запросов к AI-помощнику.",
+        "Спасибо! Отзыв отправлен на проверку. "
+        "Я напишу, как только он будет опубликован.",
         reply_markup=main_menu_keyboard(),
     )
 
@@ -553,7 +489,7 @@ async def back_to_place_name_from_address(message: Message, state: FSMContext) -
 
 @router.message(StateFilter(AddReviewState.category), F.text == NAV_BACK_BUTTON)
 async def back_to_address_from_category(message: Message, state: FSMContext) -> None:
-    await state.update_data(address=None, category_options=None)
+    await state.update_data(address=None)
     await state.set_state(AddReviewState.address)
     await message.answer(
         "Введите адрес места ещё раз:",
@@ -4,133 +4,77 @@ from aiogram import F, Router
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, InputMediaPhoto, Message
-from asgiref.sync import sync_to_async
-from django.db.models import F as DjangoF
+from django.conf import settings
 
 from bot_app.keyboards.main import main_menu_keyboard
 from bot_app.keyboards.navigation import NAV_BACK_BUTTON
 from bot_app.keyboards.search import category_keyboard
 from bot_app.keyboards.search_kbs import build_place_navigation_keyboard
-from bot_app.models import Category, Place, Review, User
+from bot_app.models import Category, Place, ReviewPhoto, User
+from bot_app.services import balances, place_search, result_sets
+from bot_app.services.catalog import get_catalog
+from bot_app.services.db import db_task
+from bot_app.services.ranking import rank_places
 from bot_app.states.search import SearchState
 
 router = Router()
 
 
-@sync_to_async
-def get_user_with_city(telegram_id: int) -> Optional[User]:
-    return (
-        User.objects.select_related("city")
-        .filter(telegram_id=telegram_id)
-        .first()
-    )
+async def categories_for_city(city_id: int) -> List[str]:
+    return (await get_catalog()).categories_for_city(city_id)
 
 
-@sync_to_async
-def categories_for_city(city_id: int) -> List[str]:
-    qs = (
-        Category.objects.filter(places__city_id=city_id)
-        .distinct()
-        .order_by("name")
-    )
-    return list(qs.values_list("name", flat=True))
+async def all_categories() -> List[str]:
+    return (await get_catalog()).category_names()
 
 
-@sync_to_async
-def all_categories() -> List[str]:
-    return list(Category.objects.order_by("name").values_list("name", flat=True))
+async def find_category_by_name(name: str) -> Optional[Category]:
+    return (await get_catalog()).find_category(name)
 
 
-@sync_to_async
-def find_category_by_name(name: str) -> Optional[Category]:
-    return Category.objects.filter(name__iexact=name.strip()).first()
+async def deduct_user_request(telegram_id: int) -> bool:
+    return await balances.spend(telegram_id, balances.SEARCH_BALANCE) is not None
 
 
-@sync_to_async
-def deduct_user_request(telegram_id: int) -> bool:
-    updated = (
-        User.objects.filter(telegram_id=telegram_id, balance_requests__gt=0)
-        .update(balance_requests=DjangoF("balance_requests") - 1)
-    )
-    return bool(updated)
+@db_task
+def search_places(city_id: int, category_id: int) -> List[int]:
+    return rank_places(city_id, category_id, limit=settings.SEARCH_RESULTS_LIMIT)
 
 
-@sync_to_async
-def search_places(city_id: int, category_id: int) -> List[Place]:
-    pinned = list(
-        Place.objects.filter(
-            city_id=city_id,
-            category_id=category_id,
-            is_pinned=True,
-        ).order_by("-avg_rating")
-    )
-    organic = list(
-        Place.objects.filter(
-            city_id=city_id,
-            category_id=category_id,
-            is_pinned=False,
-            review_count__gt=0,
-        )
-        .order_by("-avg_rating", "-review_count")
-    )
-    seen = {place.id for place in pinned}
-    ordered = pinned + [place for place in organic if place.id not in seen]
-    return ordered
-
-
-@sync_to_async
-def search_places_by_name(city_id: int, name_query: str) -> List[Place]:
-    """Поиск мест по названию (без учета регистра)"""
-    query = name_query.strip()
-    if not query:
-        return []
-
-    pinned = list(
-        Place.objects.filter(
-            city_id=city_id,
-            name__icontains=query,
-            is_pinned=True,
-        ).order_by("-avg_rating")
-    )
-    organic = list(
-        Place.objects.filter(
-            city_id=city_id,
-            name__icontains=query,
-            is_pinned=False,
-            review_count__gt=0,
-        )
-        .order_by("-avg_rating", "-review_count")
-    )
-    seen = {place.id for place in pinned}
-    ordered = pinned + [place for place in organic if place.id not in seen]
-    return ordered
+async def search_places_by_name(city_id: int, name_query: str) -> List[int]:
+    """Поиск мест по названию и адресу: сначала закреплённые, затем места с отзывами."""
+    hits = await place_search.search_places(
+        city_id, name_query, limit=settings.SEARCH_RESULTS_LIMIT, listed_only=True)
+    pinned = [hit.id for hit in hits if hit.is_pinned]
+    organic = [hit.id for hit in hits if not hit.is_pinned]
+    return pinned + organic
 
 
-@sync_to_async
+@db_task
 def get_place_by_id(place_id: int) -> Optional[Place]:
     return Place.objects.filter(id=place_id).first()
 
 
-@sync_to_async
+@db_task
 def get_recent_place_photos(place_id: int, limit: int = 5) -> List[str]:
-    photos: List[str] = []
-    qs = (
-        Review.objects.filter(
-            place_id=place_id,
-            status=Review.Status.PUBLISHED,
-            photo_ids__isnull=False,
-        )
-        .order_by("-id")
-        .values_list("photo_ids", flat=True)
+    return list(
+        ReviewPhoto.objects.filter(place_id=place_id)
+        .order_by("-created_at", "-id")
+        .values_list("file_id", flat=True)[:limit]
+    )
+
+
+async def remember_results(
+    state: FSMContext, place_ids: List[int], category_id: Optional[int]
+) -> None:
+    """Сохранить выдачу: список — в ResultSet, в FSM — его id и позиция."""
+    handle = await result_sets.create_result_set("places", place_ids) if place_ids else None
+    await state.update_data(
+        category_id=category_id,
+        results=handle,
+        results_total=len(place_ids),
+        current_index=0,
     )
-    for batch in qs:
-        if not batch:
-            continue
-        batch_list = list(batch)
-        photos.extend(batch_list)
-        if len(photos) >= limit:
-            break
-    return photos[:limit]
 
 
 def render_place_card(place: Place) -> str:
@@ -155,15 +99,19 @@ async def send_place_card(
     new_message: bool = False,
 ) -> None:
     data = await state.get_data()
-    place_ids: List[int] = data.get("found_place_ids") or []
-    total = len(place_ids)
-    if total == 0:
-        text = "Нет подходящих мест. Вернитесь назад и выберите другую категорию."
+    total = data.get("results_total", 0)
+    place_ids = await result_sets.get_result_set(data.get("results")) if total else []
+    if not place_ids:
+        if total:
+            text = "Результаты поиска устарели. Выберите категорию или введите название заново."
+        else:
+            text = "Нет подходящих мест. Вернитесь назад и выберите другую категорию."
         if new_message:
             await target_message.answer(text, reply_markup=main_menu_keyboard())
         else:
             await target_message.edit_text(text, reply_markup=main_menu_keyboard())
         return
+    total = len(place_ids)
 
     current_index = data.get("current_index", 0)
     current_index = max(0, min(current_index, total - 1))
@@ -191,13 +139,15 @@ async def send_place_card(
 
 
 @router.message(F.text == "🔍 Найти место")
-async def start_search(message: Message, state: FSMContext) -> None:
+async def start_search(
+    message: Message, state: FSMContext, db_user: Optional[User] = None
+) -> None:
     from_user = message.from_user
     if not from_user:
         await message.answer("Не удалось определить ваш Telegram ID.")
         return
 
-    user = await get_user_with_city(from_user.id)
+    user = db_user
     if not user:
         await message.answer("Вы не зарегистрированы. Нажмите /start.")
         return
@@ -247,22 +197,18 @@ async def _run_search_for_category(
         await state.clear()
         return
 
-    places = await search_places(city_id=city_id, category_id=category.id)
+    place_ids = await search_places(city_id=city_id, category_id=category.id)
     await state.set_state(SearchState.results)
 
-    if not places:
-        await state.update_data(found_place_ids=[], current_index=0)
+    if not place_ids:
+        await remember_results(state, [], category.id)
         await message.answer(
             "В базе пока пусто, но вот данные из Google Maps... (скоро подключим API).",
             reply_markup=main_menu_keyboard(),
         )
         return
 
-    await state.update_data(
-        category_id=category.id,
-        found_place_ids=[place.id for place in places],
-        current_index=0,
-    )
+    await remember_results(state, place_ids, category.id)
     await send_place_card(message, state, new_message=True)
 
 
@@ -296,22 +242,19 @@ async def process_category(message: Message, state: FSMContext) -> None:
         await state.clear()
         return
 
-    places = await search_places_by_name(city_id=city_id, name_query=text)
+    place_ids = await search_places_by_name(city_id=city_id, name_query=text)
     await state.set_state(SearchState.results)
 
-    if not places:
-        await state.update_data(found_place_ids=[], current_index=0)
+    if not place_ids:
+        await remember_results(state, [], None)
         await message.answer(
             f"Не нашёл мест с названием '{text}'. Попробуйте другой запрос или выберите категорию.",
             reply_markup=category_keyboard(await categories_for_city(city_id) or await all_categories()),
         )
         return
 
-    await state.update_data(
-        category_id=None,  # Поиск по названию, не по категории
-        found_place_ids=[place.id for place in places],
-        current_index=0,
-    )
+    # Поиск по названию, не по категории
+    await remember_results(state, place_ids, None)
     await send_place_card(message, state, new_message=True)
 
 
@@ -333,11 +276,7 @@ async def search_back_to_categories(message: Message, state: FSMContext) -> None
         return
 
     await state.set_state(SearchState.category)
-    await state.update_data(
-        category_id=None,
-        found_place_ids=[],
-        current_index=0,
-    )
+    await remember_results(state, [], None)
     await message.answer(
         "Выберите другую категорию или введите название места для поиска:",
         reply_markup=category_keyboard(categories),
@@ -375,46 +314,48 @@ async def search_results_input(message: Message, state: FSMContext) -> None:
         await message.answer("Лимиты исчерпаны! Напиши отзыв, чтобы получить +10 запросов.")
         return
 
-    places = await search_places_by_name(city_id=city_id, name_query=text)
+    place_ids = await search_places_by_name(city_id=city_id, name_query=text)
     await state.set_state(SearchState.results)
 
-    if not places:
+    if not place_ids:
         await message.answer(
             f"Не нашёл мест с названием '{text}'. Попробуйте другой запрос или используйте кнопки навигации.",
         )
         return
 
-    await state.update_data(
-        category_id=None,  # Поиск по названию, не по категории
-        found_place_ids=[place.id for place in places],
-        current_index=0,
-    )
+    # Поиск по названию, не по категории
+    await remember_results(state, place_ids, None)
     await send_place_card(message, state, new_message=True)
 
 
 @router.callback_query(StateFilter(SearchState.results), F.data == "nav_next")
-async def handle_next(callback: CallbackQuery, state: FSMContext) -> None:
+async def handle_next(
+    callback: CallbackQuery, state: FSMContext, callback_repeat: int = 1
+) -> None:
     data = await state.get_data()
-    place_ids: List[int] = data.get("found_place_ids") or []
     index = data.get("current_index", 0)
-    if index >= len(place_ids) - 1:
+    last = data.get("results_total", 0) - 1
+    if index >= last:
         await callback.answer("Это последняя карточка.")
         return
 
-    await state.update_data(current_index=index + 1)
+    # Повторные нажатия, пришедшие пока ждали очереди, — одним шагом
+    await state.update_data(current_index=min(index + callback_repeat, last))
     await send_place_card(callback.message, state)
     await callback.answer()
 
 
 @router.callback_query(StateFilter(SearchState.results), F.data == "nav_prev")
-async def handle_prev(callback: CallbackQuery, state: FSMContext) -> None:
+async def handle_prev(
+    callback: CallbackQuery, state: FSMContext, callback_repeat: int = 1
+) -> None:
     data = await state.get_data()
     index = data.get("current_index", 0)
     if index <= 0:
         await callback.answer("Это первая карточка.")
         return
 
-    await state.update_data(current_index=index - 1)
+    await state.update_data(current_index=max(index - callback_repeat, 0))
     await send_place_card(callback.message, state)
     await callback.answer()
 
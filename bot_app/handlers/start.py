@@ -4,12 +4,14 @@ from aiogram import F, Router
 from aiogram.filters import CommandStart, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from asgiref.sync import sync_to_async
 
 from bot_app.keyboards.main import main_menu_keyboard
 from bot_app.keyboards.navigation import NAV_BACK_BUTTON
 from bot_app.keyboards.registration import city_keyboard, role_keyboard
 from bot_app.models import City, User
+from bot_app.services.catalog import get_catalog
+from bot_app.services.db import db_task
+from bot_app.services.users import invalidate_user
 from bot_app.states.registration import RegistrationState
 
 router = Router()
@@ -21,26 +23,15 @@ ROLE_TO_CODE = {
 }
 
 
-@sync_to_async
-def fetch_user(telegram_id: int) -> Optional[User]:
-    return (
-        User.objects.select_related("city")
-        .filter(telegram_id=telegram_id)
-        .first()
-    )
-
-
-@sync_to_async
-def list_active_cities() -> List[str]:
-    return list(City.objects.filter(is_active=True).order_by("name").values_list("name", flat=True))
+async def list_active_cities() -> List[str]:
+    return (await get_catalog()).city_names()
 
 
-@sync_to_async
-def get_city_by_name(name: str) -> Optional[City]:
-    return City.objects.filter(is_active=True, name__iexact=name.strip()).first()
+async def get_city_by_name(name: str) -> Optional[City]:
+    return (await get_catalog()).find_city(name)
 
 
-@sync_to_async
+@db_task
 def create_user(
     *,
     telegram_id: int,
@@ -49,24 +40,27 @@ def create_user(
     city: City,
     role: str,
 ) -> User:
-    return User.objects.create(
+    user = User.objects.create(
         telegram_id=telegram_id,
         username=username,
         full_name=full_name,
         city=city,
         role=role,
     )
+    invalidate_user(telegram_id)
+    return user
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext) -> None:
+async def cmd_start(
+    message: Message, state: FSMContext, db_user: Optional[User] = None
+) -> None:
     from_user = message.from_user
     if not from_user:
         await message.answer("Не удалось определить ваш Telegram ID.")
         return
 
-    user = await fetch_user(from_user.id)
-    if user:
+    if db_user:
         await state.clear()
         await message.answer(
             "С возвращением! Чем займёмся?",
@@ -123,9 +117,8 @@ async def process_role(message: Message, state: FSMContext) -> None:
         await message.answer("Не удалось определить ваш Telegram ID. Попробуйте /start.")
         return
 
-    try:
-        city = await sync_to_async(City.objects.get)(id=city_id)
-    except City.DoesNotExist:
+    city = (await get_catalog()).get_city(city_id)
+    if city is None:
         await state.clear()
         await message.answer("Не удалось найти выбранный город. Начните заново через /start.")
         return
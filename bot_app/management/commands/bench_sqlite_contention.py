@@ -0,0 +1,185 @@
+"""
+Нагрузочный тест SQLite: параллельные читатели (бот) и писатели (админка,
+списания, отзывы) на одном файле.
+
+Один и тот же сценарий прогоняется на временной базе дважды: с
+настройками SQLite по умолчанию (rollback journal) и с ``SQLITE_PRAGMAS``
+из настроек. Для каждого профиля печатаются число операций, ошибки
+``database is locked`` и перцентили задержек.
+"""
+
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bot_app.services.db import sqlite_pragma_statements
+
+# Таймаут модуля sqlite3 по умолчанию, как у Django без OPTIONS["timeout"]
+DEFAULT_TIMEOUT = 5.0
+
+
+class _Worker(threading.Thread):
+    def __init__(self, path: Path, pragmas: List[str], rows: int,
+                 deadline: float, writer: bool) -> None:
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.rows = rows
+        self.deadline = deadline
+        self.writer = writer
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def run(self) -> None:
+        conn = sqlite3.connect(self.path, timeout=DEFAULT_TIMEOUT, isolation_level=None)
+        for statement in self.pragmas:
+            conn.execute(statement)
+        rng = random.Random()
+        while time.monotonic() < self.deadline:
+            started = time.monotonic()
+            try:
+                if self.writer:
+                    self._write(conn, rng)
+                else:
+                    self._read(conn, rng)
+            except sqlite3.OperationalError:
+                self.errors += 1
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                continue
+            self.latencies.append(time.monotonic() - started)
+        conn.close()
+
+    def _read(self, conn: sqlite3.Connection, rng: random.Random) -> None:
+        city = rng.randint(1, 10)
+        conn.execute(
+            "SELECT id FROM place WHERE city_id = ? AND category_id = ? "
+            "ORDER BY is_pinned DESC, avg_rating DESC LIMIT 50",
+            (city, rng.randint(1, 10)),
+        ).fetchall()
+        conn.execute(
+            "SELECT balance FROM user WHERE id = ?", (rng.randint(1, self.rows),)
+        ).fetchone()
+
+    def _write(self, conn: sqlite3.Connection, rng: random.Random) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        place_id = rng.randint(1, self.rows)
+        conn.execute(
+            "UPDATE place SET review_count = review_count + 1, "
+            "avg_rating = (avg_rating * review_count + ?) / (review_count + 1) "
+            "WHERE id = ?",
+            (rng.randint(1, 5), place_id),
+        )
+        conn.execute(
+            "UPDATE user SET balance = balance - 1 WHERE id = ?",
+            (rng.randint(1, self.rows),),
+        )
+        conn.execute(
+            "INSERT INTO review (place_id, text) VALUES (?, ?)",
+            (place_id, "x" * rng.randint(50, 500)),
+        )
+        conn.execute("COMMIT")
+
+
+def _prepare(path: Path, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE place (
+            id INTEGER PRIMARY KEY, city_id INTEGER, category_id INTEGER,
+            is_pinned INTEGER, avg_rating REAL, review_count INTEGER);
+        CREATE INDEX place_rank ON place (city_id, category_id, is_pinned, avg_rating);
+        CREATE TABLE user (id INTEGER PRIMARY KEY, balance INTEGER);
+        CREATE TABLE review (id INTEGER PRIMARY KEY, place_id INTEGER, text TEXT);
+        """
+    )
+    rng = random.Random(0)
+    conn.executemany(
+        "INSERT INTO place VALUES (?, ?, ?, ?, ?, ?)",
+        [(i, rng.randint(1, 10), rng.randint(1, 10), int(rng.random() < 0.05),
+          rng.uniform(1, 5), rng.randint(0, 300)) for i in range(1, rows + 1)],
+    )
+    conn.executemany("INSERT INTO user VALUES (?, ?)",
+                     [(i, 1000) for i in range(1, rows + 1)])
+    conn.commit()
+    conn.close()
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _summary(workers: List[_Worker], duration: float) -> Dict[str, float]:
+    latencies = [value for worker in workers for value in worker.latencies]
+    return {
+        "ops_per_s": len(latencies) / duration,
+        "errors": sum(worker.errors for worker in workers),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = "Сравнить конкурентный доступ к SQLite с PRAGMA по умолчанию и с SQLITE_PRAGMAS"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--duration", type=float, default=5.0,
+                            help="Длительность одного прогона, секунд")
+        parser.add_argument("--rows", type=int, default=20000,
+                            help="Число мест и пользователей в тестовой базе")
+        parser.add_argument("--dir", default=None,
+                            help="Каталог для временных баз (по умолчанию системный tmp)")
+
+    def handle(self, *args, **options):
+        profiles = {
+            "default": [],
+            "tuned": sqlite_pragma_statements(settings.SQLITE_PRAGMAS),
+        }
+        results = {}
+        for name, pragmas in profiles.items():
+            results[name] = self._run_profile(name, pragmas, options)
+
+        self.stdout.write("")
+        header = f"{'profile':<8} {'role':<7} {'ops/s':>9} {'locked':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        self.stdout.write(header)
+        for name, roles in results.items():
+            for role, summary in roles.items():
+                self.stdout.write(
+                    f"{name:<8} {role:<7} {summary['ops_per_s']:>9.1f} {summary['errors']:>7} "
+                    f"{summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f}"
+                )
+
+    def _run_profile(self, name: str, pragmas: List[str], options) -> Dict[str, Dict[str, float]]:
+        directory: Optional[str] = options["dir"]
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            path = Path(tmp) / f"bench_{name}.sqlite3"
+            _prepare(path, options["rows"])
+            self.stdout.write(f"Running '{name}' profile: {pragmas or 'SQLite defaults'}")
+
+            deadline = time.monotonic() + options["duration"]
+            readers = [_Worker(path, pragmas, options["rows"], deadline, writer=False)
+                       for _ in range(options["readers"])]
+            writers = [_Worker(path, pragmas, options["rows"], deadline, writer=True)
+                       for _ in range(options["writers"])]
+            for worker in readers + writers:
+                worker.start()
+            for worker in readers + writers:
+                worker.join()
+        return {
+            "readers": _summary(readers, options["duration"]),
+            "writers": _summary(writers, options["duration"]),
+        }
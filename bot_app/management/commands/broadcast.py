@@ -0,0 +1,128 @@
+"""
+Рассылки пользователям города.
+
+    python manage.py broadcast create --city Алматы --text "Новый гайд!" --start
+    python manage.py broadcast status
+    python manage.py broadcast pause 3
+    python manage.py broadcast start 3          # продолжить с контрольной точки
+    python manage.py broadcast run 3            # выполнить в этом процессе, без runbot
+
+``start`` ставит задачу ``run_broadcast`` для пула задач ``runbot``.
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bot_app.models import Broadcast, City
+from bot_app.services import broadcasts
+from bot_app.services.db import shutdown_executor
+
+
+class Command(BaseCommand):
+    help = "Создать, запустить, остановить рассылку или показать её прогресс"
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest="action", required=True)
+
+        create = actions.add_parser("create", help="Создать черновик рассылки")
+        create.add_argument("--city", required=True, help="Название или id города")
+        text = create.add_mutually_exclusive_group(required=True)
+        text.add_argument("--text", help="Текст (HTML)")
+        text.add_argument("--text-file", help="Файл с текстом (HTML)")
+        create.add_argument("--start", action="store_true", help="Сразу поставить в очередь")
+
+        for name, help_text in (
+            ("start", "Поставить в очередь (или продолжить остановленную)"),
+            ("pause", "Остановить после текущей пачки"),
+            ("cancel", "Отменить"),
+            ("run", "Выполнить в этом процессе"),
+        ):
+            actions.add_parser(name, help=help_text).add_argument("broadcast_id", type=int)
+
+        status = actions.add_parser("status", help="Прогресс рассылок")
+        status.add_argument("broadcast_id", type=int, nargs="?")
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        if action == "create":
+            self._create(options)
+        elif action == "status":
+            self._status(options["broadcast_id"])
+        elif action == "run":
+            self._run(options["broadcast_id"])
+        else:
+            change = {
+                "start": broadcasts.start_broadcast,
+                "pause": broadcasts.pause_broadcast,
+                "cancel": broadcasts.cancel_broadcast,
+            }[action]
+            if not change(options["broadcast_id"]):
+                raise CommandError(
+                    f"Cannot {action} broadcast {options['broadcast_id']} in its current status.")
+            self._status(options["broadcast_id"])
+
+    def _create(self, options) -> None:
+        city_arg = options["city"]
+        if city_arg.isdigit():
+            city = City.objects.filter(pk=int(city_arg)).first()
+        else:
+            # iexact в SQLite не сравнивает кириллицу без учёта регистра
+            city = next((city for city in City.objects.all()
+                         if city.name.casefold() == city_arg.casefold()), None)
+        if city is None:
+            raise CommandError(f"City {city_arg!r} not found.")
+        text = options["text"] or Path(options["text_file"]).read_text(encoding="utf-8")
+        broadcast = broadcasts.create_broadcast(city.pk, text.strip())
+        if options["start"]:
+            broadcasts.start_broadcast(broadcast.pk)
+        self._status(broadcast.pk)
+
+    def _status(self, broadcast_id) -> None:
+        queryset = Broadcast.objects.select_related("city").order_by("-pk")
+        if broadcast_id is not None:
+            queryset = queryset.filter(pk=broadcast_id)
+            if not queryset.exists():
+                raise CommandError(f"Broadcast {broadcast_id} not found.")
+        for broadcast in queryset[:20]:
+            self.stdout.write(
+                f"#{broadcast.pk} {broadcast.city} [{broadcast.status}] "
+                f"sent {broadcast.sent_count}, blocked {broadcast.blocked_count}, "
+                f"failed {broadcast.failed_count} of {broadcast.total_count}; "
+                f"checkpoint {broadcast.last_user_id}")
+
+    def _run(self, broadcast_id: int) -> None:
+        if not settings.BOT_TOKEN:
+            raise CommandError("BOT_TOKEN is not set in environment or settings.")
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        )
+        if not Broadcast.objects.filter(pk=broadcast_id).exists():
+            raise CommandError(f"Broadcast {broadcast_id} not found.")
+        broadcasts.start_broadcast(broadcast_id, enqueue=False)
+        try:
+            status = asyncio.run(self._run_async(broadcast_id))
+        except KeyboardInterrupt:
+            # Продолжить можно командой start или run
+            broadcasts.pause_broadcast(broadcast_id)
+            self.stdout.write(self.style.WARNING("Interrupted, broadcast paused."))
+        else:
+            if status is None:
+                raise CommandError(
+                    f"Broadcast {broadcast_id} is not queued or is already running.")
+        finally:
+            shutdown_executor()
+        self._status(broadcast_id)
+
+    async def _run_async(self, broadcast_id: int):
+        from bot_app.services.runtime import create_bot
+
+        bot = create_bot(settings.BOT_TOKEN)
+        try:
+            return await broadcasts.run_broadcast(bot, broadcast_id)
+        finally:
+            await bot.session.close()
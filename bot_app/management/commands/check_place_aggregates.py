@@ -0,0 +1,40 @@
+"""
+Сверка накопленных агрегатов мест с опубликованными отзывами.
+"""
+
+from django.core.management.base import BaseCommand
+
+from bot_app.services.aggregates import rebuild_place_aggregates
+
+MAX_REPORTED = 20
+
+
+class Command(BaseCommand):
+    help = "Сверить rating/price агрегаты мест с отзывами (одним GROUP BY) и при необходимости исправить"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Перезаписать расходящиеся агрегаты значениями из отзывов",
+        )
+
+    def handle(self, *args, **options):
+        drift = rebuild_place_aggregates(fix=options["fix"])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("All place aggregates are consistent."))
+            return
+
+        for place_id, stored, expected in drift[:MAX_REPORTED]:
+            self.stdout.write(
+                f"Place {place_id}: stored (rating_sum, review_count, price_sum, price_count)="
+                f"{stored}, expected={expected}"
+            )
+        if len(drift) > MAX_REPORTED:
+            self.stdout.write(f"... and {len(drift) - MAX_REPORTED} more")
+
+        if options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} places."))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{len(drift)} places drifted. Run with --fix to rebuild them."))
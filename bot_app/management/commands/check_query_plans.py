@@ -0,0 +1,96 @@
+"""
+Проверка планов горячих запросов бота.
+
+Для каждого запроса выполняется EXPLAIN (в SQLite — EXPLAIN QUERY PLAN)
+и проверяется, что в плане есть ожидаемый составной индекс. Команда
+завершается ошибкой, если хотя бы один запрос его не использует, поэтому
+её можно запускать в CI после изменения запросов или миграций.
+
+В PostgreSQL на почти пустой базе планировщик предпочитает seq scan,
+поэтому на время проверки он отключается (``SET LOCAL enable_seqscan``).
+"""
+
+from typing import Callable, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from bot_app.models import Guide, Review, ReviewPhoto
+from bot_app.services.ranking import ranked_places
+
+# Подставляются в запросы; на план значения не влияют
+SAMPLE_ID = 1
+
+
+def _hot_queries() -> List[Tuple[str, Callable[[], QuerySet], str]]:
+    """(название, построитель запроса, ожидаемый индекс)"""
+    return [
+        (
+            "category search (services.ranking.rank_places)",
+            lambda: ranked_places(SAMPLE_ID, SAMPLE_ID).values_list("id", flat=True)[:50],
+            "place_city_cat_rank_idx",
+        ),
+        (
+            "place photos (handlers.search.get_recent_place_photos)",
+            lambda: ReviewPhoto.objects.filter(place_id=SAMPLE_ID)
+            .order_by("-created_at", "-id").values_list("file_id", flat=True)[:5],
+            "reviewphoto_place_recent_idx",
+        ),
+        (
+            "summary reviews (services.ai_service._fetch_place_and_reviews)",
+            lambda: Review.objects.filter(
+                place_id=SAMPLE_ID, status=Review.Status.PUBLISHED,
+            ).order_by("-id").values_list("id", "text")[:10],
+            "review_place_status_idx",
+        ),
+        (
+            "duplicate review check (handlers.review.user_has_review)",
+            lambda: Review.objects.filter(
+                user_id=SAMPLE_ID, place_id=SAMPLE_ID).values("id")[:1],
+            "review_user_place_idx",
+        ),
+        (
+            "guide topics (handlers.guides.fetch_guide_topics_by_category)",
+            lambda: Guide.objects.filter(
+                category_id=SAMPLE_ID, city_id=SAMPLE_ID,
+            ).order_by("topic").values("id", "topic", "city__name"),
+            "guide_city_cat_topic_idx",
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Проверить, что горячие запросы используют составные индексы (EXPLAIN)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Печатать план каждого запроса целиком",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            failures = self._check_plans(options)
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} queries do not use their indexes: {', '.join(failures)}")
+
+    def _check_plans(self, options) -> List[str]:
+        failures = []
+        for name, build, index_name in _hot_queries():
+            plan = build().explain()
+            if index_name in plan:
+                self.stdout.write(self.style.SUCCESS(f"OK   {name}: {index_name}"))
+            else:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f"MISS {name}: expected {index_name}"))
+            if options["verbose_plans"] or index_name not in plan:
+                self.stdout.write(f"     {plan}")
+        return failures
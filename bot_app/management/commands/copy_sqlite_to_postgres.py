@@ -0,0 +1,131 @@
+"""
+Перенос данных из файла SQLite в текущую базу (``DATABASE_URL``).
+
+Целевая база должна быть пустой и уже мигрированной (``manage.py migrate``).
+Таблицы копируются в порядке зависимостей пачками по первичному ключу
+(keyset: ``WHERE pk > последний ORDER BY pk``), поэтому в памяти находится
+только одна пачка. Всё копирование — одна транзакция в целевой базе:
+при ошибке база остаётся пустой. В конце сбрасываются последовательности
+первичных ключей и сверяется число строк.
+"""
+
+from pathlib import Path
+from typing import List, Type
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+
+SOURCE_ALIAS = "sqlite_source"
+# Заполняются самим migrate — в целевой базе заменяются данными источника
+GENERATED_MODELS = ("contenttypes.contenttype", "auth.permission")
+
+
+def _source_settings(path: Path) -> dict:
+    return {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": str(path),
+        "USER": "",
+        "PASSWORD": "",
+        "HOST": "",
+        "PORT": "",
+        "ATOMIC_REQUESTS": False,
+        "AUTOCOMMIT": True,
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": False,
+        "OPTIONS": {},
+        "TIME_ZONE": None,
+        "TEST": {},
+    }
+
+
+def _models_in_order() -> List[Type[models.Model]]:
+    app_list = [(app_config, None) for app_config in apps.get_app_configs()]
+    ordered = [
+        model for model in serializers.sort_dependencies(app_list, allow_cycles=True)
+        if model._meta.managed and not model._meta.proxy
+    ]
+    # Промежуточные таблицы ManyToMany — после обеих связанных таблиц
+    through = []
+    for model in ordered:
+        for field in model._meta.local_many_to_many:
+            through_model = field.remote_field.through
+            if through_model._meta.auto_created and through_model not in through:
+                through.append(through_model)
+    return ordered + through
+
+
+class Command(BaseCommand):
+    help = "Скопировать данные из SQLite-файла в текущую базу (PostgreSQL) пачками"
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Путь к файлу SQLite")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        source = Path(options["source"]).resolve()
+        if not source.is_file():
+            raise CommandError(f"SQLite file not found: {source}")
+        target = connections[DEFAULT_DB_ALIAS]
+        if target.vendor == "sqlite" and Path(target.settings_dict["NAME"]).resolve() == source:
+            raise CommandError("Source and target are the same database")
+
+        connections.settings[SOURCE_ALIAS] = _source_settings(source)
+        try:
+            self._copy(self._models_to_copy(), options["batch_size"])
+        finally:
+            connections[SOURCE_ALIAS].close()
+            del connections[SOURCE_ALIAS]
+            del connections.settings[SOURCE_ALIAS]
+        ContentType.objects.clear_cache()
+
+    def _models_to_copy(self) -> List[Type[models.Model]]:
+        to_copy = _models_in_order()
+        not_empty = [
+            model._meta.label for model in to_copy
+            if model._meta.label_lower not in GENERATED_MODELS
+            and model._base_manager.using(DEFAULT_DB_ALIAS).exists()
+        ]
+        if not_empty:
+            raise CommandError(
+                f"Target database is not empty: {', '.join(not_empty)}")
+        return to_copy
+
+    def _copy(self, to_copy: List[Type[models.Model]], batch_size: int) -> None:
+        target = connections[DEFAULT_DB_ALIAS]
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            # Каскадно удаляет и права (auth.Permission)
+            ContentType.objects.using(DEFAULT_DB_ALIAS).all().delete()
+
+            for model in to_copy:
+                copied = self._copy_model(model, batch_size)
+                self.stdout.write(f"{model._meta.label}: {copied}")
+
+            with target.cursor() as cursor:
+                for statement in target.ops.sequence_reset_sql(no_style(), to_copy):
+                    cursor.execute(statement)
+
+            mismatched = [
+                model._meta.label for model in to_copy
+                if model._base_manager.using(SOURCE_ALIAS).count()
+                != model._base_manager.using(DEFAULT_DB_ALIAS).count()
+            ]
+            if mismatched:
+                raise CommandError(f"Row counts differ after copy: {', '.join(mismatched)}")
+        self.stdout.write(self.style.SUCCESS(f"Copied {len(to_copy)} tables"))
+
+    def _copy_model(self, model: Type[models.Model], batch_size: int) -> int:
+        queryset = model._base_manager.using(SOURCE_ALIAS).order_by("pk")
+        copied = 0
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(page[:batch_size])
+            if not batch:
+                return copied
+            model._base_manager.using(DEFAULT_DB_ALIAS).bulk_create(batch)
+            copied += len(batch)
+            last_pk = batch[-1].pk
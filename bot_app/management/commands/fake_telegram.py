@@ -0,0 +1,255 @@
+"""
+Поддельный Telegram для нагрузочных тестов бота без сети.
+
+Команда поднимает минимальный Bot API сервер (отвечает на любые методы
+правдоподобными объектами) и отправляет боту синтетические апдейты:
+POST на вебхук (``--mode webhook``) или через ``getUpdates``
+(``--mode polling``). Задержка апдейта — время от отправки до первого
+ответа бота в этот чат.
+
+    python manage.py fake_telegram --updates 2000 --chats 200
+    TELEGRAM_API_SERVER=http://127.0.0.1:8081 python manage.py runbot --webhook
+
+Сначала запускается ``fake_telegram``: он ждёт, пока бот станет доступен.
+"""
+
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+FAKE_BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake bot", "username": "fake_bot"}
+# Методы без объекта Message в ответе
+TRUE_METHODS = {"sendChatAction"}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class FakeTelegram:
+    def __init__(self) -> None:
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self.calls: Counter = Counter()
+        # Время отправки апдейтов, ещё не получивших ответа, по чатам
+        self._pending: Dict[int, Deque[float]] = defaultdict(deque)
+        self.latencies: List[float] = []
+        self.ack_latencies: List[float] = []
+        self.http_errors: Counter = Counter()
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self.all_replied = asyncio.Event()
+        self.expected = 0
+        self.first_poll = asyncio.Event()
+
+    # --- Bot API ---
+
+    def _message(self, chat_id: Any, text: str = "") -> Dict[str, Any]:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "text": text,
+        }
+
+    def _replied(self, chat_id: Any) -> None:
+        pending = self._pending.get(int(chat_id))
+        if pending:
+            self.latencies.append(time.monotonic() - pending.popleft())
+            if len(self.latencies) >= self.expected:
+                self.all_replied.set()
+
+    async def api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params: Dict[str, Any] = dict(await request.post())
+        if not params and request.can_read_body:
+            params = await request.json()
+
+        if method == "getUpdates":
+            self.first_poll.set()
+            result: Any = await self._get_updates(float(params.get("timeout") or 0))
+        elif method == "getMe":
+            result = FAKE_BOT_USER
+        elif method == "sendMediaGroup":
+            media = params.get("media") or "[]"
+            count = len(json.loads(media) if isinstance(media, str) else media)
+            result = [self._message(params["chat_id"]) for _ in range(count)]
+            self._replied(params["chat_id"])
+        elif "chat_id" in params and method not in TRUE_METHODS and (
+            method.startswith("send") or method.startswith("edit")
+        ):
+            result = self._message(params["chat_id"], params.get("text", ""))
+            self._replied(params["chat_id"])
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, timeout: float) -> List[Dict[str, Any]]:
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self._queue.get(), timeout or 0.01))
+        except asyncio.TimeoutError:
+            return []
+        while not self._queue.empty() and len(updates) < 100:
+            updates.append(self._queue.get_nowait())
+        return updates
+
+    # --- Апдейты ---
+
+    def make_update(self, chat_id: int, text: str) -> Dict[str, Any]:
+        update_id = next(self._update_ids)
+        user = {"id": chat_id, "is_bot": False, "first_name": f"User {chat_id}"}
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+                "from": user,
+                "text": text,
+            },
+        }
+
+    def sent(self, chat_id: int) -> None:
+        self._pending[chat_id].append(time.monotonic())
+
+    def enqueue(self, update: Dict[str, Any]) -> None:
+        self._queue.put_nowait(update)
+
+
+class Command(BaseCommand):
+    help = "Поддельный Bot API и генератор апдейтов для нагрузочного теста runbot"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=("webhook", "polling"), default="webhook")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8081,
+                            help="Порт поддельного Bot API (TELEGRAM_API_SERVER)")
+        parser.add_argument("--bot-url", default=None,
+                            help="Адрес вебхука бота (по умолчанию из WEBHOOK_PORT/WEBHOOK_PATH)")
+        parser.add_argument("--updates", type=int, default=1000)
+        parser.add_argument("--chats", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=50,
+                            help="Одновременных POST на вебхук")
+        parser.add_argument("--text", action="append", default=None,
+                            help="Текст сообщений (можно несколько, по кругу); по умолчанию /start")
+        parser.add_argument("--timeout", type=float, default=120.0,
+                            help="Сколько ждать ответов после отправки, секунд")
+
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options))
+
+    async def _run(self, options) -> None:
+        fake = FakeTelegram()
+        fake.expected = options["updates"]
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", fake.api)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, options["host"], options["port"]).start()
+        self.stdout.write(
+            f"Fake Bot API on http://{options['host']}:{options['port']} "
+            f"(set TELEGRAM_API_SERVER to this address)")
+
+        texts = options["text"] or ["/start"]
+        updates = [
+            fake.make_update(1 + i % options["chats"], texts[i % len(texts)])
+            for i in range(options["updates"])
+        ]
+        try:
+            started = time.monotonic()
+            if options["mode"] == "webhook":
+                bot_url = options["bot_url"] or (
+                    f"http://127.0.0.1:{settings.WEBHOOK_PORT}{settings.WEBHOOK_PATH}")
+                await self._wait_for_webhook(bot_url)
+                started = time.monotonic()
+                await self._post_updates(fake, bot_url, updates, options["concurrency"])
+            else:
+                self.stdout.write("Waiting for the bot to poll...")
+                await fake.first_poll.wait()
+                started = time.monotonic()
+                for update in updates:
+                    fake.sent(update["message"]["chat"]["id"])
+                    fake.enqueue(update)
+            sent_in = time.monotonic() - started
+            try:
+                await asyncio.wait_for(fake.all_replied.wait(), options["timeout"])
+            except asyncio.TimeoutError:
+                self.stdout.write(self.style.WARNING("Timed out waiting for replies"))
+            elapsed = time.monotonic() - started
+        finally:
+            await runner.cleanup()
+        self._report(fake, len(updates), sent_in, elapsed)
+
+    async def _wait_for_webhook(self, bot_url: str) -> None:
+        self.stdout.write(f"Waiting for the bot webhook at {bot_url}...")
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    # Без секрета бот отвечает 401 — значит, сервер уже слушает
+                    async with session.post(bot_url, json={}):
+                        return
+                except aiohttp.ClientConnectionError:
+                    await asyncio.sleep(0.5)
+
+    async def _post_updates(
+        self, fake: FakeTelegram, bot_url: str, updates: List[Dict[str, Any]], concurrency: int
+    ) -> None:
+        headers = {"X-Telegram-Bot-Api-Secret-Token": settings.WEBHOOK_SECRET}
+        # Апдейты одного чата отправляются по порядку, как это делает Telegram
+        by_chat: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for update in updates:
+            by_chat[update["message"]["chat"]["id"]].append(update)
+        slots = asyncio.Semaphore(concurrency)
+
+        async def post_chat(session: aiohttp.ClientSession, chat_updates) -> None:
+            for update in chat_updates:
+                async with slots:
+                    fake.sent(update["message"]["chat"]["id"])
+                    posted = time.monotonic()
+                    status: Optional[int] = None
+                    try:
+                        async with session.post(bot_url, json=update, headers=headers) as response:
+                            status = response.status
+                    except aiohttp.ClientError:
+                        status = None
+                    fake.ack_latencies.append(time.monotonic() - posted)
+                    if status != 200:
+                        fake.http_errors[status] += 1
+
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(post_chat(session, chat) for chat in by_chat.values()))
+
+    def _report(self, fake: FakeTelegram, total: int, sent_in: float, elapsed: float) -> None:
+        replied = len(fake.latencies)
+        self.stdout.write("")
+        self.stdout.write(f"Updates sent:     {total} in {sent_in:.2f}s")
+        self.stdout.write(
+            f"Updates replied:  {replied} in {elapsed:.2f}s "
+            f"({replied / elapsed if elapsed else 0:.1f} updates/s)")
+        if fake.latencies:
+            self.stdout.write(
+                "Reply latency:    "
+                f"p50 {statistics.median(fake.latencies) * 1000:.1f} ms, "
+                f"p95 {_percentile(fake.latencies, 0.95) * 1000:.1f} ms, "
+                f"p99 {_percentile(fake.latencies, 0.99) * 1000:.1f} ms")
+        if fake.ack_latencies:
+            self.stdout.write(
+                "Webhook ack:      "
+                f"p50 {statistics.median(fake.ack_latencies) * 1000:.1f} ms, "
+                f"p95 {_percentile(fake.ack_latencies, 0.95) * 1000:.1f} ms")
+        if fake.http_errors:
+            self.stdout.write(f"Webhook errors:   {dict(fake.http_errors)}")
+        self.stdout.write(f"API calls:        {dict(fake.calls.most_common())}")
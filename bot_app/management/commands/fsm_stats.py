@@ -0,0 +1,102 @@
+"""
+Сколько места занимают состояния FSM: по состояниям и по ключам данных.
+
+Читает таблицу ``FSMRecord`` (``FSM_STORAGE=db``) потоком, не загружая
+её целиком. Размеры — байты компактного JSON, то есть примерно столько
+данных держит процесс бота с ``FSM_STORAGE=memory`` на одно состояние.
+``--users`` прикидывает объём для заданного числа активных пользователей.
+"""
+
+import json
+from collections import defaultdict
+from typing import Dict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bot_app.models import FSMRecord, ResultSet
+from bot_app.services.fsm_storage import loads
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode())
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class Command(BaseCommand):
+    help = "Показать объём данных FSM по состояниям и ключам"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000,
+                            help="Число активных пользователей для прогноза")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        by_state: Dict[str, Dict[str, int]] = defaultdict(lambda: {"records": 0, "stored": 0})
+        by_key: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"records": 0, "bytes": 0, "max": 0})
+        records = stored = data_bytes = 0
+
+        rows = (
+            FSMRecord.objects.filter(expires_at__gt=now)
+            .values_list("state", "data")
+            .iterator(chunk_size=2000)
+        )
+        for state, blob in rows:
+            records += 1
+            stored += len(blob)
+            bucket = by_state[state or "(no state)"]
+            bucket["records"] += 1
+            bucket["stored"] += len(blob)
+            data = loads(blob)
+            data_bytes += _json_size(data) if data else 0
+            for key, value in data.items():
+                size = _json_size(value)
+                stats = by_key[key]
+                stats["records"] += 1
+                stats["bytes"] += size
+                stats["max"] = max(stats["max"], size)
+
+        expired = FSMRecord.objects.filter(expires_at__lte=now).count()
+        self.stdout.write(
+            f"FSM records: {records} active, {expired} expired; "
+            f"stored {_format_bytes(stored)}, JSON {_format_bytes(data_bytes)}")
+
+        self.stdout.write("\nBy state:")
+        self.stdout.write(f"  {'state':<40} {'records':>8} {'stored':>11} {'avg':>10}")
+        for state, stats in sorted(by_state.items(), key=lambda item: -item[1]["stored"]):
+            self.stdout.write(
+                f"  {state:<40} {stats['records']:>8} {_format_bytes(stats['stored']):>11} "
+                f"{_format_bytes(stats['stored'] / stats['records']):>10}")
+
+        self.stdout.write(f"\nBy data key (limit {settings.FSM_MAX_VALUE_BYTES} B per value):")
+        self.stdout.write(f"  {'key':<40} {'records':>8} {'total':>11} {'avg':>10} {'max':>10}")
+        for key, stats in sorted(by_key.items(), key=lambda item: -item[1]["bytes"]):
+            self.stdout.write(
+                f"  {key:<40} {stats['records']:>8} {_format_bytes(stats['bytes']):>11} "
+                f"{_format_bytes(stats['bytes'] / stats['records']):>10} "
+                f"{_format_bytes(stats['max']):>10}")
+
+        result_sets = ResultSet.objects.filter(expires_at__gt=now)
+        result_set_bytes = sum(
+            _json_size(items)
+            for items in result_sets.values_list("items", flat=True).iterator(chunk_size=500)
+        )
+        self.stdout.write(
+            f"\nResult sets: {result_sets.count()} active, {_format_bytes(result_set_bytes)}")
+
+        if records:
+            users = options["users"]
+            per_record = data_bytes / records
+            self.stdout.write(
+                f"\nEstimate for {users} users with state: "
+                f"{_format_bytes(per_record * users)} of FSM data "
+                f"({_format_bytes(per_record)} per user)")
@@ -1,22 +1,164 @@
+"""
+Перегенерация ai_summary всех мест с ограничением параллельности и
+частоты запросов к LLM.
+
+Прогресс сохраняется в чекпоинт: ``--resume`` продолжает после последнего
+места, до которого всё обработано без ошибок, поэтому места, где LLM не
+ответил, повторяются.
+"""
+
 import asyncio
+import json
+import time
+from pathlib import Path
+from typing import List, Optional, Set
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
 from bot_app.models import Place
-from bot_app.services.ai_service import update_place_summary
+from bot_app.services.ai_service import (
+    close_async_client,
+    place_summary_is_stale,
+    update_place_summary,
+)
+from bot_app.services.db import run_db, shutdown_executor
+from bot_app.utils.rate_limit import TokenBucket
+
+DEFAULT_CHECKPOINT = "recalc_summaries.checkpoint.json"
+CHECKPOINT_EVERY = 25
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
 
 
 class Command(BaseCommand):
     help = "Recalculate AI summaries for all places."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=4,
+            help="Сколько мест обрабатывать одновременно (по умолчанию 4).",
+        )
+        parser.add_argument(
+            "--rate", type=float, default=2.0,
+            help="Максимум запросов к LLM в секунду (0 — без ограничения).",
+        )
+        parser.add_argument(
+            "--only-stale", action="store_true",
+            help="Пропускать места, отзывы которых не менялись с прошлого саммари.",
+        )
+        parser.add_argument(
+            "--resume", action="store_true",
+            help="Продолжить с места, сохранённого в чекпоинте.",
+        )
+        parser.add_argument(
+            "--checkpoint", default=str(settings.BASE_DIR / DEFAULT_CHECKPOINT),
+            help="Файл чекпоинта.",
+        )
+
     def handle(self, *args, **options):
-        place_ids = list(Place.objects.values_list("id", flat=True))
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        checkpoint = Path(options["checkpoint"])
+        start_after = 0
+        if options["resume"]:
+            start_after = self._load_checkpoint(checkpoint)
+            self.stdout.write(f"Resuming after place #{start_after}")
+
+        place_ids = list(
+            Place.objects.filter(id__gt=start_after)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if not place_ids:
+            self.stdout.write(self.style.SUCCESS("Nothing to recalculate."))
+            return
 
-        async def recalc():
-            for place_id in place_ids:
-                await update_place_summary(place_id)
-                self.stdout.write(f"Updated place #{place_id}")
+        try:
+            failed = asyncio.run(self._recalc(place_ids, checkpoint, options))
+        finally:
+            shutdown_executor()
 
-        asyncio.run(recalc())
+        if failed:
+            raise CommandError(
+                f"{failed} places failed; rerun with --resume to retry them.")
+        if checkpoint.exists():
+            checkpoint.unlink()
         self.stdout.write(self.style.SUCCESS("AI summaries recalculated."))
 
+    def _load_checkpoint(self, path: Path) -> int:
+        if not path.exists():
+            return 0
+        try:
+            return int(json.loads(path.read_text())["last_place_id"])
+        except (ValueError, KeyError, TypeError) as exc:
+            raise CommandError(f"Broken checkpoint {path}: {exc}") from exc
+
+    def _save_checkpoint(self, path: Path, last_place_id: int, done: int) -> None:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps({
+            "last_place_id": last_place_id,
+            "done": done,
+            "saved_at": time.time(),
+        }))
+        tmp.replace(path)
+
+    async def _recalc(self, place_ids: List[int], checkpoint: Path, options) -> int:
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        bucket: Optional[TokenBucket] = (
+            TokenBucket(options["rate"]) if options["rate"] > 0 else None
+        )
+        only_stale = options["only_stale"]
+        total = len(place_ids)
+        started = time.monotonic()
+        completed: Set[int] = set()
+        failed: Set[int] = set()
+        watermark = {"index": 0}
+
+        def advance_watermark() -> Optional[int]:
+            # Чекпоинт — последний id, до которого всё обработано без ошибок
+            idx = watermark["index"]
+            while idx < total and place_ids[idx] in completed:
+                idx += 1
+            watermark["index"] = idx
+            return place_ids[idx - 1] if idx else None
+
+        async def process(place_id: int) -> None:
+            async with semaphore:
+                try:
+                    if only_stale and not await run_db(place_summary_is_stale, place_id):
+                        outcome = "skipped"
+                    else:
+                        if bucket is not None:
+                            await bucket.acquire()
+                        updated = await update_place_summary(place_id, force=not only_stale)
+                        outcome = "updated" if updated else "unchanged"
+                    completed.add(place_id)
+                except Exception as exc:  # pylint: disable=broad-except
+                    failed.add(place_id)
+                    outcome = f"failed ({type(exc).__name__}: {exc})"
+
+            done = len(completed) + len(failed)
+            elapsed = time.monotonic() - started
+            speed = done / elapsed if elapsed else 0.0
+            eta = (total - done) / speed if speed else 0.0
+            self.stdout.write(
+                f"[{done}/{total}] place #{place_id}: {outcome} "
+                f"({speed:.2f}/s, ETA {_format_eta(eta)})"
+            )
+            last_done = advance_watermark()
+            if last_done is not None and done % CHECKPOINT_EVERY == 0:
+                self._save_checkpoint(checkpoint, last_done, done)
+
+        try:
+            await asyncio.gather(*(process(place_id) for place_id in place_ids))
+        finally:
+            last_done = advance_watermark()
+            if last_done is not None:
+                self._save_checkpoint(
+                    checkpoint, last_done, len(completed) + len(failed))
+            await close_async_client()
+        return len(failed)
@@ -2,9 +2,6 @@ import asyncio
 import logging
 import os
 
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 
@@ -24,29 +21,77 @@ def setup_django() -> None:
 class Command(BaseCommand):
     help = "Run the City Guide Telegram bot."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--webhook",
+            action="store_true",
+            help="Receive updates via webhook (WEBHOOK_* settings) instead of long polling.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.BOT_WORKERS,
+            help="Number of worker processes; updates are sharded by chat id (default: 1).",
+        )
+
     def handle(self, *args, **options):
         setup_django()
         token = settings.BOT_TOKEN
         if not token:
             raise CommandError(
                 "BOT_TOKEN is not set in environment or settings.")
+        if options["webhook"] and not settings.WEBHOOK_SECRET:
+            raise CommandError(
+                "WEBHOOK_SECRET must be set to run in webhook mode.")
 
         logging.basicConfig(
             level=logging.INFO,
             format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
         )
 
-        asyncio.run(self._run_polling(token))
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        if options["workers"] > 1:
+            asyncio.run(self._run_sharded(
+                token, webhook=options["webhook"], workers=options["workers"]))
+        else:
+            asyncio.run(self._run(token, webhook=options["webhook"]))
 
-    async def _run_polling(self, token: str) -> None:
-        from bot_app.handlers import get_bot_router  # import after setup
-
-        bot = Bot(
-            token=token,
-            default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    async def _run(self, token: str, *, webhook: bool) -> None:
+        from bot_app.services.runtime import (  # import after setup
+            background_services,
+            build_dispatcher,
+            create_bot,
         )
-        dp = Dispatcher()
-        dp.include_router(get_bot_router())
+        from bot_app.services.webhook import serve_webhook
+
+        bot = create_bot(token)
+        dp = build_dispatcher()
+        async with background_services(bot):
+            if webhook:
+                await serve_webhook(dp, bot)
+            else:
+                await bot.delete_webhook(drop_pending_updates=True)
+                await dp.start_polling(bot)
+
+    async def _run_sharded(self, token: str, *, webhook: bool, workers: int) -> None:
+        from bot_app.services.db import run_db
+        from bot_app.services.jobs import recover_interrupted_jobs
+        from bot_app.services.runtime import build_dispatcher, create_bot
+        from bot_app.services.sharding import Supervisor, poll_updates, serve_sharded_webhook
 
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        bot = create_bot(token)
+        allowed_updates = build_dispatcher().resolve_used_update_types()
+        recovered = await run_db(recover_interrupted_jobs)
+        if recovered:
+            logging.getLogger("bot_app.jobs").info("Resumed %s interrupted jobs", recovered)
+        supervisor = Supervisor(token, workers)
+        try:
+            await supervisor.start()
+            if webhook:
+                await serve_sharded_webhook(supervisor, bot, allowed_updates)
+            else:
+                await poll_updates(supervisor, bot, allowed_updates)
+        finally:
+            await supervisor.stop()
+            await bot.session.close()
@@ -0,0 +1,14 @@
+from aiogram import Dispatcher
+
+from .chat_lanes import ChatLanesMiddleware
+from .user_context import UserContextMiddleware
+
+
+def setup_middlewares(dp: Dispatcher) -> None:
+    # Очередь чата должна охватывать чтение состояния, поэтому
+    # ChatLanesMiddleware ставится перед FSM-middleware диспетчера
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(ChatLanesMiddleware())
+    dp.update.outer_middleware(dp.fsm)
+    # Встроенный middleware aiogram уже положил event_from_user в data
+    dp.update.outer_middleware(UserContextMiddleware())
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject, Update
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Что делать с нажатием кнопки, если такое же нажатие (та же кнопка того же
+# сообщения) ещё ждёт в очереди чата: drop — отбросить повтор, merge —
+# отдать его ожидающему хендлеру, который получит число нажатий в
+# ``callback_repeat``. Не перечисленные кнопки — drop.
+DROP = "drop"
+MERGE = "merge"
+CALLBACK_POLICIES: Dict[str, str] = {
+    "nav_next": MERGE,
+    "nav_prev": MERGE,
+}
+
+
+class ChatLaneStats:
+    """Счётчики очередей чатов."""
+
+    def __init__(self) -> None:
+        self.lanes = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.dropped = 0
+        self.merged = 0
+        self.overflowed = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "lanes": self.lanes,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "overflowed": self.overflowed,
+        }
+
+
+stats = ChatLaneStats()
+
+
+class _Waiter:
+    __slots__ = ("future", "match", "repeat")
+
+    def __init__(self, future: "asyncio.Future[None]", match: Optional[Tuple[Any, str]]) -> None:
+        self.future = future
+        self.match = match
+        self.repeat = 1
+
+
+class _Lane:
+    __slots__ = ("waiting",)
+
+    def __init__(self) -> None:
+        self.waiting: Deque[_Waiter] = deque()
+
+
+class ChatLanesMiddleware(BaseMiddleware):
+    """
+    Апдейты одного чата обрабатываются строго по очереди, разных чатов —
+    параллельно. В очереди чата ждут не больше ``CHAT_LANE_MAX_PENDING``
+    апдейтов, лишние отбрасываются; повторные нажатия кнопок — по
+    ``CALLBACK_POLICIES``.
+
+    Регистрируется до ``FSMContextMiddleware``: состояние читается уже
+    после того, как апдейт дождался своей очереди.
+    """
+
+    def __init__(self, max_pending: Optional[int] = None) -> None:
+        self.max_pending = max_pending or settings.CHAT_LANE_MAX_PENDING
+        # Чат -> очередь; чат без записи свободен, с записью — занят
+        self._lanes: Dict[Hashable, _Lane] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = self._lane_key(data)
+        if key is None:
+            return await handler(event, data)
+        callback = event.callback_query if isinstance(event, Update) else None
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            self._lanes[key] = lane = _Lane()
+            stats.lanes += 1
+        else:
+            waiter = await self._wait_turn(key, lane, callback)
+            if waiter is None:
+                return None
+            if callback is not None:
+                data["callback_repeat"] = waiter.repeat
+        try:
+            return await handler(event, data)
+        finally:
+            self._release(key, lane)
+
+    @staticmethod
+    def _lane_key(data: Dict[str, Any]) -> Optional[Hashable]:
+        chat = data.get("event_chat")
+        if chat is not None:
+            return chat.id
+        user = data.get("event_from_user")
+        if user is not None:
+            return ("user", user.id)
+        return None
+
+    async def _wait_turn(
+        self, key: Hashable, lane: _Lane, callback: Optional[CallbackQuery]
+    ) -> Optional[_Waiter]:
+        """Дождаться очереди; None — апдейт отброшен (повтор или переполнение)."""
+        match = None
+        if callback is not None and callback.data:
+            message_id = callback.message.message_id if callback.message else None
+            match = (message_id, callback.data)
+            for waiter in lane.waiting:
+                if waiter.match == match:
+                    if CALLBACK_POLICIES.get(callback.data, DROP) == MERGE:
+                        waiter.repeat += 1
+                        stats.merged += 1
+                    else:
+                        stats.dropped += 1
+                    await _answer(callback)
+                    return None
+        if len(lane.waiting) >= self.max_pending:
+            stats.overflowed += 1
+            logger.warning("Chat %s has %s pending updates, dropping update",
+                           key, len(lane.waiting))
+            if callback is not None:
+                await _answer(callback)
+            return None
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), match)
+        lane.waiting.append(waiter)
+        stats.waiting += 1
+        stats.max_waiting = max(stats.max_waiting, len(lane.waiting))
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.cancelled():
+                if waiter in lane.waiting:
+                    lane.waiting.remove(waiter)
+                    stats.waiting -= 1
+            else:
+                # Очередь уже передана этому апдейту — передать её дальше
+                self._release(key, lane)
+            raise
+        return waiter
+
+    def _release(self, key: Hashable, lane: _Lane) -> None:
+        while lane.waiting:
+            waiter = lane.waiting.popleft()
+            stats.waiting -= 1
+            # Отменённый апдейт мог ещё не успеть убрать себя из очереди
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                return
+        del self._lanes[key]
+        stats.lanes -= 1
+
+
+async def _answer(callback: CallbackQuery) -> None:
+    """Погасить «часики» на отброшенном нажатии."""
+    try:
+        await callback.answer()
+    except Exception:  # pylint: disable=broad-except
+        logger.debug("Failed to answer dropped callback", exc_info=True)
@@ -0,0 +1,23 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot_app.services.users import get_user
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """
+    Загружает пользователя бота (с городом) один раз на апдейт и передаёт
+    его хендлерам в аргументе ``db_user`` (``None`` — не зарегистрирован).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        data["db_user"] = await get_user(from_user.id) if from_user else None
+        return await handler(event, data)
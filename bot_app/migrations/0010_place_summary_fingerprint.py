@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0009_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='summary_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0011_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guide',
+            index=models.Index(fields=['city', 'category', 'topic'], name='guide_city_cat_topic_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['city', 'category', 'is_pinned', '-avg_rating', '-review_count'], name='place_city_cat_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['place', 'status', '-id'], name='review_place_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', 'place'], name='review_user_place_idx'),
+        ),
+    ]
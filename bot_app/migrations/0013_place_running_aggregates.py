@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:05
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Round
+
+
+def backfill_aggregates(apps, schema_editor):
+    Place = apps.get_model("bot_app", "Place")
+    Review = apps.get_model("bot_app", "Review")
+
+    # Сумма оценок согласуется с уже показанными avg_rating/review_count
+    Place.objects.update(rating_sum=Round(F("avg_rating") * F("review_count")))
+
+    priced = (
+        Review.objects.filter(status="published", price__gt=0)
+        .values("place_id")
+        .annotate(total=Sum("price"), count=Count("id"))
+    )
+    for row in priced.iterator():
+        Place.objects.filter(id=row["place_id"]).update(
+            price_sum=row["total"], price_count=row["count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0012_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='price_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='price_sum',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
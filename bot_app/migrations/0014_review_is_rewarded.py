@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:08
+
+from django.db import migrations, models
+
+
+def mark_published_rewarded(apps, schema_editor):
+    # Опубликованные раньше отзывы уже принесли награду
+    Review = apps.get_model("bot_app", "Review")
+    Review.objects.filter(status="published").update(is_rewarded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0013_place_running_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='is_rewarded',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_published_rewarded, migrations.RunPython.noop),
+    ]
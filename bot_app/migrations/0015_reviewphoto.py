@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def backfill_photos(apps, schema_editor):
+    Review = apps.get_model("bot_app", "Review")
+    ReviewPhoto = apps.get_model("bot_app", "ReviewPhoto")
+    now = django.utils.timezone.now()
+    batch = []
+    reviews = (
+        Review.objects.filter(status="published")
+        .exclude(photo_ids=[])
+        .exclude(photo_ids__isnull=True)
+        .order_by("id")
+        .values_list("id", "place_id", "photo_ids")
+    )
+    for review_id, place_id, photo_ids in reviews.iterator():
+        # Новее = больший id, поэтому фото отзыва кладём в обратном порядке
+        for file_id in reversed(list(photo_ids or [])):
+            batch.append(ReviewPhoto(
+                review_id=review_id, place_id=place_id,
+                file_id=file_id, created_at=now))
+        if len(batch) >= BATCH_SIZE:
+            ReviewPhoto.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ReviewPhoto.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0014_review_is_rewarded'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewPhoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photos', to='bot_app.place')),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photos', to='bot_app.review')),
+            ],
+            options={
+                'verbose_name': 'Review photo',
+                'verbose_name_plural': 'Review photos',
+                'indexes': [models.Index(fields=['place', '-created_at', '-id'], name='reviewphoto_place_recent_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_photos, migrations.RunPython.noop),
+    ]
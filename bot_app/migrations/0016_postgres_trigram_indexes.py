@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Поиск в админке (search_fields) превращается в
+# UPPER(col::text) LIKE UPPER('%...%') — в PostgreSQL его ускоряет
+# GIN-индекс pg_trgm по тому же выражению. В SQLite миграция ничего не делает.
+TRIGRAM_INDEXES = (
+    ("place_name_trgm_idx", "Place", "name"),
+    ("guide_topic_trgm_idx", "Guide", "topic"),
+    ("user_username_trgm_idx", "User", "username"),
+    ("user_full_name_trgm_idx", "User", "full_name"),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index_name, model_name, column in TRIGRAM_INDEXES:
+        table = apps.get_model("bot_app", model_name)._meta.db_table
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(index_name)} ON {quote(table)} "
+            f"USING gin ((UPPER({quote(column)}::text)) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for index_name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS {schema_editor.quote_name(index_name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0015_reviewphoto'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
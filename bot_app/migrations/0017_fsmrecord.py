@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0016_postgres_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FSMRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('state', models.CharField(blank=True, max_length=255, null=True)),
+                ('data', models.BinaryField(default=b'')),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'FSM record',
+                'verbose_name_plural': 'FSM records',
+            },
+        ),
+    ]
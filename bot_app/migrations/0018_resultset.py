@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0017_fsmrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=32)),
+                ('items', models.JSONField(default=list)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Result set',
+                'verbose_name_plural': 'Result sets',
+            },
+        ),
+    ]
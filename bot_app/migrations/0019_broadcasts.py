@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_app', '0018_resultset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(help_text='HTML, как в сообщениях бота')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('queued', 'Queued'), ('running', 'Running'), ('paused', 'Paused'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='draft', max_length=20)),
+                ('last_user_id', models.BigIntegerField(default=0, editable=False)),
+                ('lease_until', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('total_count', models.IntegerField(default=0, editable=False)),
+                ('sent_count', models.IntegerField(default=0, editable=False)),
+                ('failed_count', models.IntegerField(default=0, editable=False)),
+                ('blocked_count', models.IntegerField(default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, editable=False, null=True)),
+            ],
+            options={
+                'verbose_name': 'Broadcast',
+                'verbose_name_plural': 'Broadcasts',
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('sent', 'Sent'), ('failed', 'Failed'), ('blocked', 'Blocked the bot')], max_length=20)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Broadcast delivery',
+                'verbose_name_plural': 'Broadcast deliveries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['city', 'telegram_id'], name='user_city_telegram_idx'),
+        ),
+        migrations.AddField(
+            model_name='broadcast',
+            name='city',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcasts', to='bot_app.city'),
+        ),
+        migrations.AddField(
+            model_name='broadcastdelivery',
+            name='broadcast',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='bot_app.broadcast'),
+        ),
+        migrations.AddConstraint(
+            model_name='broadcastdelivery',
+            constraint=models.UniqueConstraint(fields=('broadcast', 'user_id'), name='broadcast_delivery_unique'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 
 class City(models.Model):
@@ -46,6 +47,10 @@ class User(models.Model):
     class Meta:
         verbose_name = "Bot user"
         verbose_name_plural = "Bot users"
+        indexes = [
+            # Получатели рассылки города: keyset-пагинация по telegram_id
+            models.Index(fields=["city", "telegram_id"], name="user_city_telegram_idx"),
+        ]
 
 
 class Category(models.Model):
@@ -75,7 +80,15 @@ class Place(models.Model):
     review_count = models.IntegerField(default=0)
     average_price = models.IntegerField(
         default=0, null=True, blank=True, help_text="Средний чек в тенге (KZT)")
+    # Накопленные суммы по опубликованным отзывам (см. services.aggregates);
+    # число оценок — review_count
+    rating_sum = models.IntegerField(default=0, editable=False)
+    price_sum = models.BigIntegerField(default=0, editable=False)
+    price_count = models.IntegerField(default=0, editable=False)
     ai_summary = models.TextField(blank=True)
+    # Хэш id отзывов, по которым построен ai_summary
+    summary_fingerprint = models.CharField(
+        max_length=64, blank=True, default="", editable=False)
     is_pinned = models.BooleanField(default=False)
 
     def __str__(self) -> str:
@@ -84,6 +97,14 @@ class Place(models.Model):
     class Meta:
         verbose_name = "Place"
         verbose_name_plural = "Places"
+        indexes = [
+            # Выдача по категории: services.ranking.rank_places
+            models.Index(
+                fields=["city", "category", "is_pinned",
+                        "-avg_rating", "-review_count"],
+                name="place_city_cat_rank_idx",
+            ),
+        ]
 
 
 class Review(models.Model):
@@ -105,6 +126,8 @@ class Review(models.Model):
         max_length=20, choices=Status.choices, default=Status.PENDING)
     is_verified_by_ai = models.BooleanField(default=False)
     photo_ids = models.JSONField(default=list)
+    # Награда за отзыв начисляется один раз, даже если статус менялся
+    is_rewarded = models.BooleanField(default=False, editable=False)
 
     def __str__(self) -> str:
         return f"Review {self.pk} for {self.place}"
@@ -112,6 +135,36 @@ class Review(models.Model):
     class Meta:
         verbose_name = "Review"
         verbose_name_plural = "Reviews"
+        indexes = [
+            # Последние опубликованные отзывы места: фото и AI-саммари
+            models.Index(fields=["place", "status", "-id"],
+                         name="review_place_status_idx"),
+            # Проверка «уже оставлял отзыв»
+            models.Index(fields=["user", "place"],
+                         name="review_user_place_idx"),
+        ]
+
+
+class ReviewPhoto(models.Model):
+    """Фото опубликованных отзывов, денормализованные для карточки места."""
+
+    review = models.ForeignKey(
+        Review, on_delete=models.CASCADE, related_name="photos")
+    place = models.ForeignKey(
+        Place, on_delete=models.CASCADE, related_name="photos")
+    file_id = models.CharField(max_length=255)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        return f"Photo {self.pk} for {self.place_id}"
+
+    class Meta:
+        verbose_name = "Review photo"
+        verbose_name_plural = "Review photos"
+        indexes = [
+            models.Index(fields=["place", "-created_at", "-id"],
+                         name="reviewphoto_place_recent_idx"),
+        ]
 
 
 class GuideCategory(models.Model):
@@ -140,3 +193,149 @@ class Guide(models.Model):
     class Meta:
         verbose_name = "Guide"
         verbose_name_plural = "Guides"
+        indexes = [
+            # Список тем гайдов города по категории
+            models.Index(fields=["city", "category", "topic"],
+                         name="guide_city_cat_topic_idx"),
+        ]
+
+
+class Job(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(
+        max_length=255, unique=True, blank=True, null=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    class Meta:
+        verbose_name = "Background job"
+        verbose_name_plural = "Background jobs"
+        indexes = [
+            models.Index(fields=["status", "run_after"],
+                         name="job_status_run_after_idx"),
+        ]
+
+
+class DataVersion(models.Model):
+    """Счётчик версии данных для инвалидации кэшей в процессах бота."""
+
+    key = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.key}@{self.version}"
+
+    class Meta:
+        verbose_name = "Data version"
+        verbose_name_plural = "Data versions"
+
+
+class FSMRecord(models.Model):
+    """Состояние FSM aiogram одного пользователя в чате (services.fsm_storage)."""
+
+    key = models.CharField(max_length=255, unique=True)
+    state = models.CharField(max_length=255, blank=True, null=True)
+    # JSON, сжатый zlib для больших значений
+    data = models.BinaryField(default=b"")
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.state}"
+
+    class Meta:
+        verbose_name = "FSM record"
+        verbose_name_plural = "FSM records"
+
+
+class ResultSet(models.Model):
+    """Список результатов (места, гайды); в FSM хранится только его id и позиция."""
+
+    kind = models.CharField(max_length=32)
+    items = models.JSONField(default=list)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.pk}"
+
+    class Meta:
+        verbose_name = "Result set"
+        verbose_name_plural = "Result sets"
+
+
+class Broadcast(models.Model):
+    """Рассылка пользователям города (services.broadcasts)."""
+
+    class Status(models.TextChoices):
+        DRAFT = "draft", "Draft"
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        PAUSED = "paused", "Paused"
+        COMPLETED = "completed", "Completed"
+        CANCELLED = "cancelled", "Cancelled"
+
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name="broadcasts")
+    text = models.TextField(help_text="HTML, как в сообщениях бота")
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.DRAFT)
+    # Контрольная точка: telegram_id последнего обработанного получателя
+    last_user_id = models.BigIntegerField(default=0, editable=False)
+    # Аренда выполнения: пока она не истекла, второй исполнитель не стартует
+    lease_until = models.DateTimeField(blank=True, null=True, editable=False)
+    total_count = models.IntegerField(default=0, editable=False)
+    sent_count = models.IntegerField(default=0, editable=False)
+    failed_count = models.IntegerField(default=0, editable=False)
+    blocked_count = models.IntegerField(default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True, editable=False)
+    finished_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    def __str__(self) -> str:
+        return f"Broadcast #{self.pk} to {self.city} ({self.status})"
+
+    class Meta:
+        verbose_name = "Broadcast"
+        verbose_name_plural = "Broadcasts"
+
+
+class BroadcastDelivery(models.Model):
+    """Результат рассылки для одного получателя."""
+
+    class Status(models.TextChoices):
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+        BLOCKED = "blocked", "Blocked the bot"
+
+    broadcast = models.ForeignKey(
+        Broadcast, on_delete=models.CASCADE, related_name="deliveries")
+    user_id = models.BigIntegerField()
+    status = models.CharField(max_length=20, choices=Status.choices)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self) -> str:
+        return f"{self.broadcast_id} -> {self.user_id}: {self.status}"
+
+    class Meta:
+        verbose_name = "Broadcast delivery"
+        verbose_name_plural = "Broadcast deliveries"
+        constraints = [
+            models.UniqueConstraint(fields=["broadcast", "user_id"],
+                                    name="broadcast_delivery_unique"),
+        ]
@@ -0,0 +1,150 @@
+"""
+Накопленные агрегаты мест: сумма и число оценок, сумма и число цен.
+
+Публикация отзыва и снятие его с публикации меняют агрегаты одним
+UPDATE с F-выражениями — без чтения остальных отзывов места, поэтому
+стоимость не растёт с популярностью места. ``avg_rating`` и
+``average_price`` пересчитываются в том же UPDATE из новых сумм.
+
+``rebuild_place_aggregates`` сверяет агрегаты с отзывами одним проходом
+GROUP BY (см. команду ``check_place_aggregates``).
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+from bot_app.models import Place, Review
+from bot_app.services.versions import bump_version, city_key
+from bot_app.signals import place_updated
+
+Aggregates = Tuple[int, int, int, int]  # rating_sum, review_count, price_sum, price_count
+
+
+def _has_price(price: Optional[int]) -> bool:
+    return price is not None and price > 0
+
+
+def apply_delta(place_id: int, delta: Aggregates) -> None:
+    """
+    Прибавить к агрегатам места ``delta`` (может быть отрицательной)
+    одним UPDATE. Вызывается внутри транзакции смены статуса отзывов.
+    """
+    d_rating_sum, d_review_count, d_price_sum, d_price_count = delta
+    rating_sum = F("rating_sum") + d_rating_sum
+    review_count = F("review_count") + d_review_count
+    updates = {
+        "rating_sum": rating_sum,
+        "review_count": review_count,
+        "avg_rating": Case(
+            When(Q(review_count__lte=-d_review_count), then=Value(0.0)),
+            default=Cast(rating_sum, FloatField()) / review_count,
+            output_field=FloatField(),
+        ),
+    }
+    if d_price_count:
+        price_sum = F("price_sum") + d_price_sum
+        price_count = F("price_count") + d_price_count
+        updates.update(
+            price_sum=price_sum,
+            price_count=price_count,
+            average_price=Case(
+                When(Q(price_count__lte=-d_price_count), then=Value(0)),
+                default=price_sum / price_count,
+                output_field=IntegerField(),
+            ),
+        )
+    Place.objects.filter(id=place_id).update(**updates)
+    # update() не вызывает сигналы — индексы города обновляем явно
+    place = Place.objects.select_related("category").get(id=place_id)
+    place_updated(place)
+
+
+def apply_reviews(reviews: Iterable[Review], *, sign: int) -> None:
+    """
+    Добавить (``sign=1``) или убрать (``sign=-1``) опубликованные отзывы:
+    по одному UPDATE на место, сколько бы отзывов у него ни было.
+    """
+    deltas: Dict[int, List[int]] = defaultdict(lambda: [0, 0, 0, 0])
+    for review in reviews:
+        delta = deltas[review.place_id]
+        delta[0] += sign * review.rating
+        delta[1] += sign
+        if _has_price(review.price):
+            delta[2] += sign * review.price
+            delta[3] += sign
+    for place_id, delta in deltas.items():
+        apply_delta(place_id, tuple(delta))
+
+
+def _expected_aggregates() -> Dict[int, Aggregates]:
+    """Агрегаты по опубликованным отзывам одним запросом с GROUP BY."""
+    priced = Q(price__gt=0)
+    rows = (
+        Review.objects.filter(status=Review.Status.PUBLISHED)
+        .values("place_id")
+        .annotate(
+            rating_sum=Sum("rating"),
+            review_count=Count("id"),
+            price_sum=Sum("price", filter=priced),
+            price_count=Count("id", filter=priced),
+        )
+        .order_by()
+    )
+    return {
+        row["place_id"]: (
+            row["rating_sum"] or 0,
+            row["review_count"],
+            row["price_sum"] or 0,
+            row["price_count"],
+        )
+        for row in rows.iterator()
+    }
+
+
+def rebuild_place_aggregates(
+    *, fix: bool = False, batch_size: int = 500
+) -> List[Tuple[int, Aggregates, Aggregates]]:
+    """
+    Сверить агрегаты всех мест с отзывами. Возвращает расхождения
+    ``(place_id, сохранённые, ожидаемые)``; с ``fix=True`` исправляет их.
+    """
+    expected = _expected_aggregates()
+    drift: List[Tuple[int, Aggregates, Aggregates]] = []
+    cities = set()
+    stored_rows = Place.objects.values_list(
+        "id", "city_id", "rating_sum", "review_count", "price_sum", "price_count")
+    for place_id, city_id, *stored in stored_rows.iterator():
+        actual = expected.get(place_id, (0, 0, 0, 0))
+        if tuple(stored) != actual:
+            drift.append((place_id, tuple(stored), actual))
+            cities.add(city_id)
+
+    if fix and drift:
+        for start in range(0, len(drift), batch_size):
+            _fix_batch(drift[start: start + batch_size])
+        with transaction.atomic():
+            for city_id in cities:
+                bump_version(city_key(city_id))
+    return drift
+
+
+def _fix_batch(batch: Iterable[Tuple[int, Aggregates, Aggregates]]) -> None:
+    places = []
+    for place_id, _, (rating_sum, review_count, price_sum, price_count) in batch:
+        places.append(Place(
+            id=place_id,
+            rating_sum=rating_sum,
+            review_count=review_count,
+            avg_rating=rating_sum / review_count if review_count else 0.0,
+            price_sum=price_sum,
+            price_count=price_count,
+            average_price=price_sum // price_count if price_count else 0,
+        ))
+    Place.objects.bulk_update(places, [
+        "rating_sum", "review_count", "avg_rating",
+        "price_sum", "price_count", "average_price",
+    ])
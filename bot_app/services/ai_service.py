@@ -1,14 +1,22 @@
+import asyncio
+import hashlib
 import json
+import logging
 from typing import Any, Dict, List, Optional
 
-from asgiref.sync import sync_to_async
 from django.conf import settings
 
-from bot_app.models import Guide, Place, Review
+from bot_app.models import Place, Review
+from bot_app.services.db import run_db
+
+logger = logging.getLogger(__name__)
 
 try:
-    from openai import OpenAI
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
 except ImportError:  # pragma: no cover
+    httpx = None  # type: ignore
+    AsyncOpenAI = None  # type: ignore
     OpenAI = None  # type: ignore
 
 SYSTEM_PROMPT = (
@@ -38,7 +46,20 @@ SUMMARY_USER_TEMPLATE = (
 
 SUMMARY_PLACEHOLDER = "Пока недостаточно отзывов для анализа"
 
+
+class SummaryUnavailable(Exception):
+    """LLM не вернул саммари (ошибка запроса или клиент недоступен)."""
+
+
+ASSISTANT_UNAVAILABLE_MESSAGE = "Извините, AI-помощник временно недоступен. Попробуйте позже."
+ASSISTANT_ERROR_MESSAGE = (
+    "Извините, произошла ошибка при генерации рекомендации. "
+    "Попробуйте переформулировать вопрос."
+)
+
 _client = None
+_async_client = None
+_llm_semaphore: Optional[asyncio.Semaphore] = None
 
 
 def _get_client() -> Optional["OpenAI"]:
@@ -52,6 +73,60 @@ def _get_client() -> Optional["OpenAI"]:
     return _client
 
 
+def _get_async_client() -> Optional["AsyncOpenAI"]:
+    """Общий AsyncOpenAI-клиент с пулом HTTP-соединений."""
+    global _async_client
+    if not settings.OPENAI_API_KEY or AsyncOpenAI is None:
+        logger.warning("AsyncOpenAI client unavailable (missing key or package)")
+        return None
+    if _async_client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=10.0),
+        )
+        _async_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=http_client,
+            timeout=settings.OPENAI_TIMEOUT,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+        )
+    return _async_client
+
+
+def _get_llm_semaphore() -> asyncio.Semaphore:
+    """Ограничивает число одновременных запросов к OpenAI."""
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+
+async def close_async_client() -> None:
+    global _async_client, _llm_semaphore
+    client, _async_client = _async_client, None
+    _llm_semaphore = None
+    if client is not None:
+        await client.close()
+
+
+def _analysis_messages(text: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_TEMPLATE.format(review=text)},
+    ]
+
+
+def _parse_analysis(content: str) -> Dict[str, Any]:
+    parsed = json.loads(content)
+    return {
+        "is_spam": bool(parsed.get("is_spam")),
+        "summary": str(parsed.get("summary", "")).strip(),
+    }
+
+
 def analyze_review(text: str) -> Dict[str, Any]:
     client = _get_client()
     if client is None:
@@ -67,10 +142,7 @@ def analyze_review(text: str) -> Dict[str, Any]:
             model="gpt-4o-mini",
             temperature=0,
             response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": USER_TEMPLATE.format(review=text)},
-            ],
+            messages=_analysis_messages(text),
         )
 
         content = completion.choices[0].message.content or "{}"
@@ -78,13 +150,7 @@ def analyze_review(text: str) -> Dict[str, Any]:
             f"analyze_review: RAW LLM RESPONSE TYPE={type(content)}, LEN={len(content)}")
         print(f"analyze_review: RAW LLM RESPONSE CONTENT={content!r}")
 
-        parsed = json.loads(content)
-        print(f"analyze_review: parsed JSON={parsed}")
-
-        result = {
-            "is_spam": bool(parsed.get("is_spam")),
-            "summary": str(parsed.get("summary", "")).strip(),
-        }
+        result = _parse_analysis(content)
         print(f"analyze_review result: {result}")
         return result
 
@@ -100,6 +166,34 @@ def analyze_review(text: str) -> Dict[str, Any]:
         return {"is_spam": False, "summary": ""}
 
 
+async def analyze_review_async(text: str) -> Dict[str, Any]:
+    """Асинхронная версия ``analyze_review`` — не занимает поток на время запроса."""
+    client = _get_async_client()
+    if client is None:
+        return {"is_spam": False, "summary": ""}
+
+    content = None
+    try:
+        async with _get_llm_semaphore():
+            completion = await client.chat.completions.create(
+                model="gpt-4o-mini",
+                temperature=0,
+                response_format={"type": "json_object"},
+                messages=_analysis_messages(text),
+                timeout=settings.OPENAI_TIMEOUT,
+            )
+        content = completion.choices[0].message.content or "{}"
+        result = _parse_analysis(content)
+        logger.debug("analyze_review_async result: %s", result)
+        return result
+    except json.JSONDecodeError as exc:  # pragma: no cover
+        logger.warning("analyze_review_async: JSON decode error: %s, content=%r", exc, content)
+        return {"is_spam": False, "summary": ""}
+    except Exception:  # pragma: no cover
+        logger.exception("analyze_review_async: LLM request failed")
+        return {"is_spam": False, "summary": ""}
+
+
 def _build_reviews_block(reviews: List[str]) -> str:
     return "\n".join(f"{idx}. {text}" for idx, text in enumerate(reviews, start=1))
 
@@ -109,24 +203,56 @@ def summarize_reviews(reviews: List[str]) -> str:
     if client is None:
         return ""
 
-    reviews_block = _build_reviews_block(reviews)
     try:
         completion = client.chat.completions.create(
             model="gpt-4o-mini",
             temperature=0.3,
-            messages=[
-                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
-                {
-                    "role": "user",
-                    "content": SUMMARY_USER_TEMPLATE.format(reviews=reviews_block),
-                },
-            ],
+            messages=_summary_messages(reviews),
         )
         return (completion.choices[0].message.content or "").strip()
     except Exception:  # pragma: no cover
         return ""
 
 
+def _summary_messages(reviews: List[str]) -> List[Dict[str, str]]:
+    reviews_block = _build_reviews_block(reviews)
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": SUMMARY_USER_TEMPLATE.format(reviews=reviews_block),
+        },
+    ]
+
+
+async def summarize_reviews_async(reviews: List[str]) -> str:
+    client = _get_async_client()
+    if client is None:
+        return ""
+
+    try:
+        async with _get_llm_semaphore():
+            completion = await client.chat.completions.create(
+                model="gpt-4o-mini",
+                temperature=0.3,
+                messages=_summary_messages(reviews),
+                timeout=settings.OPENAI_TIMEOUT,
+            )
+        return (completion.choices[0].message.content or "").strip()
+    except Exception:  # pragma: no cover
+        logger.exception("summarize_reviews_async: LLM request failed")
+        return ""
+
+
+SUMMARY_REVIEWS_LIMIT = 10
+
+
+def reviews_fingerprint(review_ids: List[int]) -> str:
+    """Отпечаток набора отзывов, по которым строится ai_summary"""
+    joined = ",".join(str(review_id) for review_id in sorted(review_ids))
+    return hashlib.sha1(joined.encode()).hexdigest()
+
+
 def _fetch_place_and_reviews(place_id: int):
     try:
         place = Place.objects.get(id=place_id)
@@ -135,81 +261,64 @@ def _fetch_place_and_reviews(place_id: int):
     reviews = list(
         Review.objects.filter(place=place, status=Review.Status.PUBLISHED)
         .order_by("-id")
-        .values_list("text", flat=True)[:10]
+        .values_list("id", "text")[:SUMMARY_REVIEWS_LIMIT]
     )
     return place, reviews
 
 
-def _save_place_summary(place: Place, summary: str) -> None:
-    place.ai_summary = summary
-    place.save(update_fields=["ai_summary"])
+def place_summary_is_stale(place_id: int) -> bool:
+    """Изменился ли набор отзывов места с момента генерации ai_summary"""
+    stored = (
+        Place.objects.filter(id=place_id)
+        .values_list("summary_fingerprint", flat=True)
+        .first()
+    )
+    if stored is None:
+        return False
+    review_ids = list(
+        Review.objects.filter(place_id=place_id, status=Review.Status.PUBLISHED)
+        .order_by("-id")
+        .values_list("id", flat=True)[:SUMMARY_REVIEWS_LIMIT]
+    )
+    return stored != reviews_fingerprint(review_ids)
 
 
-async def update_place_summary(place_id: int) -> None:
-    place, reviews = await sync_to_async(_fetch_place_and_reviews)(place_id)
+def _save_place_summary(place: Place, summary: str, fingerprint: Optional[str] = None) -> None:
+    place.ai_summary = summary
+    update_fields = ["ai_summary"]
+    if fingerprint is not None:
+        place.summary_fingerprint = fingerprint
+        update_fields.append("summary_fingerprint")
+    place.save(update_fields=update_fields)
+
+
+async def update_place_summary(place_id: int, *, force: bool = False) -> bool:
+    """
+    Перегенерировать ai_summary места.
+
+    Если набор отзывов не изменился с прошлой генерации, LLM не вызывается
+    (кроме ``force=True``). Возвращает True, если саммари было обновлено;
+    если LLM не ответил — ``SummaryUnavailable``.
+    """
+    place, reviews = await run_db(_fetch_place_and_reviews, place_id)
     if not place:
-        return
+        return False
+
+    fingerprint = reviews_fingerprint([review_id for review_id, _ in reviews])
+    if not force and place.summary_fingerprint == fingerprint:
+        return False
 
     if not reviews:
-        await sync_to_async(_save_place_summary)(place, SUMMARY_PLACEHOLDER)
-        return
-
-    summary = await sync_to_async(summarize_reviews)(list(reviews))
-    summary = summary or SUMMARY_PLACEHOLDER
-    await sync_to_async(_save_place_summary)(place, summary)
-
-
-def _build_city_context(city_id: int) -> str:
-    """Собрать контекст о городе из базы данных"""
-    # Получаем все места с отзывами, отсортированные по рейтингу
-    places = Place.objects.filter(
-        city_id=city_id, review_count__gt=0
-    ).select_related("category").order_by("-avg_rating", "-review_count")[:100]
-
-    guides = Guide.objects.filter(city_id=city_id)[:20]
-
-    context_parts = []
-
-    # Места с отзывами - группируем по категориям для удобства
-    if places:
-        context_parts.append(
-            "=== МЕСТА В ГОРОДЕ (ИСПОЛЬЗУЙ ТОЛЬКО ЭТИ РЕАЛЬНЫЕ МЕСТА) ===\n")
-        context_parts.append(
-            "ВАЖНО: Используй ТОЧНЫЕ названия и адреса из этого списка. Не выдумывай места!\n\n")
-
-        # Группируем по категориям
-        places_by_category = {}
-        for place in places:
-            category_name = place.category.name if place.category else "Без категории"
-            if category_name not in places_by_category:
-                places_by_category[category_name] = []
-            places_by_category[category_name].append(place)
-
-        for category_name, category_places in places_by_category.items():
-            context_parts.append(f"\n--- {category_name} ---\n")
-            for place in category_places:
-                place_info = f"• {place.name}"
-                place_info += f"\n  Адрес: {place.address}"
-                if place.avg_rating:
-                    place_info += f"\n  Рейтинг: {place.avg_rating:.1f}/5 ({place.review_count} отзывов)"
-                if place.average_price and place.average_price > 0:
-                    place_info += f"\n  Средний чек: ~{place.average_price} ₸"
-                if place.ai_summary:
-                    place_info += f"\n  Отзывы: {place.ai_summary}"
-                context_parts.append(place_info + "\n")
-
-    # Гайды
-    if guides:
-        context_parts.append("\n=== ГАЙДЫ ===\n")
-        for guide in guides:
-            guide_info = f"- {guide.topic}"
-            if guide.category:
-                guide_info += f" ({guide.category.name})"
-            guide_info += f"\n  {guide.content[:300]}..." if len(
-                guide.content) > 300 else f"\n  {guide.content}"
-            context_parts.append(guide_info + "\n")
-
-    return "\n".join(context_parts)
+        await run_db(_save_place_summary, place, SUMMARY_PLACEHOLDER, fingerprint)
+        return True
+
+    summary = await summarize_reviews_async([text for _, text in reviews])
+    if not summary:
+        # Не запоминаем отпечаток, чтобы следующая попытка повторила запрос
+        await run_db(_save_place_summary, place, place.ai_summary or SUMMARY_PLACEHOLDER)
+        raise SummaryUnavailable(f"no summary for place #{place_id}")
+    await run_db(_save_place_summary, place, summary, fingerprint)
+    return True
 
 
 ASSISTANT_SYSTEM_PROMPT = (
@@ -240,13 +349,8 @@ ASSISTANT_SYSTEM_PROMPT = (
 )
 
 
-def generate_recommendation(user_query: str, city_context: str, city_name: str) -> str:
-    """Генерировать рекомендацию на основе запроса пользователя и контекста города"""
-    client = _get_client()
-    if client is None:
-        return "Извините, AI-помощник временно недоступен. Попробуйте позже."
-
-    user_message = (
+def _build_recommendation_message(user_query: str, city_context: str, city_name: str) -> str:
+    return (
         f"Пользователь спрашивает: {user_query}\n\n"
         f"Город: {city_name}\n\n"
         f"=== ИНФОРМАЦИЯ ИЗ БАЗЫ ДАННЫХ ===\n{city_context}\n\n"
@@ -272,6 +376,90 @@ def generate_recommendation(user_query: str, city_context: str, city_name: str)
         "- НЕ используй markdown (**, __, # и т.д.), только HTML теги <b> и <i>"
     )
 
+
+def _format_telegram_html(response: str) -> str:
+    """Привести ответ модели к HTML, который понимает Telegram"""
+    # Убираем markdown форматирование, если оно есть
+    import re
+    import html
+
+    # Заменяем markdown на HTML
+    response = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', response)
+    response = re.sub(r'__(.+?)__', r'<b>\1</b>', response)
+    response = re.sub(r'\*(.+?)\*', r'<i>\1</i>', response)
+    response = re.sub(r'_(.+?)_', r'<i>\1</i>', response)
+    response = re.sub(r'### (.+?)\n', r'<b>\1</b>\n', response)
+    response = re.sub(r'## (.+?)\n', r'<b>\1</b>\n', response)
+    response = re.sub(r'# (.+?)\n', r'<b>\1</b>\n', response)
+
+    # Удаляем HTML теги, которые Telegram не поддерживает
+    # Заменяем <br>, <br/>, <br /> на обычные переносы строк
+    response = re.sub(r'<br\s*/?>', '\n', response, flags=re.IGNORECASE)
+    # Удаляем другие неподдерживаемые теги, если они есть
+    response = re.sub(r'</?p>', '\n', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?div>', '\n', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?span>', '', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?strong>', '', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?em>', '', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?code>', '', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?pre>', '', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?ul>', '\n', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?ol>', '\n', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?li>', '\n• ', response, flags=re.IGNORECASE)
+    response = re.sub(r'</?h[1-6]>', '\n', response, flags=re.IGNORECASE)
+
+    # Исправляем незакрытые теги <b> и <i>
+    # Считаем количество открывающих и закрывающих тегов
+    open_b = len(re.findall(r'<b>', response, re.IGNORECASE))
+    close_b = len(re.findall(r'</b>', response, re.IGNORECASE))
+    open_i = len(re.findall(r'<i>', response, re.IGNORECASE))
+    close_i = len(re.findall(r'</i>', response, re.IGNORECASE))
+
+    # Закрываем незакрытые теги в конце
+    if open_b > close_b:
+        response += '</b>' * (open_b - close_b)
+    if open_i > close_i:
+        response += '</i>' * (open_i - close_i)
+
+    # Удаляем лишние закрывающие теги (если их больше, чем открывающих)
+    if close_b > open_b:
+        # Удаляем лишние закрывающие теги с конца
+        response = re.sub(r'</b>', '', response,
+                          count=close_b - open_b, flags=re.IGNORECASE)
+    if close_i > open_i:
+        response = re.sub(r'</i>', '', response,
+                          count=close_i - open_i, flags=re.IGNORECASE)
+
+    # Экранируем символы < и >, которые не являются частью разрешенных тегов
+    # Сначала временно заменяем разрешенные теги
+    response = response.replace('<b>', '___TAG_B_OPEN___')
+    response = response.replace('</b>', '___TAG_B_CLOSE___')
+    response = response.replace('<i>', '___TAG_I_OPEN___')
+    response = response.replace('</i>', '___TAG_I_CLOSE___')
+
+    # Экранируем все оставшиеся < и >
+    response = html.escape(response)
+
+    # Возвращаем разрешенные теги обратно
+    response = response.replace('___TAG_B_OPEN___', '<b>')
+    response = response.replace('___TAG_B_CLOSE___', '</b>')
+    response = response.replace('___TAG_I_OPEN___', '<i>')
+    response = response.replace('___TAG_I_CLOSE___', '</i>')
+
+    # Убираем множественные переносы строк (больше 2 подряд)
+    response = re.sub(r'\n{3,}', '\n\n', response)
+
+    return response
+
+
+def generate_recommendation(user_query: str, city_context: str, city_name: str) -> str:
+    """Генерировать рекомендацию на основе запроса пользователя и контекста города"""
+    client = _get_client()
+    if client is None:
+        return ASSISTANT_UNAVAILABLE_MESSAGE
+
+    user_message = _build_recommendation_message(user_query, city_context, city_name)
+
     try:
         # Используем модель с встроенным веб-поиском OpenAI
         # Пробуем использовать Responses API с web_search tool
@@ -315,80 +503,60 @@ def generate_recommendation(user_query: str, city_context: str, city_name: str)
                 response = (
                     completion.choices[0].message.content or "").strip()
 
-        # Убираем markdown форматирование, если оно есть
-        import re
-        import html
-
-        # Заменяем markdown на HTML
-        response = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', response)
-        response = re.sub(r'__(.+?)__', r'<b>\1</b>', response)
-        response = re.sub(r'\*(.+?)\*', r'<i>\1</i>', response)
-        response = re.sub(r'_(.+?)_', r'<i>\1</i>', response)
-        response = re.sub(r'### (.+?)\n', r'<b>\1</b>\n', response)
-        response = re.sub(r'## (.+?)\n', r'<b>\1</b>\n', response)
-        response = re.sub(r'# (.+?)\n', r'<b>\1</b>\n', response)
-
-        # Удаляем HTML теги, которые Telegram не поддерживает
-        # Заменяем <br>, <br/>, <br /> на обычные переносы строк
-        response = re.sub(r'<br\s*/?>', '\n', response, flags=re.IGNORECASE)
-        # Удаляем другие неподдерживаемые теги, если они есть
-        response = re.sub(r'</?p>', '\n', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?div>', '\n', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?span>', '', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?strong>', '', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?em>', '', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?code>', '', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?pre>', '', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?ul>', '\n', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?ol>', '\n', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?li>', '\n• ', response, flags=re.IGNORECASE)
-        response = re.sub(r'</?h[1-6]>', '\n', response, flags=re.IGNORECASE)
-
-        # Исправляем незакрытые теги <b> и <i>
-        # Считаем количество открывающих и закрывающих тегов
-        open_b = len(re.findall(r'<b>', response, re.IGNORECASE))
-        close_b = len(re.findall(r'</b>', response, re.IGNORECASE))
-        open_i = len(re.findall(r'<i>', response, re.IGNORECASE))
-        close_i = len(re.findall(r'</i>', response, re.IGNORECASE))
-
-        # Закрываем незакрытые теги в конце
-        if open_b > close_b:
-            response += '</b>' * (open_b - close_b)
-        if open_i > close_i:
-            response += '</i>' * (open_i - close_i)
-
-        # Удаляем лишние закрывающие теги (если их больше, чем открывающих)
-        if close_b > open_b:
-            # Удаляем лишние закрывающие теги с конца
-            response = re.sub(r'</b>', '', response,
-                              count=close_b - open_b, flags=re.IGNORECASE)
-        if close_i > open_i:
-            response = re.sub(r'</i>', '', response,
-                              count=close_i - open_i, flags=re.IGNORECASE)
-
-        # Экранируем символы < и >, которые не являются частью разрешенных тегов
-        # Сначала временно заменяем разрешенные теги
-        response = response.replace('<b>', '___TAG_B_OPEN___')
-        response = response.replace('</b>', '___TAG_B_CLOSE___')
-        response = response.replace('<i>', '___TAG_I_OPEN___')
-        response = response.replace('</i>', '___TAG_I_CLOSE___')
-
-        # Экранируем все оставшиеся < и >
-        response = html.escape(response)
-
-        # Возвращаем разрешенные теги обратно
-        response = response.replace('___TAG_B_OPEN___', '<b>')
-        response = response.replace('___TAG_B_CLOSE___', '</b>')
-        response = response.replace('___TAG_I_OPEN___', '<i>')
-        response = response.replace('___TAG_I_CLOSE___', '</i>')
-
-        # Убираем множественные переносы строк (больше 2 подряд)
-        response = re.sub(r'\n{3,}', '\n\n', response)
-
-        return response
+        return _format_telegram_html(response)
     except Exception as exc:
         print(
             f"generate_recommendation: exception {type(exc).__name__}: {exc}")
         import traceback
         traceback.print_exc()
-        return "Извините, произошла ошибка при генерации рекомендации. Попробуйте переформулировать вопрос."
+        return ASSISTANT_ERROR_MESSAGE
+
+
+async def generate_recommendation_async(user_query: str, city_context: str, city_name: str) -> str:
+    """Асинхронная версия ``generate_recommendation`` с тем же порядком фолбэков"""
+    client = _get_async_client()
+    if client is None:
+        return ASSISTANT_UNAVAILABLE_MESSAGE
+
+    user_message = _build_recommendation_message(user_query, city_context, city_name)
+    messages = [
+        {"role": "system", "content": ASSISTANT_SYSTEM_PROMPT},
+        {"role": "user", "content": user_message},
+    ]
+    timeout = settings.OPENAI_ASSISTANT_TIMEOUT
+
+    try:
+        async with _get_llm_semaphore():
+            try:
+                response_obj = await client.responses.create(
+                    model="gpt-4o",
+                    tools=[{"type": "web_search"}],
+                    input=user_message,
+                    instructions=ASSISTANT_SYSTEM_PROMPT,
+                    timeout=timeout,
+                )
+                response = response_obj.output_text or ""
+            except Exception as e:
+                print(f"Responses API not available, trying search models: {e}")
+                try:
+                    completion = await client.chat.completions.create(
+                        model="gpt-4o-search-preview",
+                        messages=messages,
+                        timeout=timeout,
+                    )
+                except Exception as search_error:
+                    print(
+                        f"Search model not available ({search_error}), using regular model with fallback")
+                    completion = await client.chat.completions.create(
+                        model="gpt-4o",
+                        temperature=0.7,
+                        messages=messages,
+                        timeout=timeout,
+                    )
+                response = (completion.choices[0].message.content or "").strip()
+
+        return _format_telegram_html(response)
+    except Exception as exc:
+        print(
+            f"generate_recommendation_async: exception {type(exc).__name__}: {exc}")
+        return ASSISTANT_ERROR_MESSAGE
@@ -0,0 +1,266 @@
+"""
+Списание балансов запросов (поиск, AI-помощник).
+
+По умолчанию (``BALANCE_MODE=ledger``) балансы списываются в памяти
+процесса: проверка и уменьшение атомарны в пределах event loop, а
+накопленные изменения раз в ``BALANCE_FLUSH_INTERVAL`` секунд (и при
+остановке) записываются в БД пачкой. Так частые мелкие UPDATE не
+конкурируют за блокировку SQLite с админкой.
+
+Перерасхода нет: доступный остаток = значение из БД + ещё не записанные
+списания, а перечитывание из БД и запись пачки не пересекаются. Начисления
+(награды за отзывы, правки в админке) учитываются перечитыванием: когда
+остаток кончился, запись устарела или помечена ``mark_stale``.
+
+Журнал — память одного процесса, поэтому гарантия действует только при
+одном процессе бота. ``BALANCE_MODE=strict`` — одно ``UPDATE ... RETURNING``
+на списание, для развёртываний, где важна немедленная запись. Он же
+используется, если журнал не запущен: вне ``runbot`` и в воркерах
+``runbot --workers N`` (апдейты пользователя из лички и групп попадают в
+разные воркеры).
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from bot_app.models import User
+from bot_app.services.db import run_db
+from bot_app.services.users import invalidate_user
+
+logger = logging.getLogger(__name__)
+
+SEARCH_BALANCE = "balance_requests"
+AI_BALANCE = "ai_requests_balance"
+BALANCE_FIELDS = (SEARCH_BALANCE, AI_BALANCE)
+
+Key = Tuple[int, str]
+
+
+def spend_strict(telegram_id: int, balance_field: str) -> Optional[int]:
+    """Списать 1 одним UPDATE ... RETURNING. Возвращает остаток или None."""
+    if balance_field not in BALANCE_FIELDS:
+        raise ValueError(f"Unknown balance field {balance_field!r}")
+    quote = connection.ops.quote_name
+    column = quote(balance_field)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {quote(User._meta.db_table)} SET {column} = {column} - 1 "
+            f"WHERE {quote('telegram_id')} = %s AND {column} > 0 "
+            f"RETURNING {column}",
+            [telegram_id],
+        )
+        row = cursor.fetchone()
+    return None if row is None else row[0]
+
+
+def _read_balance(telegram_id: int, balance_field: str) -> Optional[int]:
+    return (
+        User.objects.filter(telegram_id=telegram_id)
+        .values_list(balance_field, flat=True)
+        .first()
+    )
+
+
+@transaction.atomic
+def _write_deltas(deltas: Dict[Key, int]) -> None:
+    per_user: Dict[int, Dict[str, int]] = {}
+    for (telegram_id, balance_field), delta in deltas.items():
+        per_user.setdefault(telegram_id, {})[balance_field] = delta
+    for telegram_id, user_deltas in per_user.items():
+        User.objects.filter(telegram_id=telegram_id).update(**{
+            name: Greatest(F(name) + delta, Value(0))
+            for name, delta in user_deltas.items()
+        })
+
+
+@dataclass
+class _Entry:
+    # Значение в БД (с учётом уже записанных пачек)
+    base: int
+    # Списания, ещё не записанные в БД (≤ 0)
+    pending: int = 0
+    loaded_at: float = field(default_factory=time.monotonic)
+    stale: bool = False
+
+    @property
+    def available(self) -> int:
+        return self.base + self.pending
+
+
+class BalanceLedger:
+    def __init__(
+        self,
+        flush_interval: Optional[float] = None,
+        entry_ttl: Optional[float] = None,
+    ) -> None:
+        self.flush_interval = (
+            settings.BALANCE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        )
+        self.entry_ttl = settings.BALANCE_ENTRY_TTL if entry_ttl is None else entry_ttl
+        self._entries: Dict[Key, _Entry] = {}
+        # Перечитывание из БД и запись пачки не должны пересекаться
+        self._io_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_deltas = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Остановить фоновую запись и записать всё накопленное."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Balance flush failed, will retry")
+
+    async def _reload(self, key: Key) -> Optional[_Entry]:
+        async with self._io_lock:
+            value = await run_db(_read_balance, *key)
+            if value is None:
+                self._entries.pop(key, None)
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(base=value)
+            else:
+                entry.base = value
+                entry.loaded_at = time.monotonic()
+                entry.stale = False
+            return entry
+
+    def _needs_reload(self, entry: _Entry) -> bool:
+        return entry.stale or time.monotonic() - entry.loaded_at > self.entry_ttl
+
+    async def spend(self, telegram_id: int, balance_field: str) -> Optional[int]:
+        """Списать 1. Возвращает остаток или None, если баланса не хватает."""
+        key = (telegram_id, balance_field)
+        entry = self._entries.get(key)
+        if entry is None or self._needs_reload(entry) or entry.available <= 0:
+            # Остаток мог вырасти (награда, админка) — перечитываем из БД
+            entry = await self._reload(key)
+            if entry is None:
+                return None
+        # Между проверкой и списанием нет await — атомарно в пределах loop
+        if entry.available <= 0:
+            return None
+        entry.pending -= 1
+        return entry.available
+
+    def pending_delta(self, telegram_id: int, balance_field: str) -> int:
+        entry = self._entries.get((telegram_id, balance_field))
+        return entry.pending if entry is not None else 0
+
+    def mark_stale(self, telegram_id: int) -> None:
+        for balance_field in BALANCE_FIELDS:
+            entry = self._entries.get((telegram_id, balance_field))
+            if entry is not None:
+                entry.stale = True
+
+    async def flush(self) -> int:
+        """Записать накопленные списания одной транзакцией. Возвращает число записей."""
+        async with self._io_lock:
+            deltas = {
+                key: entry.pending
+                for key, entry in self._entries.items()
+                if entry.pending
+            }
+            if deltas:
+                for key, delta in deltas.items():
+                    entry = self._entries[key]
+                    entry.pending -= delta
+                    entry.base += delta
+                try:
+                    await run_db(_write_deltas, deltas)
+                except Exception:
+                    for key, delta in deltas.items():
+                        entry = self._entries[key]
+                        entry.pending += delta
+                        entry.base -= delta
+                    raise
+                self.flushes += 1
+                self.flushed_deltas += len(deltas)
+                for telegram_id in {key[0] for key in deltas}:
+                    invalidate_user(telegram_id)
+            self._evict_idle()
+        return len(deltas)
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        idle = [
+            key for key, entry in self._entries.items()
+            if not entry.pending and now - entry.loaded_at > self.entry_ttl
+        ]
+        for key in idle:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "pending": sum(1 for entry in self._entries.values() if entry.pending),
+            "flushes": self.flushes,
+            "flushed_deltas": self.flushed_deltas,
+        }
+
+
+_ledger: Optional[BalanceLedger] = None
+
+
+def get_ledger() -> BalanceLedger:
+    global _ledger
+    if _ledger is None:
+        _ledger = BalanceLedger()
+    return _ledger
+
+
+def _use_ledger() -> bool:
+    return settings.BALANCE_MODE == "ledger" and get_ledger().running
+
+
+async def spend(telegram_id: int, balance_field: str) -> Optional[int]:
+    """Списать один запрос. Возвращает остаток или None, если баланса нет."""
+    if _use_ledger():
+        return await get_ledger().spend(telegram_id, balance_field)
+    remaining = await run_db(spend_strict, telegram_id, balance_field)
+    invalidate_user(telegram_id)
+    return remaining
+
+
+def displayed_balance(user: User, balance_field: str) -> int:
+    """Баланс для показа: значение из БД с учётом ещё не записанных списаний."""
+    value = getattr(user, balance_field)
+    if _ledger is not None:
+        value += _ledger.pending_delta(user.telegram_id, balance_field)
+    return max(value, 0)
+
+
+def balances_changed(telegram_id: int) -> None:
+    """Баланс изменён в БД мимо журнала (начисление): перечитать при следующем списании."""
+    if _ledger is not None:
+        _ledger.mark_stale(telegram_id)
+    invalidate_user(telegram_id)
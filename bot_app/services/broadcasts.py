@@ -0,0 +1,277 @@
+"""
+Рассылки пользователям города (``User.city``).
+
+Рассылка создаётся командой ``broadcast`` или из админки и выполняется
+фоновой задачей ``run_broadcast`` в пуле ``runbot``. Исполнитель читает
+получателей пачками по ``BROADCAST_BATCH_SIZE`` (keyset по ``telegram_id``,
+весь список в память не загружается), отправляет пачку через
+``BROADCAST_CONCURRENCY`` корутин — темп задаёт планировщик отправок
+(``services.outbound``, массовый приоритет) — и одной транзакцией
+записывает результаты получателей и контрольную точку.
+
+Остановленная или прерванная рассылка продолжается с контрольной точки;
+получатели, у которых уже есть запись о доставке, пропускаются. Аренда
+(``lease_until``) не даёт двум исполнителям вести одну рассылку. Получатель
+с временной ошибкой повторяется до ``BROADCAST_MAX_RETRIES`` раз, затем
+записывается как failed.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from bot_app.models import Broadcast, BroadcastDelivery, User
+from bot_app.services.db import run_db
+from bot_app.services.jobs import (
+    current_job_id,
+    enqueue_job,
+    pool_stopping,
+    register_job,
+    touch_job,
+)
+from bot_app.services.outbound import bulk_sends
+
+logger = logging.getLogger(__name__)
+
+# Результат отправки одному получателю: (telegram_id, статус, ошибка);
+# статус None — временная ошибка, получатель остаётся в очереди
+Delivery = Tuple[int, Optional[str], str]
+
+ACTIVE_STATUSES = (Broadcast.Status.QUEUED, Broadcast.Status.RUNNING)
+
+
+def create_broadcast(city_id: int, text: str) -> Broadcast:
+    return Broadcast.objects.create(city_id=city_id, text=text)
+
+
+@transaction.atomic
+def start_broadcast(broadcast_id: int, *, enqueue: bool = True) -> bool:
+    """Поставить черновик или остановленную рассылку в очередь."""
+    updated = Broadcast.objects.filter(
+        pk=broadcast_id,
+        status__in=(Broadcast.Status.DRAFT, Broadcast.Status.PAUSED),
+    ).update(status=Broadcast.Status.QUEUED)
+    if updated and enqueue:
+        enqueue_job("run_broadcast", {"broadcast_id": broadcast_id})
+    return bool(updated)
+
+
+def pause_broadcast(broadcast_id: int) -> bool:
+    """Остановить после текущей пачки; продолжить можно ``start_broadcast``."""
+    return bool(Broadcast.objects.filter(pk=broadcast_id, status__in=ACTIVE_STATUSES)
+                .update(status=Broadcast.Status.PAUSED))
+
+
+def cancel_broadcast(broadcast_id: int) -> bool:
+    return bool(
+        Broadcast.objects.filter(pk=broadcast_id)
+        .exclude(status__in=(Broadcast.Status.COMPLETED, Broadcast.Status.CANCELLED))
+        .update(status=Broadcast.Status.CANCELLED, lease_until=None,
+                finished_at=timezone.now())
+    )
+
+
+def _lease_until():
+    return timezone.now() + timedelta(seconds=settings.BROADCAST_LEASE)
+
+
+def _claim(broadcast_id: int) -> Optional[Dict[str, Any]]:
+    """Взять рассылку в работу, если она в очереди и её никто не ведёт."""
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = (
+            Broadcast.objects.filter(pk=broadcast_id, status__in=ACTIVE_STATUSES)
+            .exclude(lease_until__gt=now)
+            .update(status=Broadcast.Status.RUNNING, lease_until=_lease_until(),
+                    started_at=Coalesce(F("started_at"), now))
+        )
+        if not claimed:
+            return None
+        broadcast = Broadcast.objects.values("city_id", "text", "last_user_id").get(
+            pk=broadcast_id)
+        Broadcast.objects.filter(pk=broadcast_id).update(
+            total_count=User.objects.filter(city_id=broadcast["city_id"]).count())
+    return broadcast
+
+
+def _next_batch(broadcast_id: int, city_id: int, after: int, limit: int) -> List[int]:
+    delivered = BroadcastDelivery.objects.filter(
+        broadcast_id=broadcast_id, user_id=OuterRef("pk"))
+    return list(
+        User.objects.filter(city_id=city_id, telegram_id__gt=after)
+        .exclude(Exists(delivered))
+        .order_by("telegram_id")
+        .values_list("telegram_id", flat=True)[:limit]
+    )
+
+
+def _record_batch(
+    broadcast_id: int, results: List[Delivery], cursor: int, job_id: Optional[int] = None
+) -> str:
+    """
+    Записать результаты и контрольную точку, продлить аренду (и блокировку
+    задачи ``job_id``); вернуть статус.
+    """
+    now = timezone.now()
+    done = [result for result in results if result[1] is not None]
+    counts = {status: 0 for status in BroadcastDelivery.Status.values}
+    for _, status, _ in done:
+        counts[status] += 1
+    with transaction.atomic():
+        BroadcastDelivery.objects.bulk_create(
+            [
+                BroadcastDelivery(broadcast_id=broadcast_id, user_id=user_id,
+                                  status=status, error=error, created_at=now)
+                for user_id, status, error in done
+            ],
+            ignore_conflicts=True,
+        )
+        Broadcast.objects.filter(pk=broadcast_id).update(
+            last_user_id=cursor,
+            lease_until=_lease_until(),
+            sent_count=F("sent_count") + counts[BroadcastDelivery.Status.SENT],
+            failed_count=F("failed_count") + counts[BroadcastDelivery.Status.FAILED],
+            blocked_count=F("blocked_count") + counts[BroadcastDelivery.Status.BLOCKED],
+        )
+        if job_id is not None:
+            touch_job(job_id)
+        return Broadcast.objects.values_list("status", flat=True).get(pk=broadcast_id)
+
+
+def _finish(broadcast_id: int) -> str:
+    Broadcast.objects.filter(pk=broadcast_id, status=Broadcast.Status.RUNNING).update(
+        status=Broadcast.Status.COMPLETED, lease_until=None, finished_at=timezone.now())
+    return Broadcast.objects.values_list("status", flat=True).get(pk=broadcast_id)
+
+
+@transaction.atomic
+def _requeue(broadcast_id: int) -> str:
+    """Вернуть рассылку в очередь новой задачей (остановка runbot)."""
+    if Broadcast.objects.filter(pk=broadcast_id, status=Broadcast.Status.RUNNING).update(
+            status=Broadcast.Status.QUEUED, lease_until=None):
+        enqueue_job("run_broadcast", {"broadcast_id": broadcast_id})
+    return Broadcast.objects.values_list("status", flat=True).get(pk=broadcast_id)
+
+
+def _release(broadcast_id: int) -> None:
+    Broadcast.objects.filter(pk=broadcast_id).update(lease_until=None)
+
+
+async def _deliver(bot: Bot, user_id: int, text: str, slots: asyncio.Semaphore) -> Delivery:
+    async with slots:
+        try:
+            await bot.send_message(user_id, text)
+        except TelegramForbiddenError as exc:
+            return user_id, BroadcastDelivery.Status.BLOCKED, str(exc)[:255]
+        except (TelegramNetworkError, TelegramServerError, TelegramRetryAfter) as exc:
+            logger.warning("Broadcast to %s failed temporarily: %s", user_id, exc)
+            return user_id, None, str(exc)[:255]
+        except TelegramAPIError as exc:
+            return user_id, BroadcastDelivery.Status.FAILED, str(exc)[:255]
+    return user_id, BroadcastDelivery.Status.SENT, ""
+
+
+async def _deliver_batch(
+    bot: Bot, broadcast_id: int, batch: List[int], text: str,
+    slots: asyncio.Semaphore, cursor: int, job_id: Optional[int],
+) -> List[Delivery]:
+    tasks = [asyncio.ensure_future(_deliver(bot, user_id, text, slots)) for user_id in batch]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except asyncio.CancelledError:
+        # Прерывание посреди пачки: сохранить уже отправленные, чтобы при
+        # продолжении не отправить их повторно
+        for task in tasks:
+            task.cancel()
+        done = [task.result() for task in tasks if task.done() and not task.cancelled()]
+        if done:
+            await run_db(_record_batch, broadcast_id, done, cursor, job_id)
+        raise
+
+
+def _give_up_retries(results: List[Delivery], retries: Dict[int, int]) -> List[Delivery]:
+    """Временные ошибки сверх ``BROADCAST_MAX_RETRIES`` записать как failed."""
+    checked = []
+    for user_id, status, error in results:
+        if status is None:
+            retries[user_id] = retries.get(user_id, 0) + 1
+            if retries[user_id] > settings.BROADCAST_MAX_RETRIES:
+                status = BroadcastDelivery.Status.FAILED
+                del retries[user_id]
+        checked.append((user_id, status, error))
+    return checked
+
+
+async def run_broadcast(
+    bot: Bot, broadcast_id: int, should_stop: Callable[[], bool] = lambda: False
+) -> Optional[str]:
+    """
+    Вести рассылку до конца или остановки и вернуть её статус; None — её
+    уже ведут или она не в очереди. ``should_stop`` проверяется между
+    пачками: тогда рассылка возвращается в очередь.
+    """
+    broadcast = await run_db(_claim, broadcast_id)
+    if broadcast is None:
+        logger.info("Broadcast %s is not queued or is already running", broadcast_id)
+        return None
+    city_id, text, cursor = broadcast["city_id"], broadcast["text"], broadcast["last_user_id"]
+    slots = asyncio.Semaphore(settings.BROADCAST_CONCURRENCY)
+    job_id = current_job_id()
+    # Сколько раз получатель уже получил временную ошибку в этом запуске
+    retries: Dict[int, int] = {}
+    status = Broadcast.Status.RUNNING
+    backoff = 0
+    logger.info("Broadcast %s started from user %s", broadcast_id, cursor)
+    try:
+        with bulk_sends():
+            while status == Broadcast.Status.RUNNING:
+                if should_stop():
+                    status = await run_db(_requeue, broadcast_id)
+                    break
+                batch = await run_db(
+                    _next_batch, broadcast_id, city_id, cursor, settings.BROADCAST_BATCH_SIZE)
+                if not batch:
+                    status = await run_db(_finish, broadcast_id)
+                    break
+                results = await _deliver_batch(
+                    bot, broadcast_id, batch, text, slots, cursor, job_id)
+                results = _give_up_retries(results, retries)
+                retry = [user_id for user_id, delivery_status, _ in results
+                         if delivery_status is None]
+                # Получатели с временной ошибкой остаются после контрольной точки
+                cursor = min(retry) - 1 if retry else batch[-1]
+                status = await run_db(_record_batch, broadcast_id, results, cursor, job_id)
+                if retry:
+                    backoff = min(max(backoff * 2, 5), 300)
+                    logger.warning("Broadcast %s: %s temporary failures, retrying in %ss",
+                                   broadcast_id, len(retry), backoff)
+                    await asyncio.sleep(backoff)
+                    continue
+                backoff = 0
+                logger.info("Broadcast %s: %s recipients done, checkpoint %s",
+                            broadcast_id, len(batch), cursor)
+    finally:
+        if status != Broadcast.Status.COMPLETED:
+            await run_db(_release, broadcast_id)
+    logger.info("Broadcast %s stopped with status %s", broadcast_id, status)
+    return status
+
+
+@register_job("run_broadcast")
+async def run_broadcast_job(bot: Bot, payload: Dict[str, Any]) -> None:
+    await run_broadcast(bot, payload["broadcast_id"], should_stop=pool_stopping)
@@ -0,0 +1,139 @@
+"""
+Снимок справочников в памяти: категории мест, города и категории гайдов.
+
+Почти каждое меню бота показывает эти почти статичные данные, поэтому
+они загружаются целиком несколькими запросами и отдаются из памяти.
+Снимок привязан к версии ``catalog`` (``services.versions``), которую
+увеличивают сигналы при сохранении справочников в админке и при
+появлении мест и гайдов в новых городах и категориях.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from bot_app.models import Category, City, Guide, GuideCategory, Place
+from bot_app.services import versions
+from bot_app.services.db import run_db
+
+CATALOG_KEY = "catalog"
+
+
+def _lookup_key(name: str) -> str:
+    return (name or "").strip().casefold().replace("ё", "е")
+
+
+class Catalog:
+    def __init__(self, version: int) -> None:
+        self.version = version
+        self.categories: List[Category] = []
+        self.cities: List[City] = []
+        self.guide_categories: List[GuideCategory] = []
+        self._categories_by_name: Dict[str, Category] = {}
+        self._cities_by_name: Dict[str, City] = {}
+        self._cities_by_id: Dict[int, City] = {}
+        self._guide_categories_by_name: Dict[str, GuideCategory] = {}
+        self._city_categories: Dict[int, List[str]] = {}
+        self._city_guide_categories: Dict[int, List[str]] = {}
+        self._guide_categories_in_use: List[str] = []
+
+    def category_names(self) -> List[str]:
+        return [category.name for category in self.categories]
+
+    def categories_for_city(self, city_id: int) -> List[str]:
+        """Категории, в которых у города есть места."""
+        return self._city_categories.get(city_id, [])
+
+    def find_category(self, name: str) -> Optional[Category]:
+        return self._categories_by_name.get(_lookup_key(name))
+
+    def city_names(self) -> List[str]:
+        """Активные города."""
+        return [city.name for city in self.cities]
+
+    def find_city(self, name: str) -> Optional[City]:
+        return self._cities_by_name.get(_lookup_key(name))
+
+    def get_city(self, city_id: int) -> Optional[City]:
+        return self._cities_by_id.get(city_id)
+
+    def guide_categories_for_city(self, city_id: Optional[int]) -> List[str]:
+        """Категории гайдов города, а если их нет — все категории с гайдами."""
+        if city_id and self._city_guide_categories.get(city_id):
+            return self._city_guide_categories[city_id]
+        return self._guide_categories_in_use
+
+    def find_guide_category(self, name: str) -> Optional[GuideCategory]:
+        return self._guide_categories_by_name.get(_lookup_key(name))
+
+
+def build_catalog(version: int) -> Catalog:
+    catalog = Catalog(version)
+    catalog.categories = list(Category.objects.order_by("name"))
+    catalog.cities = list(City.objects.filter(is_active=True).order_by("name"))
+    catalog.guide_categories = list(GuideCategory.objects.order_by("name"))
+
+    catalog._categories_by_name = {_lookup_key(c.name): c for c in catalog.categories}
+    catalog._cities_by_name = {_lookup_key(c.name): c for c in catalog.cities}
+    catalog._cities_by_id = {c.id: c for c in catalog.cities}
+    catalog._guide_categories_by_name = {
+        _lookup_key(c.name): c for c in catalog.guide_categories}
+
+    category_names = {c.id: c.name for c in catalog.categories}
+    city_categories = defaultdict(set)
+    pairs = (
+        Place.objects.filter(category__isnull=False)
+        .values_list("city_id", "category_id")
+        .distinct()
+    )
+    for city_id, category_id in pairs:
+        city_categories[city_id].add(category_names[category_id])
+    catalog._city_categories = {
+        city_id: sorted(names) for city_id, names in city_categories.items()}
+
+    guide_category_names = {c.id: c.name for c in catalog.guide_categories}
+    city_guide_categories = defaultdict(set)
+    pairs = (
+        Guide.objects.filter(category__isnull=False)
+        .values_list("city_id", "category_id")
+        .distinct()
+    )
+    for city_id, category_id in pairs:
+        city_guide_categories[city_id].add(guide_category_names[category_id])
+    catalog._city_guide_categories = {
+        city_id: sorted(names) for city_id, names in city_guide_categories.items()}
+    catalog._guide_categories_in_use = sorted(
+        set().union(*city_guide_categories.values()) if city_guide_categories else set())
+    return catalog
+
+
+_catalog: Optional[Catalog] = None
+_lock: Optional[asyncio.Lock] = None
+_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_lock() -> asyncio.Lock:
+    """Блокировка пересборки; создаётся в текущем цикле событий (asyncio.run в командах)."""
+    global _lock, _lock_loop
+    loop = asyncio.get_running_loop()
+    if _lock is None or _lock_loop is not loop:
+        _lock, _lock_loop = asyncio.Lock(), loop
+    return _lock
+
+
+async def get_catalog() -> Catalog:
+    global _catalog
+    version = versions.peek_version(CATALOG_KEY)
+    if version is None:
+        version = await run_db(versions.get_version, CATALOG_KEY)
+    if _catalog is not None and _catalog.version >= version:
+        return _catalog
+
+    async with _get_lock():
+        if _catalog is None or _catalog.version < version:
+            _catalog = await run_db(build_catalog, version)
+    return _catalog
+
+
+def bump_catalog_version() -> None:
+    versions.bump_version(CATALOG_KEY)
@@ -0,0 +1,65 @@
+"""
+Контекст города для AI-помощника.
+
+Для каждого города в памяти держится поисковый индекс
+(``services.retrieval``), собранный для определённой версии данных
+(``services.versions``). Сигналы моделей обновляют индекс точечно; если
+версия ушла вперёд (например, правка из админки), индекс пересобирается.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from bot_app.services import versions
+from bot_app.services.db import run_db
+from bot_app.services.retrieval import CityIndex, DocKey, build_city_index
+from bot_app.utils.cache import LRUCache
+
+_cache: LRUCache[CityIndex] = LRUCache(
+    settings.CITY_CONTEXT_CACHE_MAX_ENTRIES,
+    max_weight=settings.CITY_CONTEXT_CACHE_MAX_CHARS,
+    weigher=lambda index: index.size_chars,
+)
+
+
+async def get_city_index(city_id: int) -> CityIndex:
+    key = versions.city_key(city_id)
+    version = versions.peek_version(key)
+    if version is None:
+        version = await run_db(versions.get_version, key)
+
+    index = _cache.get(city_id)
+    if index is None or index.version < version:
+        index = await run_db(build_city_index, city_id, version)
+        _cache.set(city_id, index)
+    return index
+
+
+async def get_city_context(city_id: int, user_query: str) -> str:
+    """Релевантные вопросу места и гайды города в пределах бюджета токенов."""
+    index = await get_city_index(city_id)
+    return index.render_context(
+        user_query,
+        top_k=settings.ASSISTANT_CONTEXT_TOP_K,
+        token_budget=settings.ASSISTANT_CONTEXT_TOKEN_BUDGET,
+    )
+
+
+def apply_change(
+    city_id: int,
+    version: int,
+    *,
+    upsert: Optional[Tuple[str, Dict[str, Any]]] = None,
+    remove: Optional[DocKey] = None,
+) -> None:
+    """Точечно обновить индекс города, если он уже загружен."""
+    index = _cache.get(city_id)
+    if index is not None:
+        index.apply(version, upsert=upsert, remove=remove)
+        # Индекс изменился на месте — пересчитать его вес в кэше
+        _cache.set(city_id, index)
+
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,185 @@
+"""
+Пул потоков для работы с ORM из асинхронных хендлеров.
+
+``sync_to_async`` по умолчанию (``thread_sensitive=True``) выполняет все
+вызовы в одном общем потоке, поэтому один медленный запрос блокирует
+остальные. Здесь запросы уходят в ограниченный пул, у каждого потока
+своё соединение с БД, а устаревшие соединения закрываются до и после
+каждого вызова через ``close_old_connections``.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, TypeVar
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DBExecutorStats:
+    """Счётчики очереди пула: глубина, время ожидания и выполнения."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def on_submit(self) -> None:
+        with self._lock:
+            self.submitted += 1
+
+    def on_start(self, wait: float) -> None:
+        with self._lock:
+            self.started += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def on_finish(self, run: float, failed: bool) -> None:
+        with self._lock:
+            self.completed += 1
+            self.total_run += run
+            if failed:
+                self.failed += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.started or 1
+            completed = self.completed or 1
+            return {
+                "queue_depth": self.submitted - self.started,
+                "in_progress": self.started - self.completed,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_ms": round(self.total_wait / started * 1000, 2),
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "avg_run_ms": round(self.total_run / completed * 1000, 2),
+            }
+
+
+stats = DBExecutorStats()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = max(1, int(getattr(settings, "DB_EXECUTOR_WORKERS", 4)))
+                logger.info("Starting DB executor with %s workers", workers)
+                _executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix="db",
+                )
+    return _executor
+
+
+def _close_thread_connections() -> None:
+    connections.close_all()
+
+
+def shutdown_executor() -> None:
+    """Закрыть соединения рабочих потоков и остановить пул."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is None:
+        return
+    # Каждому потоку по задаче: соединения в Django привязаны к потоку.
+    workers = executor._max_workers  # pylint: disable=protected-access
+    barrier = threading.Barrier(workers)
+
+    def close_in_worker() -> None:
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        _close_thread_connections()
+
+    for _ in range(workers):
+        executor.submit(close_in_worker)
+    executor.shutdown(wait=True)
+    logger.info("DB executor stopped: %s", stats.snapshot())
+
+
+def _run_with_connection(func: Callable[..., T], submitted_at: float, *args, **kwargs) -> T:
+    started_at = time.monotonic()
+    stats.on_start(started_at - submitted_at)
+    failed = False
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        failed = True
+        raise
+    finally:
+        close_old_connections()
+        stats.on_finish(time.monotonic() - started_at, failed)
+
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """Выполнить синхронную ORM-функцию в пуле потоков БД."""
+    loop = asyncio.get_running_loop()
+    stats.on_submit()
+    call = functools.partial(
+        _run_with_connection, func, time.monotonic(), *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+def db_task(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    """Декоратор-замена ``@sync_to_async`` для функций, работающих с БД."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> T:
+        return await run_db(func, *args, **kwargs)
+
+    return wrapper
+
+
+# Допустимые значения строковых PRAGMA (значения приходят из env)
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+_INT_PRAGMAS = {"busy_timeout", "mmap_size", "cache_size"}
+
+
+def sqlite_pragma_statements(pragmas: Mapping[str, Any]) -> List[str]:
+    statements = []
+    for name, value in pragmas.items():
+        if name in _INT_PRAGMAS:
+            value = int(value)
+        elif name in _PRAGMA_CHOICES:
+            value = str(value).upper()
+            if value not in _PRAGMA_CHOICES[name]:
+                raise ValueError(f"Unsupported value for PRAGMA {name}: {value!r}")
+        else:
+            raise ValueError(f"Unsupported PRAGMA {name!r}")
+        statements.append(f"PRAGMA {name} = {value}")
+    return statements
+
+
+def configure_sqlite_connection(sender, connection, **kwargs) -> None:
+    """Обработчик ``connection_created``: PRAGMA из ``SQLITE_PRAGMAS``."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragma_statements(getattr(settings, "SQLITE_PRAGMAS", {})):
+            cursor.execute(statement)
@@ -0,0 +1,331 @@
+"""
+Хранилище состояний FSM aiogram в БД (модель ``FSMRecord``).
+
+Состояние переживает перезапуск ``runbot`` и общее для всех процессов,
+работающих с одной базой. Данные хранятся компактным JSON, большие
+значения сжимаются zlib. Запись, не менявшаяся ``FSM_STATE_TTL`` секунд,
+считается сброшенной и удаляется ``purge_expired``.
+
+Внутри апдейта (``BatchEventIsolation`` → ``DBStorage.batch``) запись
+читается из БД один раз, все ``get_data``/``update_data``/``set_state``
+работают с копией в памяти, а изменения записываются одним upsert после
+хендлера. Вне апдейта каждое изменение пишется сразу.
+
+Для ``FSM_STORAGE=memory`` — ``BoundedMemoryStorage``: те же TTL и
+предел числа состояний в процессе. Оба хранилища не принимают значения
+больше ``FSM_MAX_VALUE_BYTES`` — длинные списки хранятся в
+``services.result_sets``.
+"""
+
+import json
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseEventIsolation,
+    BaseStorage,
+    StateType,
+    StorageKey,
+)
+from aiogram.fsm.storage.memory import DisabledEventIsolation
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from bot_app.models import FSMRecord
+from bot_app.services.db import run_db
+
+# Короче этого JSON не сжимается: выигрыша почти нет
+COMPRESS_MIN_BYTES = 256
+_RAW = b"j"
+_ZLIB = b"z"
+
+
+class FSMValueTooLarge(ValueError):
+    """Значение в данных FSM больше ``FSM_MAX_VALUE_BYTES``."""
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def check_value_sizes(data: Mapping[str, Any]) -> None:
+    limit = settings.FSM_MAX_VALUE_BYTES
+    for name, value in data.items():
+        size = len(_encode(value))
+        if size > limit:
+            raise FSMValueTooLarge(
+                f"FSM value {name!r} is {size} bytes, limit is {limit}")
+
+
+def dumps(data: Mapping[str, Any]) -> bytes:
+    if not data:
+        return b""
+    raw = _encode(data)
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return _ZLIB + packed
+    return _RAW + raw
+
+
+def loads(blob: bytes) -> Dict[str, Any]:
+    blob = bytes(blob)
+    if not blob:
+        return {}
+    kind, body = blob[:1], blob[1:]
+    if kind == _ZLIB:
+        body = zlib.decompress(body)
+    return json.loads(body)
+
+
+def storage_key(key: StorageKey) -> str:
+    parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+    if key.thread_id:
+        parts.append(f"t{key.thread_id}")
+    if key.business_connection_id:
+        parts.append(f"b{key.business_connection_id}")
+    parts.append(key.destiny)
+    return ":".join(parts)
+
+
+@dataclass
+class _Record:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    dirty: bool = False
+    touched_at: float = 0.0
+
+
+def _load_record(key: str) -> _Record:
+    row = (
+        FSMRecord.objects.filter(key=key, expires_at__gt=timezone.now())
+        .values_list("state", "data")
+        .first()
+    )
+    if row is None:
+        return _Record()
+    return _Record(state=row[0], data=loads(row[1]))
+
+
+@transaction.atomic
+def _save_records(records: Dict[str, _Record], ttl: int) -> None:
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    empty = [key for key, record in records.items()
+             if record.state is None and not record.data]
+    if empty:
+        FSMRecord.objects.filter(key__in=empty).delete()
+    rows = [
+        FSMRecord(key=key, state=record.state, data=dumps(record.data),
+                  expires_at=expires_at)
+        for key, record in records.items() if key not in empty
+    ]
+    if rows:
+        # Один INSERT ... ON CONFLICT DO UPDATE на все записи
+        FSMRecord.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["key"],
+            update_fields=["state", "data", "expires_at"],
+        )
+
+
+def purge_expired() -> int:
+    deleted, _ = FSMRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+# Записи, прочитанные в текущем апдейте (None — вне апдейта)
+_batch: ContextVar[Optional[Dict[str, _Record]]] = ContextVar("fsm_batch", default=None)
+
+
+class DBStorage(BaseStorage):
+    def __init__(self, ttl: Optional[int] = None) -> None:
+        self.ttl = settings.FSM_STATE_TTL if ttl is None else ttl
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        """Отложить запись изменений до выхода из блока (один upsert)."""
+        records: Dict[str, _Record] = {}
+        token = _batch.set(records)
+        try:
+            yield
+        finally:
+            _batch.reset(token)
+            dirty = {key: record for key, record in records.items() if record.dirty}
+            if dirty:
+                await run_db(_save_records, dirty, self.ttl)
+
+    async def _record(self, key: StorageKey) -> Tuple[str, _Record]:
+        name = storage_key(key)
+        records = _batch.get()
+        if records is not None and name in records:
+            return name, records[name]
+        record = await run_db(_load_record, name)
+        if records is not None:
+            records[name] = record
+        return name, record
+
+    async def _changed(self, name: str, record: _Record) -> None:
+        record.dirty = True
+        if _batch.get() is None:
+            await run_db(_save_records, {name: record}, self.ttl)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name, record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        await self._changed(name, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        check_value_sizes(data)
+        name, record = await self._record(key)
+        record.data = dict(data)
+        await self._changed(name, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, record = await self._record(key)
+        return record.data.copy()
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        check_value_sizes(data)
+        name, record = await self._record(key)
+        record.data.update(data)
+        await self._changed(name, record)
+        return record.data.copy()
+
+    async def close(self) -> None:
+        pass
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    Состояния в памяти процесса: неактивные дольше ``ttl`` секунд и самые
+    давние сверх ``max_keys`` удаляются.
+    """
+
+    def __init__(self, ttl: Optional[int] = None, max_keys: Optional[int] = None) -> None:
+        self.ttl = settings.FSM_STATE_TTL if ttl is None else ttl
+        self.max_keys = settings.FSM_MEMORY_MAX_KEYS if max_keys is None else max_keys
+        # Порядок — по последнему обращению, самые давние в начале
+        self._records: "OrderedDict[StorageKey, _Record]" = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _evict(self) -> None:
+        deadline = time.monotonic() - self.ttl
+        while self._records:
+            oldest = next(iter(self._records.values()))
+            if len(self._records) <= self.max_keys and oldest.touched_at > deadline:
+                break
+            self._records.popitem(last=False)
+            self.evicted += 1
+
+    def _record(self, key: StorageKey, create: bool = False) -> Optional[_Record]:
+        self._evict()
+        record = self._records.get(key)
+        if record is not None:
+            self._records.move_to_end(key)
+            record.touched_at = time.monotonic()
+        elif create:
+            record = self._records[key] = _Record(touched_at=time.monotonic())
+            self._evict()
+        return record
+
+    def _forget_if_empty(self, key: StorageKey, record: _Record) -> None:
+        if record.state is None and not record.data:
+            self._records.pop(key, None)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._record(key, create=True)
+        record.state = state.state if isinstance(state, State) else state
+        self._forget_if_empty(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._record(key)
+        return record.state if record is not None else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        check_value_sizes(data)
+        record = self._record(key, create=True)
+        record.data = dict(data)
+        self._forget_if_empty(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._record(key)
+        return record.data.copy() if record is not None else {}
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        check_value_sizes(data)
+        record = self._record(key, create=True)
+        record.data.update(data)
+        self._forget_if_empty(key, record)
+        return record.data.copy()
+
+    async def close(self) -> None:
+        self._records.clear()
+
+
+class BatchEventIsolation(BaseEventIsolation):
+    """
+    Изоляция событий aiogram, которая заодно открывает ``DBStorage.batch``
+    вокруг обработки апдейта: ``FSMContextMiddleware`` входит в ``lock``
+    до чтения ``raw_state``, поэтому и оно попадает в пачку.
+    """
+
+    def __init__(self, storage: DBStorage,
+                 inner: Optional[BaseEventIsolation] = None) -> None:
+        self.storage = storage
+        self.inner = inner or DisabledEventIsolation()
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncIterator[None]:
+        async with self.inner.lock(key):
+            async with self.storage.batch():
+                yield
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+def create_storage() -> BaseStorage:
+    backend = settings.FSM_STORAGE
+    if backend == "db":
+        return DBStorage()
+    if backend == "memory":
+        return BoundedMemoryStorage()
+    if backend == "redis":
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "FSM_STORAGE=redis requires the 'redis' package") from exc
+        return RedisStorage.from_url(
+            settings.FSM_REDIS_URL,
+            state_ttl=settings.FSM_STATE_TTL,
+            data_ttl=settings.FSM_STATE_TTL,
+            json_dumps=lambda data: json.dumps(
+                data, ensure_ascii=False, separators=(",", ":")),
+        )
+    raise ImproperlyConfigured(f"Unknown FSM_STORAGE: {backend!r}")
+
+
+def create_events_isolation(
+    storage: BaseStorage, inner: Optional[BaseEventIsolation] = None
+) -> Optional[BaseEventIsolation]:
+    if isinstance(storage, DBStorage):
+        return BatchEventIsolation(storage, inner)
+    return inner
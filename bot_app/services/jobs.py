@@ -0,0 +1,299 @@
+"""
+Фоновые задачи бота, хранящиеся в таблице ``Job``.
+
+Хендлер ставит задачу через ``enqueue_job`` (обычно в той же транзакции,
+что и сами данные) и сразу отвечает пользователю, а пул воркеров внутри
+процесса ``runbot`` выполняет её с повторами и экспоненциальной задержкой.
+Незавершённые задачи переживают перезапуск: при старте пула «зависшие»
+в статусе ``running`` задачи возвращаются в очередь.
+"""
+
+import asyncio
+import importlib
+import logging
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from bot_app.models import Job
+from bot_app.services.db import run_db
+from bot_app.services.outbound import bulk_sends
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Bot, Dict[str, Any]], Awaitable[None]]
+
+# Модули, которые регистрируют обработчики через @register_job
+JOB_MODULES = ("bot_app.services.reviews", "bot_app.services.broadcasts")
+
+_handlers: Dict[str, JobHandler] = {}
+_active_pool: Optional["JobWorkerPool"] = None
+_current_job: ContextVar[Optional[int]] = ContextVar("current_job", default=None)
+
+
+class PermanentJobError(Exception):
+    """Ошибка, после которой задачу нет смысла повторять."""
+
+
+def register_job(kind: str) -> Callable[[JobHandler], JobHandler]:
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+
+    return decorator
+
+
+def enqueue_job(
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    *,
+    key: Optional[str] = None,
+    delay: float = 0,
+    max_attempts: Optional[int] = None,
+    coalesce: bool = False,
+) -> Job:
+    """
+    Поставить задачу в очередь (синхронно, вызывать из потока БД).
+
+    Если задача с таким ``key`` уже есть, возвращается существующая —
+    повторная постановка ничего не меняет. С ``coalesce`` ключ означает
+    «выполнить ещё раз»: ждущая задача склеивает запросы, выполняющаяся
+    после завершения запускается повторно (один раз, через ``delay``),
+    у завершённой ключ снимается и ставится новая. Две задачи с одним
+    ключом никогда не выполняются одновременно.
+    """
+    fields = {
+        "kind": kind,
+        "payload": payload or {},
+        "run_after": timezone.now() + timedelta(seconds=delay),
+        "max_attempts": max_attempts or settings.JOB_MAX_ATTEMPTS,
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            if coalesce:
+                # Сдвинутый run_after выполняющейся задачи — просьба повторить её
+                Job.objects.filter(
+                    idempotency_key=key, status=Job.Status.RUNNING,
+                    run_after__lte=F("locked_at"),
+                ).update(run_after=fields["run_after"])
+                Job.objects.filter(idempotency_key=key).exclude(
+                    status__in=(Job.Status.PENDING, Job.Status.RUNNING),
+                ).update(idempotency_key=None)
+            job, _ = Job.objects.get_or_create(
+                idempotency_key=key, defaults=fields)
+    except IntegrityError:
+        job = Job.objects.get(idempotency_key=key)
+    return job
+
+
+def pool_stopping() -> bool:
+    """Пул останавливается: длинной задаче пора сохранить прогресс и выйти."""
+    return _active_pool is None
+
+
+def current_job_id() -> Optional[int]:
+    """Id задачи, которую выполняет текущая корутина пула, или None."""
+    return _current_job.get()
+
+
+def touch_job(job_id: int) -> None:
+    """
+    Продлить блокировку выполняющейся задачи (синхронно, из потока БД):
+    задачи дольше ``JOB_LOCK_TIMEOUT`` должны вызывать её по ходу работы,
+    иначе сборщик вернёт их в очередь как брошенные.
+    """
+    now = timezone.now()
+    Job.objects.filter(id=job_id, status=Job.Status.RUNNING).update(
+        locked_at=now, updated_at=now)
+
+
+def wake_workers() -> None:
+    """Разбудить пул после постановки задачи в этом же процессе."""
+    if _active_pool is not None:
+        _active_pool.wake()
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = settings.JOB_RETRY_BASE_DELAY * (2 ** max(0, attempts - 1))
+    return min(delay, settings.JOB_RETRY_MAX_DELAY)
+
+
+def _claim_next_job() -> Optional[Job]:
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.Status.PENDING, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("id", flat=True)[:5]
+    )
+    for job_id in candidates:
+        claimed = Job.objects.filter(id=job_id, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def _complete_job(job: Job) -> None:
+    now = timezone.now()
+    done = Job.objects.filter(id=job.id, run_after=job.run_after).update(
+        status=Job.Status.DONE,
+        locked_at=None,
+        last_error="",
+        updated_at=now,
+    )
+    if not done:
+        # Пока задача выполнялась, её попросили повторить (см. coalesce)
+        Job.objects.filter(id=job.id).update(
+            status=Job.Status.PENDING,
+            locked_at=None,
+            attempts=0,
+            last_error="",
+            updated_at=now,
+        )
+
+
+def _fail_job(job_id: int, error: str, permanent: bool) -> None:
+    job = Job.objects.get(id=job_id)
+    now = timezone.now()
+    if permanent or job.attempts >= job.max_attempts:
+        job.status = Job.Status.FAILED
+    else:
+        job.status = Job.Status.PENDING
+        job.run_after = now + timedelta(seconds=_retry_delay(job.attempts))
+    job.locked_at = None
+    job.last_error = error[:2000]
+    job.save(update_fields=["status", "run_after",
+             "locked_at", "last_error", "updated_at"])
+
+
+def _recover_jobs(lock_timeout: Optional[float]) -> int:
+    """Вернуть в очередь задачи, брошенные упавшим процессом."""
+    qs = Job.objects.filter(status=Job.Status.RUNNING)
+    if lock_timeout is not None:
+        qs = qs.filter(locked_at__lt=timezone.now() -
+                       timedelta(seconds=lock_timeout))
+    return qs.update(
+        status=Job.Status.PENDING,
+        locked_at=None,
+        run_after=timezone.now(),
+        updated_at=timezone.now(),
+    )
+
+
+def recover_interrupted_jobs() -> int:
+    """Вернуть в очередь все задачи ``running`` (пока ни один пул не запущен)."""
+    return _recover_jobs(None)
+
+
+class JobWorkerPool:
+    """Пул asyncio-воркеров, разбирающих таблицу ``Job``."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        workers: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        recover_on_start: bool = True,
+    ) -> None:
+        self.bot = bot
+        # При нескольких процессах runbot задачи возвращает родитель до их
+        # запуска, иначе перезапущенный воркер отнимет задачи у соседей
+        self.recover_on_start = recover_on_start
+        self.workers = workers or settings.JOB_WORKERS
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        self._tasks: List[asyncio.Task] = []
+        self._reaper_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    async def start(self) -> None:
+        global _active_pool
+        for module in JOB_MODULES:
+            importlib.import_module(module)
+        if self.recover_on_start:
+            recovered = await run_db(_recover_jobs, None)
+            if recovered:
+                logger.info("Resumed %s interrupted jobs", recovered)
+        self._tasks = [
+            asyncio.create_task(self._worker(idx), name=f"job-worker-{idx}")
+            for idx in range(self.workers)
+        ]
+        self._reaper_task = asyncio.create_task(
+            self._reaper(), name="job-reaper")
+        _active_pool = self
+
+    async def stop(self) -> None:
+        """Дождаться текущих задач и остановить воркеры."""
+        global _active_pool
+        if _active_pool is self:
+            _active_pool = None
+        self._stopping = True
+        self._wakeup.set()
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        if not self._stopping:
+            self._wakeup.clear()
+
+    async def _worker(self, idx: int) -> None:
+        while not self._stopping:
+            try:
+                job = await run_db(_claim_next_job)
+            except Exception:  # pragma: no cover - БД временно недоступна
+                logger.exception("job-worker-%s: failed to claim job", idx)
+                job = None
+            if job is None:
+                await self._wait_for_work()
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        handler = _handlers.get(job.kind)
+        if handler is None:
+            await run_db(_fail_job, job.id, f"Unknown job kind: {job.kind}", True)
+            return
+        token = _current_job.set(job.id)
+        try:
+            # Отправки из фоновых задач уступают ответам пользователям
+            with bulk_sends():
+                await handler(self.bot, job.payload)
+        except Exception as exc:  # pylint: disable=broad-except
+            permanent = isinstance(exc, PermanentJobError)
+            logger.exception("Job %s failed (attempt %s/%s)",
+                             job, job.attempts, job.max_attempts)
+            await run_db(_fail_job, job.id, f"{type(exc).__name__}: {exc}", permanent)
+        else:
+            await run_db(_complete_job, job)
+        finally:
+            _current_job.reset(token)
+
+    async def _reaper(self) -> None:
+        while True:
+            await asyncio.sleep(settings.JOB_LOCK_TIMEOUT / 2)
+            try:
+                await run_db(_recover_jobs, settings.JOB_LOCK_TIMEOUT)
+            except Exception:  # pragma: no cover
+                logger.exception("Failed to recover stale jobs")
@@ -0,0 +1,259 @@
+"""
+Планировщик исходящих запросов к Bot API с учётом лимитов Telegram.
+
+Все отправки и правки сообщений (``message.answer``, ``edit_text``,
+``answer_media_group``, ``bot.send_message`` …) проходят через middleware
+сессии бота, поэтому хендлеры вызывают их как обычно. Перед запросом он
+ждёт бюджета:
+
+* общего — ``OUTBOUND_GLOBAL_RATE`` сообщений в секунду на бота;
+* чата — ``OUTBOUND_CHAT_RATE`` в секунду (с запасом ``OUTBOUND_CHAT_BURST``)
+  для личных чатов и ``OUTBOUND_GROUP_RATE`` для групп.
+
+Ответы пользователям идут вне очереди: массовые отправки (фоновые задачи,
+рассылки) помечаются ``bulk_sends()`` и получают общий бюджет только
+когда его не ждёт ни один интерактивный ответ. На 429 чат (а для массовых
+отправок — вся массовая очередь) ставится на паузу на ``retry_after``
+секунд, и запрос повторяется до ``OUTBOUND_MAX_RETRIES`` раз.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, SendChatAction, SendMediaGroup, TelegramMethod
+from aiogram.methods.base import TelegramType
+from django.conf import settings
+
+from bot_app.utils.cache import LRUCache
+from bot_app.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+_priority: ContextVar[int] = ContextVar("outbound_priority", default=INTERACTIVE)
+
+ChatId = Union[int, str]
+
+# Как часто (сек) вычищать истёкшие паузы чатов после 429
+PAUSE_PRUNE_INTERVAL = 60.0
+
+
+@contextmanager
+def bulk_sends() -> Iterator[None]:
+    """Отправки внутри блока (и запущенных из него задач) — массовые."""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class OutboundStats:
+    """Счётчики очереди отправок: ожидание бюджета по приоритетам, 429."""
+
+    def __init__(self) -> None:
+        self.waiting = 0
+        self.granted = {INTERACTIVE: 0, BULK: 0}
+        self.total_wait = {INTERACTIVE: 0.0, BULK: 0.0}
+        self.max_wait = {INTERACTIVE: 0.0, BULK: 0.0}
+        self.retry_after = 0
+        self.failed = 0
+
+    def record_wait(self, priority: int, wait: float) -> None:
+        self.granted[priority] += 1
+        self.total_wait[priority] += wait
+        self.max_wait[priority] = max(self.max_wait[priority], wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"waiting": self.waiting}
+        for priority, name in PRIORITY_NAMES.items():
+            granted = self.granted[priority]
+            result[f"{name}_granted"] = granted
+            result[f"{name}_avg_wait_ms"] = round(
+                self.total_wait[priority] / (granted or 1) * 1000, 2)
+            result[f"{name}_max_wait_ms"] = round(self.max_wait[priority] * 1000, 2)
+        result["retry_after"] = self.retry_after
+        result["failed"] = self.failed
+        return result
+
+
+stats = OutboundStats()
+
+
+class PriorityBucket:
+    """
+    Token bucket, выдающий токены по приоритету (меньше — раньше), внутри
+    приоритета — по очереди. Массовый приоритет можно поставить на паузу.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._heap: List[Tuple[int, int, float, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+        self._paused_until: Dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._grant_task: Optional[asyncio.Task] = None
+
+    async def acquire(self, cost: float, priority: int) -> None:
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), min(cost, self.capacity), future))
+        if self._grant_task is None or self._grant_task.done():
+            self._grant_task = asyncio.create_task(self._grant(), name="outbound-grant")
+        else:
+            self._wakeup.set()
+        await future
+
+    def pause(self, priority: int, seconds: float) -> None:
+        until = time.monotonic() + seconds
+        self._paused_until[priority] = max(self._paused_until.get(priority, 0.0), until)
+        self._wakeup.set()
+
+    async def _grant(self) -> None:
+        while self._heap:
+            priority, _, cost, future = self._heap[0]
+            if future.done():
+                heapq.heappop(self._heap)
+                continue
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            delay = self._paused_until.get(priority, 0.0) - now
+            if delay <= 0:
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    heapq.heappop(self._heap)
+                    future.set_result(None)
+                    continue
+                delay = (cost - self._tokens) / self.rate
+            # Пришедший за это время интерактивный запрос или пауза
+            # пересматривают очередь раньше
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+class OutboundScheduler:
+    def __init__(self, global_rate: Optional[float] = None) -> None:
+        self.global_bucket = PriorityBucket(global_rate or settings.OUTBOUND_GLOBAL_RATE)
+        self._chats: LRUCache[TokenBucket] = LRUCache(settings.OUTBOUND_CHAT_MAX_ENTRIES)
+        self._chat_paused_until: Dict[ChatId, float] = {}
+        self._next_prune = 0.0
+
+    def _chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(settings.OUTBOUND_CHAT_RATE,
+                                     settings.OUTBOUND_CHAT_BURST)
+            else:
+                bucket = TokenBucket(settings.OUTBOUND_GROUP_RATE,
+                                     settings.OUTBOUND_CHAT_BURST)
+            self._chats.set(chat_id, bucket)
+        return bucket
+
+    def _prune_pauses(self, now: float) -> None:
+        """Убрать истёкшие паузы чатов, которые больше ничего не отправляли."""
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PAUSE_PRUNE_INTERVAL
+        expired = [chat_id for chat_id, until in self._chat_paused_until.items() if until <= now]
+        for chat_id in expired:
+            del self._chat_paused_until[chat_id]
+
+    async def acquire(self, chat_id: ChatId, cost: float, priority: int) -> None:
+        started = time.monotonic()
+        self._prune_pauses(started)
+        stats.waiting += 1
+        try:
+            paused = self._chat_paused_until.get(chat_id, 0.0) - started
+            if paused > 0:
+                await asyncio.sleep(paused)
+            else:
+                self._chat_paused_until.pop(chat_id, None)
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire(cost, priority)
+        finally:
+            stats.waiting -= 1
+        stats.record_wait(priority, time.monotonic() - started)
+
+    def retry_after(self, chat_id: ChatId, seconds: float, priority: int) -> None:
+        now = time.monotonic()
+        self._prune_pauses(now)
+        until = now + seconds
+        self._chat_paused_until[chat_id] = max(self._chat_paused_until.get(chat_id, 0.0), until)
+        if priority == BULK:
+            self.global_bucket.pause(BULK, seconds)
+
+
+def _rate_limited(method: TelegramMethod[Any]) -> Optional[ChatId]:
+    """Чат, в который отправляет запрос, или None, если лимиты не нужны."""
+    if isinstance(method, SendChatAction):
+        return None
+    name = method.__api_method__
+    if not name.startswith(("send", "edit", "copy", "forward")):
+        return None
+    chat_id = getattr(method, "chat_id", None)
+    return chat_id if isinstance(chat_id, (int, str)) else None
+
+
+class OutboundMiddleware(BaseRequestMiddleware):
+    def __init__(self, scheduler: OutboundScheduler) -> None:
+        self.scheduler = scheduler
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = _rate_limited(method)
+        if chat_id is None:
+            return await make_request(bot, method)
+        priority = _priority.get()
+        cost = len(method.media) if isinstance(method, SendMediaGroup) else 1
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(chat_id, cost, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                attempt += 1
+                stats.retry_after += 1
+                if (attempt > settings.OUTBOUND_MAX_RETRIES
+                        or exc.retry_after > settings.OUTBOUND_MAX_RETRY_AFTER):
+                    stats.failed += 1
+                    raise
+                # Повторы расходятся во времени, чтобы не упереться в лимит снова
+                delay = exc.retry_after + random.uniform(0, min(2 ** attempt, 30))
+                logger.warning("%s to chat %s hit flood control, retry %s in %.1fs",
+                               method.__api_method__, chat_id, attempt, delay)
+                self.scheduler.retry_after(chat_id, delay, priority)
+
+
+def install(bot: Bot, global_rate: Optional[float] = None) -> OutboundScheduler:
+    scheduler = OutboundScheduler(global_rate)
+    bot.session.middleware(OutboundMiddleware(scheduler))
+    return scheduler
@@ -0,0 +1,284 @@
+"""
+Поиск мест по названию и адресу.
+
+Для каждого города в памяти держится индекс слов названий и адресов:
+точное совпадение, совпадение по префиксу ("коф" → "кофейня") и
+нечёткое совпадение по триграммам ("кофеня" → "кофейня"). Запрос
+дополнительно проверяется в другой раскладке и в транслитерации
+("rfat" → "кафе", "kafe" → "кафе"). Итоговый порядок учитывает и
+совпадение текста, и рейтинг места.
+
+Индекс собирается для версии данных города (``services.versions``) и
+обновляется точечно сигналами моделей (см. ``bot_app.signals``).
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from django.conf import settings
+
+from bot_app.models import Place
+from bot_app.services import versions
+from bot_app.services.ranking import get_scorer
+from bot_app.services.db import run_db
+from bot_app.utils.cache import LRUCache
+from bot_app.utils.text import normalize, query_variants, trigrams
+
+SEARCH_FIELDS = ("id", "name", "address", "avg_rating", "review_count", "is_pinned")
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.85
+# Нечёткое совпадение: доля общих триграмм не ниже порога
+TRIGRAM_THRESHOLD = 0.35
+TRIGRAM_WEIGHT = 0.7
+# Совпадение в адресе весит меньше, чем в названии
+ADDRESS_WEIGHT = 0.6
+# Варианты запроса (раскладка, транслитерация) чуть хуже исходного
+VARIANT_PENALTY = 0.9
+MIN_PREFIX_LEN = 2
+MIN_TEXT_SCORE = 0.25
+# Доля рейтинга в итоговой оценке
+RATING_WEIGHT = 0.3
+
+
+@dataclass
+class PlaceHit:
+    id: int
+    name: str
+    address: str
+    is_pinned: bool
+    review_count: int
+    score: float
+
+
+class PlaceSearchIndex:
+    """Индекс мест одного города с версией данных, по которой он собран."""
+
+    def __init__(self, city_id: int, version: int) -> None:
+        self.city_id = city_id
+        self.version = version
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        # слово -> {place_id: вес поля}
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._sorted_terms: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def size(self) -> int:
+        return len(self._postings) + len(self._docs)
+
+    def _doc_terms(self, fields: Dict[str, Any]) -> Dict[str, float]:
+        terms: Dict[str, float] = {}
+        for term in normalize(fields.get("address") or "").split():
+            terms[term] = ADDRESS_WEIGHT
+        for term in normalize(fields.get("name") or "").split():
+            terms[term] = 1.0
+        return terms
+
+    def _upsert(self, fields: Dict[str, Any]) -> None:
+        place_id = fields["id"]
+        self._remove(place_id)
+        terms = self._doc_terms(fields)
+        self._docs[place_id] = {
+            "name": fields["name"],
+            "address": fields["address"],
+            "avg_rating": fields.get("avg_rating") or 0.0,
+            "review_count": fields.get("review_count") or 0,
+            "is_pinned": bool(fields.get("is_pinned")),
+            "terms": terms,
+        }
+        for term, weight in terms.items():
+            if term not in self._postings:
+                self._sorted_terms = None
+                for gram in trigrams(term):
+                    self._trigrams[gram].add(term)
+            self._postings[term][place_id] = weight
+
+    def _remove(self, place_id: int) -> None:
+        doc = self._docs.pop(place_id, None)
+        if doc is None:
+            return
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(place_id, None)
+            if not postings:
+                del self._postings[term]
+                self._sorted_terms = None
+                for gram in trigrams(term):
+                    bucket = self._trigrams.get(gram)
+                    if bucket is not None:
+                        bucket.discard(term)
+                        if not bucket:
+                            del self._trigrams[gram]
+
+    def apply(
+        self,
+        version: int,
+        *,
+        upsert: Optional[Dict[str, Any]] = None,
+        remove: Optional[int] = None,
+    ) -> bool:
+        """
+        Применить одно изменение, если оно следует сразу за текущей версией.
+        Иначе индекс остаётся устаревшим и будет пересобран при обращении.
+        """
+        with self._lock:
+            if version != self.version + 1:
+                return False
+            if remove is not None:
+                self._remove(remove)
+            if upsert is not None:
+                self._upsert(upsert)
+            self.version = version
+            return True
+
+    def _matching_terms(self, token: str) -> Dict[str, float]:
+        """Слова индекса, похожие на слово запроса, с оценкой похожести."""
+        matches: Dict[str, float] = {}
+        if token in self._postings:
+            matches[token] = EXACT_SCORE
+
+        if len(token) >= MIN_PREFIX_LEN:
+            if self._sorted_terms is None:
+                self._sorted_terms = sorted(self._postings)
+            start = bisect.bisect_left(self._sorted_terms, token)
+            for term in self._sorted_terms[start:]:
+                if not term.startswith(token):
+                    break
+                matches.setdefault(term, PREFIX_SCORE)
+
+        token_grams = trigrams(token)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in token_grams:
+            for term in self._trigrams.get(gram, ()):
+                shared[term] += 1
+        for term, common in shared.items():
+            similarity = common / len(token_grams | trigrams(term))
+            if similarity >= TRIGRAM_THRESHOLD:
+                score = TRIGRAM_WEIGHT * similarity
+                if score > matches.get(term, 0.0):
+                    matches[term] = score
+        return matches
+
+    def _text_scores(self, query: str) -> Dict[int, float]:
+        tokens = query.split()
+        # Для каждого слова запроса — лучшая оценка по каждому месту
+        per_token: List[Dict[int, float]] = []
+        for token in tokens:
+            best: Dict[int, float] = {}
+            for term, similarity in self._matching_terms(token).items():
+                for place_id, weight in self._postings[term].items():
+                    score = similarity * weight
+                    if score > best.get(place_id, 0.0):
+                        best[place_id] = score
+            per_token.append(best)
+
+        scores: Dict[int, float] = defaultdict(float)
+        for best in per_token:
+            for place_id, score in best.items():
+                scores[place_id] += score / len(tokens)
+        return scores
+
+    def search(self, query: str, limit: int, *, listed_only: bool = False) -> List[PlaceHit]:
+        """
+        Места, подходящие под запрос, от лучших к худшим. ``listed_only`` —
+        только закреплённые и места с отзывами (до обрезки по ``limit``).
+        """
+        with self._lock:
+            text_scores: Dict[int, float] = {}
+            for position, variant in enumerate(query_variants(query)):
+                penalty = 1.0 if position == 0 else VARIANT_PENALTY
+                for place_id, score in self._text_scores(variant).items():
+                    score *= penalty
+                    if score > text_scores.get(place_id, 0.0):
+                        text_scores[place_id] = score
+
+            scorer = get_scorer()
+            hits = []
+            for place_id, text_score in text_scores.items():
+                if text_score < MIN_TEXT_SCORE:
+                    continue
+                doc = self._docs[place_id]
+                if listed_only and not doc["is_pinned"] and not doc["review_count"]:
+                    continue
+                rating = scorer.score(doc["avg_rating"], doc["review_count"]) / 5
+                hits.append(PlaceHit(
+                    id=place_id,
+                    name=doc["name"],
+                    address=doc["address"],
+                    is_pinned=doc["is_pinned"],
+                    review_count=doc["review_count"],
+                    score=text_score * (1 - RATING_WEIGHT + RATING_WEIGHT * rating),
+                ))
+        hits.sort(key=lambda hit: (-hit.score, hit.name))
+        return hits[:limit]
+
+
+def place_search_fields(place: Place) -> Dict[str, Any]:
+    """Поля документа из экземпляра модели (для точечного обновления)."""
+    return {name: getattr(place, name) for name in SEARCH_FIELDS}
+
+
+def build_place_index(city_id: int, version: int) -> PlaceSearchIndex:
+    index = PlaceSearchIndex(city_id, version)
+    for fields in Place.objects.filter(city_id=city_id).values(*SEARCH_FIELDS).iterator():
+        index._upsert(fields)  # pylint: disable=protected-access
+    return index
+
+
+_cache: LRUCache[PlaceSearchIndex] = LRUCache(
+    settings.PLACE_SEARCH_CACHE_MAX_ENTRIES,
+    weigher=lambda index: index.size,
+)
+
+
+async def get_place_index(city_id: int) -> PlaceSearchIndex:
+    key = versions.city_key(city_id)
+    version = versions.peek_version(key)
+    if version is None:
+        version = await run_db(versions.get_version, key)
+
+    index = _cache.get(city_id)
+    if index is None or index.version < version:
+        index = await run_db(build_place_index, city_id, version)
+        _cache.set(city_id, index)
+    return index
+
+
+async def search_places(
+    city_id: int, query: str, limit: int, *, listed_only: bool = False
+) -> List[PlaceHit]:
+    query = (query or "").strip()
+    if not query:
+        return []
+    index = await get_place_index(city_id)
+    return index.search(query, limit, listed_only=listed_only)
+
+
+def apply_change(
+    city_id: int,
+    version: int,
+    *,
+    upsert: Optional[Dict[str, Any]] = None,
+    remove: Optional[int] = None,
+) -> None:
+    """Точечно обновить индекс города, если он уже загружен."""
+    index = _cache.get(city_id)
+    if index is not None:
+        index.apply(version, upsert=upsert, remove=remove)
+        # Индекс изменился на месте — пересчитать его вес в кэше
+        _cache.set(city_id, index)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
+
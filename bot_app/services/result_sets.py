@@ -0,0 +1,61 @@
+"""
+Списки результатов (id найденных мест, топики гайдов) на стороне сервера.
+
+В FSM пользователя хранится только id списка и текущая позиция, а сам
+список — в таблице ``ResultSet`` (общей для процессов, переживает
+перезапуск) и в LRU-кэше процесса. Списки удаляются через
+``RESULT_SET_TTL`` секунд после создания.
+"""
+
+from datetime import timedelta
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from bot_app.models import ResultSet
+from bot_app.services.db import run_db
+from bot_app.utils.cache import LRUCache
+
+_cache: LRUCache[List[Any]] = LRUCache(
+    settings.RESULT_SET_CACHE_MAX_ENTRIES, ttl=settings.RESULT_SET_TTL)
+
+
+def _create(kind: str, items: List[Any]) -> int:
+    expires_at = timezone.now() + timedelta(seconds=settings.RESULT_SET_TTL)
+    return ResultSet.objects.create(kind=kind, items=items, expires_at=expires_at).pk
+
+
+def _load(handle: int) -> Optional[List[Any]]:
+    return (
+        ResultSet.objects.filter(pk=handle, expires_at__gt=timezone.now())
+        .values_list("items", flat=True)
+        .first()
+    )
+
+
+async def create_result_set(kind: str, items: List[Any]) -> int:
+    handle = await run_db(_create, kind, items)
+    _cache.set(handle, items)
+    return handle
+
+
+async def get_result_set(handle: Any) -> Optional[List[Any]]:
+    """Список по id или None, если он истёк (или в FSM осталось старое значение)."""
+    if not isinstance(handle, int):
+        return None
+    items = _cache.get(handle)
+    if items is None:
+        items = await run_db(_load, handle)
+        if items is not None:
+            _cache.set(handle, items)
+    return items
+
+
+def purge_expired() -> int:
+    deleted, _ = ResultSet.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,239 @@
+"""
+Локальный поиск по местам и гайдам города для контекста AI-помощника.
+
+Для каждого города строится BM25-индекс по названию, категории, адресу
+и ai_summary мест и по теме, категории и тексту гайдов. В промпт уходят
+только документы, подходящие под вопрос, в пределах бюджета токенов.
+Индекс обновляется точечно сигналами моделей (см. ``bot_app.signals``).
+"""
+
+import math
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from bot_app.models import Guide, Place
+from bot_app.utils.text import tokenize
+
+DocKey = Tuple[str, int]
+
+GUIDE_SNIPPET_CHARS = 300
+# Грубая оценка: кириллица ≈ 3 символа на токен
+CHARS_PER_TOKEN = 3
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._docs: Dict[Hashable, Tuple[Counter, int]] = {}
+        self._postings: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def upsert(self, key: Hashable, tokens: List[str]) -> None:
+        self.remove(key)
+        tf = Counter(tokens)
+        self._docs[key] = (tf, len(tokens))
+        self._total_len += len(tokens)
+        for term in tf:
+            self._postings[term].add(key)
+
+    def remove(self, key: Hashable) -> None:
+        entry = self._docs.pop(key, None)
+        if entry is None:
+            return
+        tf, length = entry
+        self._total_len -= length
+        for term in tf:
+            keys = self._postings.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[term]
+
+    def search(self, query_tokens: List[str], limit: int) -> List[Tuple[Hashable, float]]:
+        if not self._docs:
+            return []
+        total = len(self._docs)
+        avg_len = self._total_len / total or 1.0
+        scores: Dict[Hashable, float] = defaultdict(float)
+        for term in set(query_tokens):
+            keys = self._postings.get(term)
+            if not keys:
+                continue
+            idf = math.log(1 + (total - len(keys) + 0.5) / (len(keys) + 0.5))
+            for key in keys:
+                tf, length = self._docs[key]
+                freq = tf[term]
+                norm = freq + self.k1 * (1 - self.b + self.b * length / avg_len)
+                scores[key] += idf * freq * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+
+def _place_tokens(fields: Dict[str, Any]) -> List[str]:
+    # Название и категория весят больше адреса и саммари
+    return (
+        tokenize(fields["name"]) * 3
+        + tokenize(fields.get("category__name") or "") * 2
+        + tokenize(fields["address"])
+        + tokenize(fields.get("ai_summary") or "")
+    )
+
+
+def _render_place(fields: Dict[str, Any]) -> str:
+    place_info = f"• {fields['name']}"
+    place_info += f"\n  Адрес: {fields['address']}"
+    if fields.get("avg_rating"):
+        place_info += f"\n  Рейтинг: {fields['avg_rating']:.1f}/5 ({fields['review_count']} отзывов)"
+    if fields.get("average_price") and fields["average_price"] > 0:
+        place_info += f"\n  Средний чек: ~{fields['average_price']} ₸"
+    if fields.get("ai_summary"):
+        place_info += f"\n  Отзывы: {fields['ai_summary']}"
+    return place_info + "\n"
+
+
+def _guide_tokens(fields: Dict[str, Any]) -> List[str]:
+    return (
+        tokenize(fields["topic"]) * 3
+        + tokenize(fields.get("category__name") or "") * 2
+        + tokenize(fields["content"])
+    )
+
+
+def _render_guide(fields: Dict[str, Any]) -> str:
+    guide_info = f"- {fields['topic']}"
+    if fields.get("category__name"):
+        guide_info += f" ({fields['category__name']})"
+    content = fields["content"]
+    guide_info += (
+        f"\n  {content[:GUIDE_SNIPPET_CHARS]}..."
+        if len(content) > GUIDE_SNIPPET_CHARS
+        else f"\n  {content}"
+    )
+    return guide_info + "\n"
+
+
+PLACE_FIELDS = ("id", "name", "address", "ai_summary", "avg_rating",
+                "review_count", "average_price", "category__name")
+GUIDE_FIELDS = ("id", "topic", "content", "category__name")
+
+
+def place_fields(place: Place) -> Dict[str, Any]:
+    """Поля документа из экземпляра модели (для точечного обновления)."""
+    fields = {name: getattr(place, name) for name in PLACE_FIELDS[:-1]}
+    fields["category__name"] = place.category.name if place.category_id else None
+    return fields
+
+
+def guide_fields(guide: Guide) -> Dict[str, Any]:
+    fields = {name: getattr(guide, name) for name in GUIDE_FIELDS[:-1]}
+    fields["category__name"] = guide.category.name if guide.category_id else None
+    return fields
+
+
+class CityIndex:
+    """Индекс документов одного города с версией данных, по которой он собран."""
+
+    def __init__(self, city_id: int, version: int) -> None:
+        self.city_id = city_id
+        self.version = version
+        self.size_chars = 0
+        self._bm25 = BM25Index()
+        self._docs: Dict[DocKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _upsert(self, kind: str, fields: Dict[str, Any]) -> None:
+        key = (kind, fields["id"])
+        self._remove(key)
+        if kind == "place":
+            tokens, text = _place_tokens(fields), _render_place(fields)
+            prior = (fields.get("avg_rating") or 0) * \
+                math.log1p(fields.get("review_count") or 0)
+            group = fields.get("category__name") or "Без категории"
+        else:
+            tokens, text = _guide_tokens(fields), _render_guide(fields)
+            prior, group = 0.0, None
+        self._bm25.upsert(key, tokens)
+        self._docs[key] = {"text": text, "prior": prior, "group": group}
+        self.size_chars += len(text)
+
+    def _remove(self, key: DocKey) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is not None:
+            self.size_chars -= len(doc["text"])
+            self._bm25.remove(key)
+
+    def apply(
+        self,
+        version: int,
+        *,
+        upsert: Optional[Tuple[str, Dict[str, Any]]] = None,
+        remove: Optional[DocKey] = None,
+    ) -> bool:
+        """
+        Применить одно изменение, если оно следует сразу за текущей версией.
+        Иначе индекс остаётся устаревшим и будет пересобран при обращении.
+        """
+        with self._lock:
+            if version != self.version + 1:
+                return False
+            if remove is not None:
+                self._remove(remove)
+            if upsert is not None:
+                self._upsert(*upsert)
+            self.version = version
+            return True
+
+    def render_context(self, query: str, *, top_k: int, token_budget: int) -> str:
+        with self._lock:
+            hits = [key for key, _ in self._bm25.search(tokenize(query), top_k)]
+            if len(hits) < top_k:
+                # Дополняем лучшими местами города — пригодится для общих вопросов
+                chosen = set(hits)
+                fallback = sorted(
+                    (key for key, doc in self._docs.items()
+                     if key[0] == "place" and key not in chosen and doc["prior"] > 0),
+                    key=lambda key: self._docs[key]["prior"],
+                    reverse=True,
+                )
+                hits.extend(fallback[: top_k - len(hits)])
+
+            budget = token_budget * CHARS_PER_TOKEN
+            places: Dict[str, List[str]] = defaultdict(list)
+            guides: List[str] = []
+            for key in hits:
+                doc = self._docs[key]
+                if len(doc["text"]) > budget:
+                    continue
+                budget -= len(doc["text"])
+                if key[0] == "place":
+                    places[doc["group"]].append(doc["text"])
+                else:
+                    guides.append(doc["text"])
+
+        context_parts = []
+        if places:
+            context_parts.append(
+                "=== МЕСТА В ГОРОДЕ (ИСПОЛЬЗУЙ ТОЛЬКО ЭТИ РЕАЛЬНЫЕ МЕСТА) ===\n")
+            context_parts.append(
+                "ВАЖНО: Используй ТОЧНЫЕ названия и адреса из этого списка. Не выдумывай места!\n\n")
+            for category_name, texts in places.items():
+                context_parts.append(f"\n--- {category_name} ---\n")
+                context_parts.extend(texts)
+        if guides:
+            context_parts.append("\n=== ГАЙДЫ ===\n")
+            context_parts.extend(guides)
+        return "\n".join(context_parts)
+
+
+def build_city_index(city_id: int, version: int) -> CityIndex:
+    index = CityIndex(city_id, version)
+    for fields in Place.objects.filter(city_id=city_id).values(*PLACE_FIELDS).iterator():
+        index._upsert("place", fields)  # pylint: disable=protected-access
+    for fields in Guide.objects.filter(city_id=city_id).values(*GUIDE_FIELDS).iterator():
+        index._upsert("guide", fields)  # pylint: disable=protected-access
+    return index
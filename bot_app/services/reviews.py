@@ -0,0 +1,220 @@
+"""
+Модерация отзывов: публикация, отклонение и фоновые задачи вокруг них.
+"""
+
+import html
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from django.db import transaction
+from django.db.models import F as DjangoF
+from django.utils import timezone
+
+from bot_app.keyboards.main import main_menu_keyboard
+from bot_app.models import Place, Review, ReviewPhoto, User
+from bot_app.services import aggregates
+from bot_app.services.ai_service import analyze_review_async, update_place_summary
+from bot_app.services.balances import balances_changed
+from bot_app.services.db import run_db
+from bot_app.services.jobs import enqueue_job, register_job
+from bot_app.services.summaries import schedule_place_summary
+
+logger = logging.getLogger(__name__)
+
+REVIEW_REWARD = 10
+
+
+def add_review_photos(reviews: Iterable[Review]) -> None:
+    """Добавить фото публикуемых отзывов в ленту фото мест."""
+    now = timezone.now()
+    photos = [
+        ReviewPhoto(review_id=review.id, place_id=review.place_id,
+                    file_id=file_id, created_at=now)
+        for review in reviews
+        # Новее = больший id, поэтому фото отзыва кладём в обратном порядке
+        for file_id in reversed(list(review.photo_ids or []))
+    ]
+    ReviewPhoto.objects.bulk_create(photos)
+
+
+@transaction.atomic
+def change_reviews_status(review_ids: Iterable[int], new_status: str) -> List[Review]:
+    """
+    Единая точка смены статуса отзывов (бот, админка, массовые действия).
+
+    - агрегаты мест меняются одним UPDATE на место, если отзыв входит
+      в публикацию или выходит из неё;
+    - награда начисляется при первой публикации отзыва;
+    - автор получает уведомление о первом решении модерации;
+    - AI-саммари затронутых мест обновляется фоновой задачей.
+
+    Возвращает отзывы, статус которых действительно изменился.
+    """
+    reviews = list(
+        Review.objects.select_for_update()
+        .filter(id__in=list(review_ids))
+        .exclude(status=new_status)
+        .order_by("id")
+    )
+    if not reviews:
+        return []
+    Review.objects.filter(id__in=[review.id for review in reviews]).update(status=new_status)
+
+    published = Review.Status.PUBLISHED
+    if new_status == published:
+        aggregates.apply_reviews(reviews, sign=1)
+        add_review_photos(reviews)
+    else:
+        unpublished = [review for review in reviews if review.status == published]
+        aggregates.apply_reviews(unpublished, sign=-1)
+        ReviewPhoto.objects.filter(review__in=unpublished).delete()
+
+    rewards: Counter = Counter()
+    rewarded: List[int] = []
+    places: Set[int] = set()
+    for review in reviews:
+        previous = review.status
+        review.status = new_status
+        if new_status == published and not review.is_rewarded:
+            rewards[review.user_id] += REVIEW_REWARD
+            rewarded.append(review.id)
+        if previous == Review.Status.PENDING:
+            enqueue_job(
+                "notify_review_result",
+                {"review_id": review.id},
+                key=f"notify_review:{review.id}",
+            )
+        if published in (previous, new_status):
+            places.add(review.place_id)
+
+    Review.objects.filter(id__in=rewarded).update(is_rewarded=True)
+    for user_id, reward in rewards.items():
+        User.objects.filter(telegram_id=user_id).update(
+            balance_requests=DjangoF("balance_requests") + reward,
+            reputation_points=DjangoF("reputation_points") + reward,
+            ai_requests_balance=DjangoF("ai_requests_balance") + reward,
+        )
+        transaction.on_commit(lambda user_id=user_id: balances_changed(user_id))
+    for place_id in places:
+        schedule_place_summary(place_id)
+    return reviews
+
+
+def change_review_status(review_id: int, new_status: str) -> bool:
+    return bool(change_reviews_status([review_id], new_status))
+
+
+@transaction.atomic
+def save_review(review: Review) -> None:
+    """
+    Сохранить правку отзыва (админка). Если у опубликованного отзыва
+    изменились оценка, цена или место, агрегаты мест поправляются на разницу.
+    """
+    previous = Review.objects.select_for_update().filter(id=review.id).first()
+    review.save()
+    if previous is None or previous.status != Review.Status.PUBLISHED:
+        return
+    fields = ("rating", "price", "place_id")
+    if all(getattr(previous, name) == getattr(review, name) for name in fields):
+        return
+    aggregates.apply_reviews([previous], sign=-1)
+    aggregates.apply_reviews([review], sign=1)
+    if previous.place_id != review.place_id:
+        schedule_place_summary(previous.place_id)
+        schedule_place_summary(review.place_id)
+
+
+@transaction.atomic
+def delete_reviews(review_ids: Iterable[int]) -> int:
+    """Удалить отзывы, убрав опубликованные из агрегатов мест."""
+    reviews = list(Review.objects.select_for_update().filter(id__in=list(review_ids)))
+    published = [review for review in reviews if review.status == Review.Status.PUBLISHED]
+    aggregates.apply_reviews(published, sign=-1)
+    Review.objects.filter(id__in=[review.id for review in reviews]).delete()
+    for place_id in {review.place_id for review in published}:
+        schedule_place_summary(place_id)
+    return len(reviews)
+
+
+@transaction.atomic
+def publish_review(review_id: int, summary: str) -> bool:
+    """Опубликовать отзыв с модерации. Повторный вызов ничего не делает."""
+    review = Review.objects.select_for_update().get(id=review_id)
+    if review.status != Review.Status.PENDING:
+        return False
+    if summary:
+        Place.objects.filter(id=review.place_id).update(ai_summary=summary)
+    return change_review_status(review_id, Review.Status.PUBLISHED)
+
+
+@transaction.atomic
+def reject_review(review_id: int) -> bool:
+    """Отклонить отзыв на модерации или снять с публикации опубликованный."""
+    return change_review_status(review_id, Review.Status.REJECTED)
+
+
+def _get_pending_review_text(review_id: int) -> Optional[str]:
+    return (
+        Review.objects.filter(id=review_id, status=Review.Status.PENDING)
+        .values_list("text", flat=True)
+        .first()
+    )
+
+
+def _get_review_outcome(review_id: int) -> Optional[Dict[str, Any]]:
+    return (
+        Review.objects.filter(id=review_id)
+        .values("user_id", "status", "place__name")
+        .first()
+    )
+
+
+@register_job("moderate_review")
+async def moderate_review(bot: Bot, payload: Dict[str, Any]) -> None:
+    review_id = payload["review_id"]
+    text = await run_db(_get_pending_review_text, review_id)
+    if text is None:
+        # Уже промодерирован (например, задача повторилась после перезапуска)
+        return
+
+    analysis = await analyze_review_async(text)
+    logger.info("AI moderation for review_id=%s: %s", review_id, analysis)
+    if analysis.get("is_spam"):
+        await run_db(reject_review, review_id)
+    else:
+        await run_db(publish_review, review_id, analysis.get("summary", ""))
+
+
+@register_job("notify_review_result")
+async def notify_review_result(bot: Bot, payload: Dict[str, Any]) -> None:
+    outcome = await run_db(_get_review_outcome, payload["review_id"])
+    if not outcome:
+        return
+
+    place_name = html.escape(outcome["place__name"])
+    if outcome["status"] == Review.Status.PUBLISHED:
+        text = (
+            f"Спасибо! Отзыв о <b>{place_name}</b> опубликован. "
+            f"Вам начислено {REVIEW_REWARD} запросов к AI-помощнику."
+        )
+    elif outcome["status"] == Review.Status.REJECTED:
+        text = f"Отзыв о <b>{place_name}</b> выглядит как спам, поэтому он не был опубликован."
+    else:
+        return
+
+    try:
+        await bot.send_message(outcome["user_id"], text, reply_markup=main_menu_keyboard())
+    except (TelegramForbiddenError, TelegramBadRequest) as exc:
+        # Пользователь заблокировал бота или чат недоступен — повторять бессмысленно
+        logger.info("Cannot notify user %s: %s", outcome["user_id"], exc)
+
+
+@register_job("refresh_place_summary")
+async def refresh_place_summary(bot: Bot, payload: Dict[str, Any]) -> None:
+    place_id = payload["place_id"]
+    updated = await update_place_summary(place_id)
+    logger.info("Place #%s summary %s", place_id,
+                "regenerated" if updated else "unchanged, skipped")
@@ -0,0 +1,116 @@
+"""
+Сборка процесса бота: Bot, Dispatcher и фоновые сервисы.
+
+Используется ``runbot`` в обычном режиме и каждым воркером
+``runbot --workers N`` (``services.sharding``).
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseEventIsolation
+from django.conf import settings
+
+
+def create_bot(token: str, *, global_rate: Optional[float] = None) -> Bot:
+    """Бот с планировщиком отправок; ``global_rate`` — доля общего лимита процесса."""
+    from bot_app.services import outbound
+
+    session = None
+    if settings.TELEGRAM_API_SERVER:
+        session = AiohttpSession(
+            api=TelegramAPIServer.from_base(settings.TELEGRAM_API_SERVER))
+    bot = Bot(
+        token=token,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    outbound.install(bot, global_rate)
+    return bot
+
+
+def build_dispatcher(isolation: Optional[BaseEventIsolation] = None) -> Dispatcher:
+    from bot_app.handlers import get_bot_router
+    from bot_app.middlewares import setup_middlewares
+    from bot_app.services.fsm_storage import create_events_isolation, create_storage
+
+    storage = create_storage()
+    dp = Dispatcher(
+        storage=storage,
+        events_isolation=create_events_isolation(storage, inner=isolation),
+    )
+    setup_middlewares(dp)
+    dp.include_router(get_bot_router())
+    return dp
+
+
+@asynccontextmanager
+async def background_services(
+    bot: Bot, *, purge: bool = True, recover_jobs: bool = True, ledger: bool = True
+) -> AsyncIterator[None]:
+    """
+    Пул задач, журнал балансов, метрики и очистка; при выходе — остановка
+    по порядку. ``ledger=False`` — списывать балансы в режиме strict.
+    """
+    from bot_app.services import db
+    from bot_app.services.ai_service import close_async_client
+    from bot_app.services.balances import get_ledger
+    from bot_app.services.jobs import JobWorkerPool
+
+    job_pool = JobWorkerPool(bot, recover_on_start=recover_jobs)
+    await job_pool.start()
+    balance_ledger = get_ledger()
+    if ledger and settings.BALANCE_MODE == "ledger":
+        balance_ledger.start()
+    tasks = [asyncio.create_task(_log_db_metrics())]
+    if purge:
+        tasks.append(asyncio.create_task(_purge_expired_records()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await job_pool.stop()
+        # Записать накопленные списания до остановки пула БД
+        await balance_ledger.stop()
+        await close_async_client()
+        await asyncio.to_thread(db.shutdown_executor)
+
+
+async def _log_db_metrics() -> None:
+    from bot_app.middlewares import chat_lanes
+    from bot_app.services import db, outbound
+
+    interval = settings.DB_METRICS_LOG_INTERVAL
+    if interval <= 0:
+        return
+    db_logger = logging.getLogger("bot_app.db")
+    while True:
+        await asyncio.sleep(interval)
+        db_logger.info("DB executor: %s", db.stats.snapshot())
+        chat_lanes.logger.info("Chat lanes: %s", chat_lanes.stats.snapshot())
+        outbound.logger.info("Outbound: %s", outbound.stats.snapshot())
+
+
+async def _purge_expired_records() -> None:
+    from bot_app.services import fsm_storage, result_sets
+    from bot_app.services.db import run_db
+
+    fsm_logger = logging.getLogger("bot_app.fsm")
+    while True:
+        await asyncio.sleep(settings.FSM_PURGE_INTERVAL)
+        for purge in (fsm_storage.purge_expired, result_sets.purge_expired):
+            try:
+                deleted = await run_db(purge)
+            except Exception:  # pylint: disable=broad-except
+                fsm_logger.exception("Failed to purge expired records (%s)", purge.__module__)
+            else:
+                if deleted:
+                    fsm_logger.info("Purged %s expired records (%s)", deleted, purge.__module__)
@@ -0,0 +1,448 @@
+"""
+Несколько процессов бота за одним приёмом апдейтов (``runbot --workers N``).
+
+Родительский процесс только принимает апдейты (вебхук или getUpdates) и
+раскладывает их по очередям воркеров: ``chat_id % N``. Все апдейты одного
+чата попадают в один процесс и обрабатываются в нём строго по очереди
+(``ChatLanesMiddleware``), разные чаты — параллельно на разных ядрах. Поэтому кэши процесса
+(пользователи, журнал балансов, ``FSM_STORAGE=memory``) остаются
+согласованными: пользователь всегда обслуживается одним воркером.
+
+Воркер раз в ``BOT_WORKER_METRICS_INTERVAL`` секунд отправляет родителю
+метрики, они же служат пульсом. Упавший или зависший воркер (нет пульса
+``BOT_WORKER_HEARTBEAT_TIMEOUT`` секунд) перезапускается с нарастающей
+задержкой; апдейты из его очереди сохраняются.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import statistics
+import time
+from hmac import compare_digest
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiohttp import web
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Что лежит в очереди воркера: (время постановки, апдейт); None — остановка
+QueueItem = Optional[Tuple[float, Dict[str, Any]]]
+
+MAX_RESTART_DELAY = 30.0
+
+
+def chat_id_of(update: Dict[str, Any]) -> Optional[int]:
+    """Чат (или пользователь, если чата нет) апдейта в виде словаря Bot API."""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        for path in (("chat",), ("message", "chat"), ("from",), ("user",)):
+            value: Any = event
+            for part in path:
+                value = value.get(part) if isinstance(value, dict) else None
+            if isinstance(value, dict) and isinstance(value.get("id"), int):
+                return value["id"]
+    return None
+
+
+def shard_for(update: Dict[str, Any], workers: int) -> int:
+    chat_id = chat_id_of(update)
+    if chat_id is None:
+        # Опросы и т.п. без чата: порядок не важен, раскладываем по update_id
+        chat_id = int(update.get("update_id") or 0)
+    return chat_id % workers
+
+
+class _Worker:
+    def __init__(self, index: int, ctx) -> None:
+        self.index = index
+        self.queue = ctx.Queue(settings.BOT_WORKER_QUEUE_SIZE)
+        self.lock = asyncio.Lock()
+        self.process = None
+        self.started_at = 0.0
+        self.heartbeat = 0.0
+        self.restarts = 0
+        self.next_start = 0.0
+        self.metrics: Dict[str, Any] = {}
+        self.submitted = 0
+
+
+class Supervisor:
+    """Процессы-воркеры, их очереди, пульс и перезапуск."""
+
+    def __init__(self, token: str, workers: int) -> None:
+        self.token = token
+        self._ctx = multiprocessing.get_context("spawn")
+        self._metrics_queue = self._ctx.Queue()
+        self._workers = [_Worker(index, self._ctx) for index in range(workers)]
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    async def start(self) -> None:
+        """Запустить воркеры и дождаться первого пульса каждого (готовности)."""
+        for worker in self._workers:
+            self._spawn(worker)
+        deadline = time.monotonic() + settings.BOT_WORKER_HEARTBEAT_TIMEOUT
+        # Упавший при старте воркер перезапустит монитор, его не ждём
+        while any(
+            not worker.metrics and worker.process.is_alive() for worker in self._workers
+        ):
+            if time.monotonic() > deadline:
+                logger.warning("Not all bot workers reported ready, starting intake anyway")
+                break
+            await asyncio.sleep(0.2)
+            self._read_metrics()
+        self._monitor_task = asyncio.create_task(self._monitor(), name="bot-supervisor")
+
+    def _spawn(self, worker: _Worker) -> None:
+        worker.process = self._ctx.Process(
+            target=worker_main,
+            args=(worker.index, len(self._workers), self.token, worker.queue,
+                  self._metrics_queue),
+            name=f"bot-worker-{worker.index}",
+            daemon=False,
+        )
+        worker.process.start()
+        worker.started_at = worker.heartbeat = time.monotonic()
+        logger.info("Started bot worker %s (pid %s)", worker.index, worker.process.pid)
+
+    async def submit(self, update: Dict[str, Any], timeout: Optional[float] = None) -> None:
+        """Поставить апдейт воркеру его чата; ``queue.Full``, если очередь не освободилась."""
+        worker = self._workers[shard_for(update, len(self._workers))]
+        item: QueueItem = (time.time(), update)
+        # Блокировка сохраняет порядок апдейтов, ждущих места в одной очереди
+        async with worker.lock:
+            try:
+                worker.queue.put_nowait(item)
+            except queue.Full:
+                await asyncio.to_thread(worker.queue.put, item, True, timeout)
+        worker.submitted += 1
+
+    async def _monitor(self) -> None:
+        last_log = time.monotonic()
+        while not self._stopping:
+            await asyncio.sleep(1)
+            self._read_metrics()
+            now = time.monotonic()
+            for worker in self._workers:
+                await self._check(worker, now)
+            interval = settings.DB_METRICS_LOG_INTERVAL
+            if interval > 0 and now - last_log >= interval:
+                last_log = now
+                for worker in self._workers:
+                    logger.info("Bot worker %s: %s", worker.index, self._worker_stats(worker))
+
+    def _read_metrics(self) -> None:
+        while True:
+            try:
+                metrics = self._metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+            worker = self._workers[metrics["worker"]]
+            if worker.process is not None and metrics["pid"] == worker.process.pid:
+                worker.metrics = metrics
+                worker.heartbeat = time.monotonic()
+
+    async def _check(self, worker: _Worker, now: float) -> None:
+        process = worker.process
+        if process is not None and process.is_alive():
+            if now - worker.heartbeat < settings.BOT_WORKER_HEARTBEAT_TIMEOUT:
+                return
+            logger.error("Bot worker %s (pid %s) missed heartbeats for %.0fs, terminating",
+                         worker.index, process.pid, now - worker.heartbeat)
+            await asyncio.to_thread(_terminate, process)
+        if process is not None:
+            logger.error("Bot worker %s (pid %s) exited with code %s",
+                         worker.index, process.pid, process.exitcode)
+            worker.process = None
+            # Долго проработавший воркер перезапускается сразу
+            if now - worker.started_at > MAX_RESTART_DELAY * 2:
+                worker.restarts = 0
+            delay = min(2 ** worker.restarts, MAX_RESTART_DELAY)
+            worker.next_start = now + delay
+            worker.restarts += 1
+            async with worker.lock:
+                await asyncio.to_thread(self._replace_queue, worker)
+        if now >= worker.next_start:
+            self._spawn(worker)
+
+    def _replace_queue(self, worker: _Worker) -> None:
+        """Новая очередь вместо старой: упавший процесс мог оставить её замок занятым."""
+        old, worker.queue = worker.queue, self._ctx.Queue(settings.BOT_WORKER_QUEUE_SIZE)
+        moved = 0
+        while True:
+            try:
+                item = old.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                worker.queue.put(item)
+                moved += 1
+        lost = _qsize(old)
+        if lost:
+            logger.error("Lost %s queued updates of bot worker %s", lost, worker.index)
+        elif moved:
+            logger.info("Moved %s queued updates to restarted bot worker %s", moved, worker.index)
+        old.close()
+        old.cancel_join_thread()
+
+    async def stop(self) -> None:
+        """Дождаться обработки принятых апдейтов и остановить воркеры."""
+        self._stopping = True
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            await asyncio.gather(self._monitor_task, return_exceptions=True)
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                await asyncio.to_thread(worker.queue.put, None)
+        await asyncio.to_thread(self._join_all)
+
+    def _join_all(self) -> None:
+        deadline = time.monotonic() + settings.BOT_WORKER_STOP_TIMEOUT
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning("Bot worker %s did not stop in time, terminating", worker.index)
+                _terminate(worker.process)
+
+    def _worker_stats(self, worker: _Worker) -> Dict[str, Any]:
+        stats = {
+            key: value for key, value in worker.metrics.items()
+            if key not in ("worker", "pid", "sent_at")
+        }
+        stats.update(
+            pid=worker.process.pid if worker.process is not None else None,
+            alive=bool(worker.process is not None and worker.process.is_alive()),
+            queued=_qsize(worker.queue),
+            submitted=worker.submitted,
+            restarts=worker.restarts,
+        )
+        return stats
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [self._worker_stats(worker) for worker in self._workers]
+
+
+def _terminate(process) -> None:
+    process.terminate()
+    process.join(5)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+def _qsize(q) -> Optional[int]:
+    try:
+        return q.qsize()
+    except NotImplementedError:  # macOS
+        return None
+
+
+# --- Приём апдейтов в родительском процессе ---
+
+
+async def serve_sharded_webhook(supervisor: Supervisor, bot: Bot, allowed_updates: List[str]) -> None:
+    """Вебхук, раскладывающий апдейты по воркерам; ``/healthz`` — их состояние."""
+    draining = False
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if draining:
+            return web.Response(status=503, text="Shutting down")
+        secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not compare_digest(secret, settings.WEBHOOK_SECRET):
+            return web.Response(status=401, text="Unauthorized")
+        update = await request.json()
+        try:
+            await supervisor.submit(update, timeout=settings.WEBHOOK_DRAIN_TIMEOUT)
+        except queue.Full:
+            # Telegram повторит апдейт позже
+            return web.Response(status=503, text="Workers are busy")
+        return web.json_response({})
+
+    async def health(request: web.Request) -> web.Response:
+        workers = supervisor.stats()
+        status = 200 if all(worker["alive"] for worker in workers) else 503
+        return web.json_response({"workers": workers}, status=status)
+
+    app = web.Application()
+    app.router.add_post(settings.WEBHOOK_PATH, handle_update)
+    app.router.add_get("/healthz", health)
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    await web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT).start()
+    logger.info("Webhook server listening on %s:%s%s (%s workers)",
+                settings.WEBHOOK_HOST, settings.WEBHOOK_PORT, settings.WEBHOOK_PATH,
+                len(supervisor))
+
+    if settings.WEBHOOK_URL:
+        await bot.set_webhook(
+            url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET,
+            allowed_updates=allowed_updates,
+            max_connections=min(100, settings.WEBHOOK_MAX_CONCURRENT_UPDATES),
+        )
+    try:
+        await _wait_for_signal()
+    finally:
+        draining = True
+        await runner.cleanup()
+
+
+async def poll_updates(supervisor: Supervisor, bot: Bot, allowed_updates: List[str]) -> None:
+    """getUpdates в родителе; offset подтверждается только после постановки в очереди."""
+    await bot.delete_webhook(drop_pending_updates=True)
+    logger.info("Polling updates for %s workers", len(supervisor))
+
+    async def poll() -> None:
+        offset = None
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=30, allowed_updates=allowed_updates)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.warning("getUpdates failed, retrying in 5s: %s", exc)
+                await asyncio.sleep(5)
+                continue
+            for update in updates:
+                await supervisor.submit(
+                    update.model_dump(mode="json", exclude_none=True, by_alias=True))
+                offset = update.update_id + 1
+
+    poller = asyncio.create_task(poll(), name="bot-poller")
+    try:
+        await _wait_for_signal()
+    finally:
+        poller.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+
+
+async def _wait_for_signal() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+
+
+# --- Процесс-воркер ---
+
+
+def worker_main(index: int, workers: int, token: str, updates, metrics) -> None:
+    """Точка входа процесса-воркера (multiprocessing, spawn)."""
+    # Останавливает родитель: сигналы терминала и systemd идут всей группе
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django  # pylint: disable=import-outside-toplevel
+
+    django.setup()
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s | %(levelname)s | worker-{index} | %(name)s | %(message)s",
+    )
+    asyncio.run(_worker(index, workers, token, updates, metrics))
+
+
+async def _worker(index: int, workers: int, token: str, updates, metrics) -> None:
+    from bot_app.middlewares import chat_lanes
+    from bot_app.services import outbound
+    from bot_app.services.runtime import background_services, build_dispatcher, create_bot
+
+    parent = os.getppid()
+    # Общий лимит отправок бота делится между воркерами поровну
+    bot = create_bot(token, global_rate=settings.OUTBOUND_GLOBAL_RATE / workers)
+    dp = build_dispatcher()
+    slots = asyncio.Semaphore(settings.BOT_WORKER_CONCURRENCY)
+    tasks = set()
+    counters = {"processed": 0, "failed": 0}
+    waits: List[float] = []
+
+    async def process(update: Dict[str, Any]) -> None:
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception:  # pylint: disable=broad-except
+            counters["failed"] += 1
+            logger.exception("Update %s processing failed", update.get("update_id"))
+        else:
+            counters["processed"] += 1
+
+    def done(task: asyncio.Task) -> None:
+        tasks.discard(task)
+        slots.release()
+
+    def report() -> None:
+        metrics.put({
+            "worker": index,
+            "pid": os.getpid(),
+            "sent_at": time.time(),
+            "processed": counters["processed"],
+            "failed": counters["failed"],
+            "in_flight": len(tasks),
+            "queue_wait_p50_ms": round(statistics.median(waits) * 1000, 1) if waits else 0.0,
+            "queue_wait_max_ms": round(max(waits) * 1000, 1) if waits else 0.0,
+            "chat_lanes": chat_lanes.stats.snapshot(),
+            "outbound": outbound.stats.snapshot(),
+        })
+        waits.clear()
+
+    async def heartbeat() -> None:
+        while True:
+            report()
+            await asyncio.sleep(settings.BOT_WORKER_METRICS_INTERVAL)
+
+    # Журнал балансов живёт в памяти процесса, а апдейты одного пользователя
+    # (личка и группы) попадают в разные воркеры — списываем в strict
+    async with background_services(bot, purge=index == 0, recover_jobs=False, ledger=False):
+        await dp.emit_startup(bot=bot, bots=[bot], dispatcher=dp)
+        heartbeat_task = asyncio.create_task(heartbeat())
+        logger.info("Bot worker %s ready (pid %s)", index, os.getpid())
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    item = await asyncio.to_thread(updates.get, True, 1.0)
+                except queue.Empty:
+                    slots.release()
+                    if os.getppid() != parent:
+                        logger.error("Parent process is gone, stopping")
+                        break
+                    continue
+                if item is None:
+                    slots.release()
+                    break
+                enqueued_at, update = item
+                waits.append(max(0.0, time.time() - enqueued_at))
+                # Порядок апдейтов чата сохраняет ChatLanesMiddleware: задачи
+                # доходят до него в порядке создания
+                task = asyncio.create_task(process(update))
+                tasks.add(task)
+                task.add_done_callback(done)
+
+            if tasks:
+                logger.info("Draining %s in-flight updates", len(tasks))
+                _, pending = await asyncio.wait(
+                    set(tasks), timeout=settings.BOT_WORKER_STOP_TIMEOUT)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            heartbeat_task.cancel()
+            report()
+            await dp.emit_shutdown(bot=bot, bots=[bot], dispatcher=dp)
+            await dp.storage.close()
+            await bot.session.close()
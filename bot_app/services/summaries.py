@@ -0,0 +1,27 @@
+"""
+Отложенная и склеенная перегенерация ai_summary мест.
+
+Публикация отзыва ставит задачу ``refresh_place_summary`` с задержкой
+``PLACE_SUMMARY_DEBOUNCE_SECONDS`` и ключом места. Пока задача ждёт
+запуска, новые запросы по месту склеиваются с ней, поэтому все
+публикации окна обслуживаются одной генерацией; запрос во время
+генерации повторяет её после завершения, но не параллельно. Окно держит
+очередь задач, а не воркер: воркеры пула в это время свободны, и склейка
+работает между процессами.
+"""
+
+from django.conf import settings
+
+from bot_app.models import Job
+from bot_app.services.jobs import enqueue_job
+
+
+def schedule_place_summary(place_id: int) -> Job:
+    """Пометить место грязным (синхронно, вызывать из потока БД)."""
+    return enqueue_job(
+        "refresh_place_summary",
+        {"place_id": place_id},
+        key=f"summary:{place_id}",
+        delay=settings.PLACE_SUMMARY_DEBOUNCE_SECONDS,
+        coalesce=True,
+    )
@@ -0,0 +1,55 @@
+"""
+Пользователь бота с городом — с кэшем в памяти процесса.
+
+Запись загружается один раз на апдейт (``middlewares.UserContextMiddleware``)
+и кэшируется на ``USER_CACHE_TTL`` секунд. Код, меняющий пользователя
+(регистрация, смена города, балансы), сбрасывает запись через
+``invalidate_user``; правки из админки видны после истечения TTL.
+"""
+
+import threading
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from bot_app.models import User
+from bot_app.services.db import run_db
+from bot_app.utils.cache import LRUCache
+
+# Значение обёрнуто в кортеж, чтобы кэшировать и «пользователь не найден»
+_cache: LRUCache[Tuple[Optional[User]]] = LRUCache(
+    settings.USER_CACHE_MAX_ENTRIES, ttl=settings.USER_CACHE_TTL)
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _load_user(telegram_id: int) -> Optional[User]:
+    return (
+        User.objects.select_related("city")
+        .filter(telegram_id=telegram_id)
+        .first()
+    )
+
+
+async def get_user(telegram_id: int) -> Optional[User]:
+    cached = _cache.get(telegram_id)
+    if cached is not None:
+        return cached[0]
+
+    generation = _generation
+    user = await run_db(_load_user, telegram_id)
+    # Пока читали, запись могли изменить — такой результат не кэшируем
+    if generation == _generation:
+        _cache.set(telegram_id, (user,))
+    return user
+
+
+def invalidate_user(telegram_id: int) -> None:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    _cache.pop(telegram_id)
+
+
+def cache_stats():
+    return _cache.stats()
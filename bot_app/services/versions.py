@@ -0,0 +1,70 @@
+"""
+Версии данных для инвалидации кэшей.
+
+Версия хранится в таблице ``DataVersion``, поэтому её увеличение видно
+и боту, и админке в другом контейнере. Прочитанные значения кэшируются
+в процессе на ``DATA_VERSION_TTL`` секунд; изменения из этого же
+процесса применяются к локальному кэшу сразу после коммита.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from bot_app.models import DataVersion
+
+_lock = threading.Lock()
+# key -> (version, время чтения)
+_local: Dict[str, Tuple[int, float]] = {}
+
+
+def city_key(city_id: int) -> str:
+    return f"city:{city_id}"
+
+
+def _remember(key: str, version: int) -> None:
+    with _lock:
+        current = _local.get(key)
+        if current is None or current[0] <= version:
+            _local[key] = (version, time.monotonic())
+
+
+def peek_version(key: str) -> Optional[int]:
+    """Версия из локального кэша, если она ещё не устарела (без обращения к БД)."""
+    with _lock:
+        cached = _local.get(key)
+    if cached is None or time.monotonic() - cached[1] > settings.DATA_VERSION_TTL:
+        return None
+    return cached[0]
+
+
+def get_version(key: str) -> int:
+    cached = peek_version(key)
+    if cached is not None:
+        return cached
+    version = (
+        DataVersion.objects.filter(key=key)
+        .values_list("version", flat=True)
+        .first()
+    ) or 0
+    _remember(key, version)
+    return version
+
+
+def bump_version(key: str) -> int:
+    """Увеличить версию (синхронно, в текущей транзакции) и вернуть новую."""
+    updated = DataVersion.objects.filter(key=key).update(version=F("version") + 1)
+    if not updated:
+        _, created = DataVersion.objects.get_or_create(
+            key=key, defaults={"version": 1})
+        if not created:
+            DataVersion.objects.filter(key=key).update(
+                version=F("version") + 1)
+    version = DataVersion.objects.values_list(
+        "version", flat=True).get(key=key)
+    transaction.on_commit(lambda: _remember(key, version))
+    return version
@@ -0,0 +1,146 @@
+"""
+Приём апдейтов через вебхук (``runbot --webhook``).
+
+Telegram получает ответ сразу, а апдейт обрабатывается фоновой задачей;
+одновременно выполняется не больше ``WEBHOOK_MAX_CONCURRENT_UPDATES``
+(остальные запросы ждут свободного места — Telegram сам ограничивает
+число соединений). При остановке сервер перестаёт принимать апдейты
+(503 — Telegram повторит их позже) и ждёт завершения начатых до
+``WEBHOOK_DRAIN_TIMEOUT`` секунд.
+"""
+
+import asyncio
+import logging
+import signal
+from typing import Any, Dict, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        *,
+        secret_token: str,
+        max_concurrent: int,
+        drain_timeout: float,
+        **data: Any,
+    ) -> None:
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            secret_token=secret_token,
+            **data,
+        )
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._draining = False
+        self._tasks: Set[asyncio.Task] = set()
+        self.processed = 0
+        self.failed = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        # Только публичный API aiogram: апдейт передаётся диспетчеру
+        # собственной фоновой задачей, которую мы и дожидаемся при остановке
+        if self._draining:
+            return web.Response(status=503, text="Shutting down")
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        task = asyncio.create_task(self._feed_update(bot, update))
+        self._tasks.add(task)
+        task.add_done_callback(self._update_done)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    __call__ = handle
+
+    async def _feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        result = await self.dispatcher.feed_raw_update(bot, update, **self.data)
+        if isinstance(result, TelegramMethod):
+            await self.dispatcher.silent_call_request(bot, result)
+
+    def _update_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._slots.release()
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.failed += 1
+            logger.error("Update processing failed", exc_info=task.exception())
+        else:
+            self.processed += 1
+
+    async def close(self) -> None:
+        self._draining = True
+        tasks = set(self._tasks)
+        if tasks:
+            logger.info("Draining %s in-flight updates", len(tasks))
+            _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+            if pending:
+                logger.warning(
+                    "%s updates did not finish in %ss, cancelling",
+                    len(pending), self.drain_timeout)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        await super().close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._tasks),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+async def serve_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """Работать до SIGINT/SIGTERM, затем дождаться начатых апдейтов."""
+    handler = DrainingRequestHandler(
+        dp,
+        bot,
+        secret_token=settings.WEBHOOK_SECRET,
+        max_concurrent=settings.WEBHOOK_MAX_CONCURRENT_UPDATES,
+        drain_timeout=settings.WEBHOOK_DRAIN_TIMEOUT,
+    )
+    app = web.Application()
+    # Обработчик регистрируется первым: при остановке сначала дожидаемся
+    # апдейтов, потом выполняем shutdown диспетчера
+    handler.register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app, handle_signals=False)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+    await site.start()
+    logger.info("Webhook server listening on %s:%s%s",
+                settings.WEBHOOK_HOST, settings.WEBHOOK_PORT, settings.WEBHOOK_PATH)
+
+    if settings.WEBHOOK_URL:
+        await bot.set_webhook(
+            url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(100, settings.WEBHOOK_MAX_CONCURRENT_UPDATES),
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        logger.info("Stopping webhook server: %s", handler.stats())
+        await runner.cleanup()
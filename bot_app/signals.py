@@ -0,0 +1,202 @@
+"""
+Сигналы моделей: увеличивают версии данных, по которым сбрасываются кэши,
+и точечно обновляют уже загруженные индексы городов.
+"""
+
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from bot_app.models import Category, City, Guide, GuideCategory, Place, Review
+from bot_app.services import city_context, place_search
+from bot_app.services.catalog import bump_catalog_version
+from bot_app.services.place_search import SEARCH_FIELDS, place_search_fields
+from bot_app.services.retrieval import (
+    GUIDE_FIELDS,
+    PLACE_FIELDS,
+    DocKey,
+    guide_fields,
+    place_fields,
+)
+from bot_app.services.versions import bump_version, city_key
+
+
+def _city_changed(
+    city_id: Optional[int],
+    *,
+    upsert: Optional[Tuple[str, Dict[str, Any]]] = None,
+    remove: Optional[DocKey] = None,
+    search_fields: Optional[Dict[str, Any]] = None,
+) -> None:
+    if not city_id:
+        return
+    version = bump_version(city_key(city_id))
+
+    def apply() -> None:
+        # Каждый индекс должен увидеть каждую версию, даже если изменение его не касается
+        city_context.apply_change(city_id, version, upsert=upsert, remove=remove)
+        place_search.apply_change(
+            city_id,
+            version,
+            upsert=search_fields,
+            remove=remove[1] if remove and remove[0] == "place" else None,
+        )
+
+    transaction.on_commit(apply)
+
+
+def place_updated(place: Place) -> None:
+    """
+    Для изменений места мимо ``save()`` (``queryset.update``): увеличить
+    версию города и точечно обновить индексы.
+    """
+    _city_changed(
+        place.city_id,
+        upsert=("place", place_fields(place)),
+        search_fields=place_search_fields(place),
+    )
+
+
+def _model_fields(names) -> FrozenSet[str]:
+    return frozenset(name.split("__")[0] for name in names) | {"city"}
+
+
+# Поля модели, от которых зависят индексы городов
+_INDEXED_FIELDS = {
+    Place: _model_fields(PLACE_FIELDS + SEARCH_FIELDS),
+    Guide: _model_fields(GUIDE_FIELDS),
+}
+
+
+def _saved_fields(update_fields) -> Optional[FrozenSet[str]]:
+    if update_fields is None:
+        return None
+    return frozenset(name[:-3] if name.endswith("_id") else name for name in update_fields)
+
+
+def _docs(
+    sender, instance, fresh: bool
+) -> Tuple[Tuple[str, Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Документы индексов: (вид, поля) для контекста и поля поиска мест.
+    ``fresh`` — перечитать поля из БД: экземпляр, сохранённый с
+    ``update_fields``, мог быть загружен давно, и его остальные поля устарели.
+    """
+    if sender is Place:
+        if not fresh:
+            return ("place", place_fields(instance)), place_search_fields(instance)
+        row = Place.objects.filter(pk=instance.pk).values(
+            *set(PLACE_FIELDS + SEARCH_FIELDS)).get()
+        return (
+            ("place", {name: row[name] for name in PLACE_FIELDS}),
+            {name: row[name] for name in SEARCH_FIELDS},
+        )
+    if not fresh:
+        return ("guide", guide_fields(instance)), None
+    return ("guide", Guide.objects.filter(pk=instance.pk).values(*GUIDE_FIELDS).get()), None
+
+
+@receiver(pre_save, sender=Place)
+@receiver(pre_save, sender=Guide)
+def remember_previous_city(sender, instance, update_fields=None, **kwargs):
+    # Если city/category не сохраняются, считаем их неизменными
+    instance._previous_city_id = instance.city_id
+    instance._previous_category_id = instance.category_id
+    if not instance.pk:
+        instance._previous_city_id = instance._previous_category_id = None
+    elif update_fields is None or {"city", "category"} & set(update_fields):
+        previous = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("city_id", "category_id")
+            .first()
+        )
+        if previous:
+            instance._previous_city_id, instance._previous_category_id = previous
+
+
+@receiver(post_save, sender=Place)
+@receiver(post_save, sender=Guide)
+def city_content_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    previous_city_id = getattr(instance, "_previous_city_id", None)
+    saved = _saved_fields(update_fields)
+    # Сохранение только неиндексируемых полей индексы не трогает
+    if saved is None or saved & _INDEXED_FIELDS[sender]:
+        (kind, fields), search_fields = _docs(sender, instance, fresh=saved is not None)
+        if previous_city_id and previous_city_id != instance.city_id:
+            _city_changed(previous_city_id, remove=(kind, instance.pk))
+        _city_changed(instance.city_id, upsert=(kind, fields), search_fields=search_fields)
+
+    # Списки категорий по городам в справочнике зависят от city/category
+    previous_category_id = getattr(instance, "_previous_category_id", None)
+    if created or previous_city_id != instance.city_id or \
+            previous_category_id != instance.category_id:
+        bump_catalog_version()
+
+
+@receiver(post_delete, sender=Place)
+@receiver(post_delete, sender=Guide)
+def city_content_deleted(sender, instance, **kwargs):
+    kind = "place" if sender is Place else "guide"
+    _city_changed(instance.city_id, remove=(kind, instance.pk))
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=GuideCategory)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=City)
+@receiver(post_delete, sender=GuideCategory)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+# Поля отзыва, которые видны в контексте города (через агрегаты и саммари места)
+_REVIEW_FIELDS = ("status", "text", "rating", "price", "place_id")
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_review(sender, instance, update_fields=None, **kwargs):
+    saved = _saved_fields(update_fields)
+    if saved is not None and not saved & {"status", "text", "rating", "price", "place"}:
+        # Видимые поля не сохраняются — считаем их неизменными
+        instance._previous_review = {name: getattr(instance, name) for name in _REVIEW_FIELDS}
+    elif instance.pk:
+        instance._previous_review = (
+            sender.objects.filter(pk=instance.pk).values(*_REVIEW_FIELDS).first())
+    else:
+        instance._previous_review = None
+
+
+def _review_cities_changed(place_ids) -> None:
+    city_ids = (
+        Place.objects.filter(id__in=set(place_ids))
+        .values_list("city_id", flat=True)
+        .distinct()
+    )
+    for city_id in city_ids:
+        _city_changed(city_id)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, **kwargs):
+    # Отзывы на модерации и отклонённые в контекст города не попадают:
+    # версия меняется, только если отзыв был или стал видимым и что-то
+    # видимое в нём поменялось
+    published = Review.Status.PUBLISHED
+    previous = getattr(instance, "_previous_review", None) or {}
+    current = {name: getattr(instance, name) for name in _REVIEW_FIELDS}
+    if published not in (previous.get("status"), instance.status):
+        return
+    if previous == current:
+        return
+    _review_cities_changed(
+        place_id for place_id in (previous.get("place_id"), instance.place_id) if place_id)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    if instance.status == Review.Status.PUBLISHED:
+        _review_cities_changed([instance.place_id])
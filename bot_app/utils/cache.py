@@ -0,0 +1,81 @@
+"""In-process LRU-кэш с ограничением по числу записей, «весу» и TTL."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    def __init__(
+        self,
+        max_entries: int,
+        *,
+        max_weight: Optional[int] = None,
+        weigher: Optional[Callable[[V], int]] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.weigher = weigher or (lambda value: 1)
+        self.ttl = ttl
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[V, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, _, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._pop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        weight = self.weigher(value)
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, weight, time.monotonic())
+            self.weight += weight
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_weight is not None and self.weight > self.max_weight)
+            ):
+                self._pop(next(iter(self._data)))
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._data),
+            "weight": self.weight,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.weight -= entry[1]
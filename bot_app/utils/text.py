@@ -0,0 +1,107 @@
+"""Нормализация и токенизация текста для локального поиска (RU/KZ/EN)."""
+
+import re
+from typing import Iterable, List, Set
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-яәғқңөұүһі]+")
+
+# Окончания, которые срезаются лёгким стеммером (от длинных к коротким)
+_RU_ENDINGS = sorted(
+    (
+        "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими",
+        "ых", "их", "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее",
+        "ов", "ев", "ам", "ям", "ах", "ях", "ом", "ем", "ую", "юю",
+        "а", "я", "ы", "и", "е", "о", "у", "ю", "ь",
+    ),
+    key=len,
+    reverse=True,
+)
+_MIN_STEM = 4
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр с учётом кириллицы, ё → е, без лишних пробелов."""
+    text = (text or "").casefold().replace("ё", "е")
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+def stem(token: str) -> str:
+    for ending in _RU_ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= _MIN_STEM:
+            return token[: -len(ending)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(token) for token in normalize(text).split()]
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[idx: idx + 3] for idx in range(len(padded) - 2)}
+
+
+# Раскладки клавиатуры: один и тот же физический ряд клавиш
+_EN_LAYOUT = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_RU_LAYOUT = "йцукенгшщзхъфывапролджэячсмитьбюё"
+_EN_TO_RU_LAYOUT = str.maketrans(_EN_LAYOUT, _RU_LAYOUT)
+_RU_TO_EN_LAYOUT = str.maketrans(_RU_LAYOUT, _EN_LAYOUT)
+
+_LAT_TO_CYR = (
+    ("shch", "щ"), ("sch", "щ"), ("zh", "ж"), ("kh", "х"), ("ts", "ц"),
+    ("ch", "ч"), ("sh", "ш"), ("yu", "ю"), ("ya", "я"), ("yo", "е"),
+    ("ye", "е"), ("a", "а"), ("b", "б"), ("v", "в"), ("g", "г"),
+    ("d", "д"), ("e", "е"), ("z", "з"), ("i", "и"), ("y", "ы"),
+    ("j", "й"), ("k", "к"), ("l", "л"), ("m", "м"), ("n", "н"),
+    ("o", "о"), ("p", "п"), ("r", "р"), ("s", "с"), ("t", "т"),
+    ("u", "у"), ("f", "ф"), ("h", "х"), ("c", "к"), ("w", "в"),
+    ("x", "кс"), ("q", "к"),
+)
+_CYR_TO_LAT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n",
+    "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f",
+    "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "",
+    "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+
+
+def _latin_to_cyrillic(text: str) -> str:
+    result = []
+    idx = 0
+    while idx < len(text):
+        for latin, cyrillic in _LAT_TO_CYR:
+            if text.startswith(latin, idx):
+                result.append(cyrillic)
+                idx += len(latin)
+                break
+        else:
+            result.append(text[idx])
+            idx += 1
+    return "".join(result)
+
+
+def _cyrillic_to_latin(text: str) -> str:
+    return "".join(_CYR_TO_LAT.get(char, char) for char in text)
+
+
+def query_variants(text: str) -> List[str]:
+    """
+    Нормализованный запрос и его варианты: набранный не в той раскладке
+    ("rfat" → "кафе") и транслитерация в обе стороны ("kafe" → "кафе").
+    Первым всегда идёт исходный запрос.
+    """
+    raw = (text or "").casefold()
+    candidates: Iterable[str] = (
+        raw,
+        raw.translate(_EN_TO_RU_LAYOUT),
+        raw.translate(_RU_TO_EN_LAYOUT),
+        _latin_to_cyrillic(raw),
+        _cyrillic_to_latin(raw.replace("ё", "е")),
+    )
+    variants: List[str] = []
+    for candidate in candidates:
+        normalized = normalize(candidate)
+        if normalized and normalized not in variants:
+            variants.append(normalized)
+    return variants